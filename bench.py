@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""
+行测复盘系统 · 基准测试
+
+在临时目录里生成合成数据，对存储 / 分析函数和各页面逐个计时，结果以 JSON 输出，
+方便不同版本之间对比（例如 python bench.py -o before.json，改完再跑一次 -o after.json）。
+
+合成数据：
+- 试卷：按 PAPER_TEMPLATES 的题量 / 分值生成，每个用户有自己的模块水平 + 每套卷的波动
+- 复盘：按 REVIEW_SCHEMA，每套卷若干条
+- 打卡：由周计划生成的今日任务 + 随机 streak
+
+用法：
+    python bench.py                                   # 默认规模
+    python bench.py --users 200 --papers 1000         # 200 个用户，每人 1000 套卷
+    python bench.py --backend sqlite --pages -o bench.json
+    python bench.py --startup                         # 冷启动：新进程到登录表单 / 登录后首页
+    python bench.py --users 1 --papers 10 --imports   # 核心包导入开销 + 依赖守卫（不许带 streamlit / plotly）
+    python bench.py --contention 8                    # 8 个进程同时写同一个用户：锁等待 + 有没有丢写入
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from xingce import config as xc_config
+from xingce.accounts import get_user, hash_pw, save_users
+from xingce.answers import decode_blocks, encode_blocks, new_sheet
+from xingce.analytics import build_paper_index, build_record_aggregates, module_stats, review_analytics, search_reviews
+from xingce.cache import _cache_invalidate
+from xingce.cohort import _cohort_store, refresh_cohort
+from xingce.fileio import lock_wait_reset, lock_wait_stats
+from xingce.config import DEFAULT_STRATEGY, LEAF_MODULES, PAPER_TEMPLATES, PLAN_TIME, REVIEW_SCHEMA
+from xingce.planning import build_week_plan, get_today_tasks_from_week_plan
+from xingce.schema import ensure_schema
+from xingce.timer import replay_timer, timer_event
+from xingce.storage import (
+    _review_index_store,
+    append_record,
+    delete_records,
+    export_all_bundles,
+    export_user_bundle,
+    import_user_bundle,
+    load_data,
+    load_reviews,
+    load_strategy,
+    pop_export,
+    record_aggregates,
+    review_index_sync,
+    save_checkin,
+    save_data,
+    save_reviews,
+    save_strategy,
+)
+
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(REPO_DIR, "main.py")
+BENCH_USER = "u0000"
+
+REVIEW_REASONS = ["基期现期看反", "转折句没抓", "速算失误", "选项没看全", "公式记错", "图形规律没找到"]
+REVIEW_ACTIONS = ["资料每篇6分钟上限", "数量每题60秒上限", "填空每天20题", "先读问题再读材料", "难题先跳"]
+
+
+# ================== 合成数据 ==================
+def gen_papers(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    """生成 n 套卷（最早的在前），列结构与录入页一致"""
+    leaves = LEAF_MODULES
+    tpl_names = list(PAPER_TEMPLATES)
+    skill = rng.uniform(0.45, 0.9, len(leaves))
+
+    gaps = rng.integers(0, 3, n)
+    days = np.cumsum(gaps[::-1])[::-1]
+    today = datetime.now().date()
+    tpl_idx = rng.integers(0, len(tpl_names), n)
+
+    rows = []
+    for i in range(n):
+        tpl = PAPER_TEMPLATES[tpl_names[tpl_idx[i]]]
+        weight = tpl["weight"]
+        row = {
+            "日期": (today - timedelta(days=int(days[i]))).isoformat(),
+            "试卷": f"模考{i + 1:04d}",
+            "试卷类型": tpl_names[tpl_idx[i]],
+            "每题分值": weight,
+        }
+        acc = np.clip(skill + rng.normal(0, 0.08, len(leaves)), 0.05, 1.0)
+        tc = tq = tt = 0
+        for j, m in enumerate(leaves):
+            total = int(tpl["totals"].get(m, 0))
+            plan = float(PLAN_TIME.get(m, 5.0))
+            correct = int(rng.binomial(total, acc[j]))
+            used = round(plan * float(rng.lognormal(0, 0.25)) * 2) / 2
+            row[f"{m}_总题数"] = total
+            row[f"{m}_正确数"] = correct
+            row[f"{m}_用时"] = used
+            row[f"{m}_正确率"] = correct / total if total > 0 else 0
+            row[f"{m}_计划用时"] = plan
+            tc += correct
+            tq += total
+            tt += used
+        row.update({"总分": round(tc * weight, 2), "总正确数": tc, "总题数": tq, "总用时": tt})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def gen_reviews(rng: np.random.Generator, df: pd.DataFrame, per_paper: int) -> pd.DataFrame:
+    """每套卷生成 per_paper 条复盘"""
+    leaves = LEAF_MODULES
+    rows = []
+    for day, paper in zip(df["日期"], df["试卷"]):
+        for m in rng.choice(leaves, size=min(per_paper, len(leaves)), replace=False):
+            wrong = int(rng.integers(1, 8))
+            c1 = int(rng.integers(0, wrong + 1))
+            c2 = int(rng.integers(0, wrong - c1 + 1))
+            rows.append({
+                "日期": day,
+                "试卷": paper,
+                "模块": m,
+                "错题数": wrong,
+                "错因1_知识点不会": c1,
+                "错因2_方法不熟": c2,
+                "错因3_审题选项坑": wrong - c1 - c2,
+                "一句话原因": str(rng.choice(REVIEW_REASONS)),
+                "下次做法": str(rng.choice(REVIEW_ACTIONS)),
+            })
+    return pd.DataFrame(rows, columns=REVIEW_SCHEMA)
+
+
+def gen_checkin(rng: np.random.Generator, df: pd.DataFrame) -> Dict:
+    tasks = get_today_tasks_from_week_plan(build_week_plan(df, DEFAULT_STRATEGY))
+    for t in tasks:
+        t["done"] = bool(rng.random() < 0.5)
+    return {
+        "streak": int(rng.integers(0, 60)),
+        "last_date": (datetime.now().date() - timedelta(days=1)).isoformat(),
+        "today_tasks_source": "auto_week_plan",
+        "today_tasks": tasks,
+    }
+
+
+def populate(n_users: int, n_papers: int, per_paper: int, seed: int) -> Dict:
+    """通过 save_* 接口写入全部用户的数据（与当前存储后端无关）"""
+    rng = np.random.default_rng(seed)
+    users = {"admin": {"name": "管理员", "password": hash_pw("admin"), "role": "admin"}}
+    n_reviews = 0
+    for k in range(n_users):
+        un = f"u{k:04d}"
+        users[un] = {"name": f"用户{k}", "password": hash_pw(un), "role": "user"}
+        df = gen_papers(rng, n_papers)
+        rdf = gen_reviews(rng, df, per_paper)
+        save_data(df, un)
+        save_reviews(rdf, un)
+        save_strategy(un, dict(DEFAULT_STRATEGY))
+        save_checkin(un, gen_checkin(rng, df))
+        n_reviews += len(rdf)
+    save_users(users)
+    return {"users": n_users, "papers": n_users * n_papers, "reviews": n_reviews}
+
+
+# ================== 计时 ==================
+def timed(fn: Callable, repeat: int, setup: Callable = None) -> Dict:
+    """跑 repeat 次，返回毫秒统计；setup 不计入耗时"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples: List[float]) -> Dict:
+    arr = np.array(samples)
+    return {
+        "n": len(samples),
+        "min_ms": round(float(arr.min()), 3),
+        "median_ms": round(float(np.median(arr)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+def bench_functions(repeat: int) -> Dict:
+    un = BENCH_USER
+    df = load_data(un)
+    rdf = load_reviews(un)
+    strategy = load_strategy(un)
+    raw = df.drop(columns=["试卷ID"]).astype(str)
+    bundle = pop_export(export_user_bundle(un))
+    entry = df.iloc[-1].drop(labels=["试卷ID"]).to_dict()
+    # 每套卷都有逐题记录时的存盘块（题量按第一个试卷模板）
+    sheet = new_sheet(next(iter(PAPER_TEMPLATES.values()))["totals"])
+    answers_blob = encode_blocks({pid: sheet for pid in df["试卷ID"].astype(str)})
+    # 一整场逐题计次的计时器日志（每题一条，每个模块完成一条），进计时器页时回放
+    timer_log = [timer_event("start", 0.0)] + [
+        timer_event("q", 40.0 * i, code=i % len(LEAF_MODULES)) for i in range(1, len(sheet) + 1)
+    ] + [timer_event("lap", 40.0 * len(sheet), mod=m) for m in LEAF_MODULES]
+
+    def append_then_delete():
+        e = dict(entry)
+        append_record(e, un)
+        delete_records(un, e["试卷ID"])
+
+    res = {
+        "get_user": timed(lambda: get_user(un), repeat),
+        "load_data_cold": timed(lambda: load_data(un), repeat, lambda: _cache_invalidate(un)),
+        "load_data_warm": timed(lambda: load_data(un), repeat),
+        "load_reviews_cold": timed(lambda: load_reviews(un), repeat, lambda: _cache_invalidate(un)),
+        "ensure_schema": timed(lambda: ensure_schema(raw.copy()), repeat),
+        "save_data": timed(lambda: save_data(df, un), repeat),
+        "append_delete_record": timed(append_then_delete, repeat),
+        "module_stats": timed(lambda: module_stats(df), repeat),
+        "build_paper_index": timed(lambda: build_paper_index(df), repeat),
+        "build_week_plan": timed(lambda: build_week_plan(df, strategy), repeat),
+        "record_aggregates_build": timed(lambda: build_record_aggregates(df), repeat),
+        # setup 先填好缓存（前面的 append / delete 会让签名变掉），计时的只是命中
+        "record_aggregates_warm": timed(lambda: record_aggregates(un, df), repeat, lambda: record_aggregates(un, df)),
+        "build_week_plan_from_aggregates": timed(
+            lambda: build_week_plan(record_aggregates(un, df), strategy), repeat
+        ),
+        "review_analytics": timed(lambda: review_analytics(rdf, 30), repeat),
+        "answers_decode": timed(lambda: decode_blocks(answers_blob), repeat),
+        "timer_replay": timed(lambda: replay_timer(timer_log), repeat),
+        "review_index_build": timed(
+            lambda: review_index_sync(un, rdf), repeat, lambda: _review_index_store()["users"].pop(un, None)
+        ),
+        "review_search": timed(lambda: search_reviews(review_index_sync(un, rdf), "速算 基期 | 转折"), repeat),
+        # 学员总览：冷 = 所有账号都重读，热 = 数据都没变（只比对版本）
+        "cohort_refresh_cold": timed(refresh_cohort, repeat, lambda: _cohort_store()["users"].clear()),
+        "cohort_refresh_warm": timed(refresh_cohort, repeat),
+        "export_user_bundle": timed(lambda: os.remove(export_user_bundle(un)), repeat),
+        "export_all_bundles": timed(lambda: os.remove(export_all_bundles()), repeat),
+        "import_user_bundle": timed(lambda: import_user_bundle(un, io.BytesIO(bundle), trace_memory=False), repeat),
+        "import_user_bundle_merge": timed(
+            lambda: import_user_bundle(un, io.BytesIO(bundle), mode="merge", trace_memory=False), repeat
+        ),
+    }
+    # 导入报告（单独跑一次，开内存统计）：行/秒、峰值内存
+    _, _, rep = import_user_bundle(un, io.BytesIO(bundle), trace_memory=True)
+    res["import_report"] = {k: v for k, v in rep.items() if not isinstance(v, dict)}
+    res["loaded_frame"] = {
+        "rows": len(df),
+        "columns": df.shape[1],
+        "bytes": int(df.memory_usage(deep=True).sum()),
+    }
+    # 导入会覆盖数据，最后恢复原样，保证页面计时看到的数据一致
+    save_data(df, un)
+    save_reviews(rdf, un)
+    return res
+
+
+def bench_pages(repeat: int) -> Dict:
+    """用 AppTest 无头跑每个页面（整段脚本 = 加载 + 侧边栏 + 页面计算 / 渲染）"""
+    from streamlit.testing.v1 import AppTest
+
+    def session():
+        at = AppTest.from_file(APP_FILE, default_timeout=120)
+        at.session_state["logged_in"] = True
+        at.session_state["u_info"] = {"un": BENCH_USER, "name": BENCH_USER, "role": "admin"}
+        return at
+
+    at = session()
+    at.run()
+    res = {}
+    for page in at.sidebar.radio[0].options:
+        def run_page():
+            at.sidebar.radio[0].set_value(page)
+            at.run()
+        res[page] = timed(run_page, repeat)
+        if at.exception:
+            res[page]["error"] = at.exception[0].message
+    return res
+
+
+# 在全新的解释器里跑：模拟部署后第一个访问者（没有任何已导入的模块）
+STARTUP_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+before = set(sys.modules)
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+t2 = time.perf_counter()
+login_mods = set(sys.modules) - before
+ok = len(at.text_input) >= 2 and not at.exception
+at.session_state["logged_in"] = True
+at.session_state["u_info"] = {"un": sys.argv[2], "name": sys.argv[2], "role": "user"}
+at.run()
+t3 = time.perf_counter()
+print(json.dumps({
+    "harness_ms": (t1 - t0) * 1000,
+    "login_ms": (t2 - t1) * 1000,
+    "first_page_ms": (t3 - t2) * 1000,
+    "login_form": bool(ok),
+    "login_heavy_modules": sorted(m for m in ("pandas", "numpy", "plotly", "zipfile") if m in login_mods),
+}))
+"""
+
+
+def bench_startup(repeat: int) -> Dict:
+    """
+    冷启动：每次起一个新进程，用 AppTest 渲染登录页（time-to-login-form），再以基准用户登录跑首页。
+    process_ms 是整个进程的墙钟时间（含解释器启动和 streamlit 导入）。
+    注意 AppTest 自身会预先导入 plotly，login_heavy_modules 只能反映 pandas / numpy / zipfile。
+    """
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, APP_FILE, BENCH_USER],
+            capture_output=True, text=True, timeout=600,
+        )
+        wall = (time.perf_counter() - t0) * 1000
+        lines = out.stdout.strip().splitlines()
+        if out.returncode != 0 or not lines:
+            return {"error": out.stderr.strip().splitlines()[-1:] or ["no output"]}
+        r = json.loads(lines[-1])
+        r["process_ms"] = wall
+        runs.append(r)
+    res = {k: summarize([r[k] for r in runs]) for k in ("process_ms", "harness_ms", "login_ms", "first_page_ms")}
+    res["login_form"] = all(r["login_form"] for r in runs)
+    res["login_heavy_modules"] = runs[-1]["login_heavy_modules"]
+    return res
+
+
+# 核心包的导入开销：每个模块在全新的解释器里单独导入一次
+IMPORT_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+t1 = time.perf_counter()
+print(json.dumps({
+    "ms": (t1 - t0) * 1000,
+    "modules": sorted(m for m in ("streamlit", "plotly", "pandas", "numpy") if m in sys.modules),
+}))
+"""
+IMPORT_MODULES = [
+    "xingce", "xingce.config", "xingce.fileio", "xingce.accounts", "xingce.planning", "xingce.timer",
+    "xingce.schema", "xingce.answers", "xingce.analytics", "xingce.storage", "xingce.cohort", "xingce.report",
+    "reports",
+]
+# 守卫：核心包和 reports.py 一律不许带上 streamlit / plotly；轻量模块连 pandas / numpy 也不许带
+IMPORT_FORBIDDEN = ("streamlit", "plotly")
+IMPORT_LIGHT = (
+    "xingce", "xingce.config", "xingce.fileio", "xingce.accounts", "xingce.planning", "xingce.timer", "reports",
+)
+
+
+def bench_imports(repeat: int) -> Dict:
+    """
+    逐个模块测导入耗时（新进程，不含解释器启动），并记录顺带导入了哪些重型依赖。
+    violations 非空说明有人在核心包里引入了不该有的依赖，main 会以退出码 1 结束。
+    """
+    res = {}
+    for mod in IMPORT_MODULES:
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", IMPORT_SCRIPT, mod],
+                cwd=REPO_DIR, capture_output=True, text=True, timeout=120,
+            )
+            lines = out.stdout.strip().splitlines()
+            if out.returncode != 0 or not lines:
+                runs = None
+                res[mod] = {"error": out.stderr.strip().splitlines()[-1:] or ["no output"], "violations": ["error"]}
+                break
+            runs.append(json.loads(lines[-1]))
+        if runs is None:
+            continue
+        loaded = runs[-1]["modules"]
+        banned = IMPORT_FORBIDDEN + (("pandas", "numpy") if mod in IMPORT_LIGHT else ())
+        res[mod] = {
+            **summarize([r["ms"] for r in runs]),
+            "modules": loaded,
+            "violations": [m for m in loaded if m in banned],
+        }
+    return res
+
+
+CONTENTION_OPS = 20
+
+
+def _contention_worker(backend: str, sqlite_path: str, entry: Dict, ops: int) -> Dict:
+    """子进程：连续追加 ops 条成绩、保存 ops 次策略，返回本进程的锁等待统计"""
+    xc_config.configure(storage_backend=backend, sqlite_path=sqlite_path)
+    lock_wait_reset()
+    strategy = load_strategy(BENCH_USER)
+    t0 = time.perf_counter()
+    for _ in range(ops):
+        append_record(dict(entry), BENCH_USER)
+        save_strategy(BENCH_USER, strategy)
+    return {"seconds": time.perf_counter() - t0, **lock_wait_stats()}
+
+
+def bench_contention(workers: int) -> Dict:
+    """
+    workers 个进程同时往同一个用户追加成绩 / 保存策略：汇总各进程的锁等待，
+    并核对成绩条数是否正好多了 workers × CONTENTION_OPS（少了就是并发写丢了数据）。
+    """
+    df = load_data(BENCH_USER)
+    entry = df.iloc[-1].drop(labels=["试卷ID"]).to_dict()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        runs = list(pool.map(
+            _contention_worker,
+            [xc_config.STORAGE_BACKEND] * workers,
+            [xc_config.SQLITE_PATH] * workers,
+            [entry] * workers,
+            [CONTENTION_OPS] * workers,
+        ))
+    _cache_invalidate(BENCH_USER)
+    expected = len(df) + workers * CONTENTION_OPS
+    got = len(load_data(BENCH_USER))
+    save_data(df, BENCH_USER)
+    return {
+        "workers": workers,
+        "ops_per_worker": CONTENTION_OPS,
+        "writes_per_s": round(sum(2 * CONTENTION_OPS / r["seconds"] for r in runs), 1),
+        "lock_count": sum(r["count"] for r in runs),
+        "lock_contended": sum(r["contended"] for r in runs),
+        "lock_p95_ms_max": max(r["p95_ms"] for r in runs),
+        "lock_wait_max_ms": max(r["max_ms"] for r in runs),
+        "records_expected": expected,
+        "records_found": got,
+        "lost_writes": expected - got,
+    }
+
+
+def git_rev() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10
+        )
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def main(argv: List[str] = None) -> Dict:
+    ap = argparse.ArgumentParser(description="行测复盘系统基准测试")
+    ap.add_argument("--users", type=int, default=20, help="用户数")
+    ap.add_argument("--papers", type=int, default=200, help="每个用户的试卷数")
+    ap.add_argument("--reviews", type=int, default=3, help="每套卷的复盘条数")
+    ap.add_argument("--repeat", type=int, default=5, help="每项计时重复次数")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--backend", choices=["file", "sqlite"], default="file")
+    ap.add_argument("--pages", action="store_true", help="同时用 AppTest 跑各页面")
+    ap.add_argument("--startup", action="store_true", help="同时测冷启动（新进程到登录表单 / 登录后首页）")
+    ap.add_argument("--imports", action="store_true", help="同时测核心包各模块的导入开销（有违规依赖时退出码为 1）")
+    ap.add_argument("--contention", type=int, default=0, metavar="N", help="同时测 N 个进程并发写同一用户")
+    ap.add_argument("-o", "--output", help="结果写入该 JSON 文件（默认打印到标准输出）")
+    ap.add_argument("--keep", action="store_true", help="保留生成数据的临时目录")
+    args = ap.parse_args(argv)
+
+    # 环境变量给 --pages / --startup 起的 AppTest 用，本进程直接 configure
+    os.environ["XC_STORAGE_BACKEND"] = args.backend
+    os.environ["XC_SQLITE_PATH"] = "bench.db"
+    xc_config.configure(storage_backend=args.backend, sqlite_path="bench.db")
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="xingce_bench_")
+    try:
+        os.chdir(workdir)
+        t0 = time.perf_counter()
+        sizes = populate(args.users, args.papers, args.reviews, args.seed)
+        gen_s = time.perf_counter() - t0
+
+        result = {
+            "meta": {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "git": git_rev(),
+                "backend": args.backend,
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "numpy": np.__version__,
+                **sizes,
+            },
+            "setup_s": {"generate": round(gen_s, 3)},
+            "functions": bench_functions(args.repeat),
+        }
+        # 并发写放在 AppTest 之前：AppTest 会替换 sys.modules["__main__"]，
+        # 之后进程池就按名字找不到本文件里的 _contention_worker（PicklingError）
+        if args.contention:
+            result["contention"] = bench_contention(args.contention)
+        if args.pages:
+            result["pages"] = bench_pages(args.repeat)
+        if args.startup:
+            result["startup"] = bench_startup(args.repeat)
+        if args.imports:
+            result["imports"] = bench_imports(args.repeat)
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"数据保留在 {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    bad = {m: r["violations"] for m, r in result.get("imports", {}).items() if r["violations"]}
+    if bad:
+        print(f"导入守卫未通过：{bad}", file=sys.stderr)
+        raise SystemExit(1)
+    if result.get("contention", {}).get("lost_writes"):
+        print(f"并发写入丢失：{result['contention']}", file=sys.stderr)
+        raise SystemExit(1)
+    return result
+
+
+if __name__ == "__main__":
+    main()
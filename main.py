@@ -8,33 +8,48 @@
 - 自动生成短板 / 时间黑洞 / 明日训练 / 一周训练计划
 - 每日打卡（streak）
 - 数据备份与导入（zip）
+
+配置 / 存储 / 分析 / 计划等纯逻辑在 xingce 包里（不依赖 Streamlit，reports.py 也直接用它），
+本文件只负责页面。
+
+启动顺序：登录页只需要 streamlit 和 xingce.config / xingce.accounts；pandas / numpy 及其余 xingce 模块
+在登录之后才导入，plotly 在画图的页面里导入，zipfile 在导出 / 导入数据包时导入。
 """
 
+from __future__ import annotations
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import os
+import streamlit.components.v1 as components
+from array import array
+from datetime import datetime
+from collections import OrderedDict, deque
 import json
-import hashlib
 import time
-import io
-import zipfile
-from typing import Dict, List, Tuple
-import toml
+import threading
+from typing import Dict
 
+from xingce import config as xc_config
+from xingce.accounts import count_users, create_user, delete_user, get_user, hash_pw, list_users, save_user
+from xingce.config import (
+    APPEND_ONLY_RECORDS,
+    DATA_LOG_COMPACT_AT,
+    LEAF_MODULES,
+    MODULE_STRUCTURE,
+    PAPER_TEMPLATES,
+    PLAN_TIME,
+)
 
 
 # =========================================================
 # 0. 页面配置
 # =========================================================
 st.set_page_config(page_title="行测 Pro Max", layout="wide", page_icon="🚀")
+_PERF_T0 = time.perf_counter()   # 本次 rerun 的计时起点（见“运行耗时埋点”）
 
 # =========================================================
 # 1. 全局 UI（浅色 + 自适应）
 # =========================================================
-st.markdown("""
+APP_CSS = """
 <style>
 /* ---------------- 基础色板 ---------------- */
 :root{
@@ -252,9 +267,9 @@ div[data-testid="stPlotlyChart"]{ margin-top: -4px; }
   .mini-header{ font-size: 0.78rem; }
 }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-st.markdown("""
+APP_CSS_LIGHT = """
 <style>
 
 /* 顶部 KPI 卡片：改成白色浅色卡片 */
@@ -342,407 +357,200 @@ st.markdown("""
 }
 
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+def inject_app_css():
+    """
+    全局样式每个会话只注入一次：由一个不占高度的组件写进父页面 <head>。
+    st.markdown 发出的 <style> 属于页面元素，每次 rerun 不重发就会被清掉；
+    挂在 <head> 上的样式会一直保留，浏览器刷新即新会话，会再注入一次。
+    """
+    css = (APP_CSS + APP_CSS_LIGHT).replace("<style>", "").replace("</style>", "")
+    components.html(f"""
+    <script>
+    const doc = window.parent.document;
+    let el = doc.getElementById("xc-app-css");
+    if (!el) {{
+      el = doc.createElement("style");
+      el.id = "xc-app-css";
+      doc.head.appendChild(el);
+    }}
+    el.textContent = {json.dumps(css)};
+    </script>
+    """, height=0)
+
+
+if not st.session_state.get("_app_css_injected"):
+    inject_app_css()
+    st.session_state["_app_css_injected"] = True
+_PERF_CSS_DONE = time.perf_counter()
 
 # =========================================================
-# 2. 配置与模块结构
+# 2. 部署配置（模块结构 / 存储 / 分析 / 计划都在 xingce 包里）
 # =========================================================
-# 管理员默认密码：
-# 优先从 st.secrets 里读取；本地跑不配置 secrets 的话，就用一个开发用默认值
+# 存储后端 / SQLite 路径 / 管理员默认密码：优先从 st.secrets 里读取，
+# 没配置 secrets 时沿用 xingce/config.py 里的环境变量默认值
 try:
-    ADMIN_DEFAULT_PASSWORD = st.secrets.get("ADMIN_DEFAULT_PASSWORD", None)
+    xc_config.configure(
+        storage_backend=st.secrets.get("STORAGE_BACKEND", None),
+        sqlite_path=st.secrets.get("SQLITE_PATH", None),
+        admin_default_password=st.secrets.get("ADMIN_DEFAULT_PASSWORD", None),
+    )
 except Exception:
-    ADMIN_DEFAULT_PASSWORD = None
-
-USERS_FILE = "users_db.json"
-FIXED_WEIGHT = 0.8           # 默认：省考 / 超格 每个对题0.8分
-GOAL_SCORE = 75.0            # 目标分，可按需调整
-
-# 模块结构：大模块 / 子模块
-MODULE_STRUCTURE = {
-    "政治理论": {"type": "direct", "total": 15},
-    "常识判断": {"type": "direct", "total": 15},
-    "言语理解": {
-        "type": "parent",
-        "subs": {"言语-逻辑填空": 10, "言语-片段阅读": 15}
-    },
-    "数量关系": {"type": "direct", "total": 15},
-    "判断推理": {
-        "type": "parent",
-        "subs": {
-            "判断-图形推理": 5,
-            "判断-定义判断": 10,
-            "判断-类比推理": 10,
-            "判断-逻辑判断": 10
-        }
-    },
-    "资料分析": {"type": "direct", "total": 20},
-}
-
-# 每个子模块推荐的计划用时（分钟）
-PLAN_TIME = {
-    "判断-图形推理": 6.0,
-    "判断-类比推理": 5.0,
-    "判断-逻辑判断": 10.0,
-    "判断-定义判断": 6.0,
-    "资料分析": 25.0,
-    "数量关系": 25.0,
-    "政治理论": 5.0,
-    "常识判断": 5.0,
-    "言语-逻辑填空": 5.0,
-    "言语-片段阅读": 12.0,
-}
+    pass
 
 
-# ================= 试卷题量与每题分值模板 =================
-# 试卷题量 & 每题分值模板（录入成绩时选择）
-PAPER_TEMPLATES = {
-    # 省考试卷：125题，每题0.8
-    "省考套题（125题，0.8分/题）": {
-        "weight": FIXED_WEIGHT,
-        "totals": {
-            "政治理论": 15,
-            "常识判断": 15,
-            "言语-逻辑填空": 10,
-            "言语-片段阅读": 15,
-            "数量关系": 15,
-            "判断-图形推理": 5,
-            "判断-定义判断": 10,
-            "判断-类比推理": 10,
-            "判断-逻辑判断": 10,
-            "资料分析": 20,
-        },
-    },
-
-    # 花生套题：120题，每题0.85
-    "花生套题（120题，0.85分/题）": {
-        "weight": 0.85,
-        "totals": {
-            "政治理论": 15,
-            "常识判断": 10,
-            "言语-逻辑填空": 15,
-            "言语-片段阅读": 15,
-            "数量关系": 15,
-            "判断-图形推理": 5,
-            "判断-定义判断": 10,
-            "判断-类比推理": 5,
-            "判断-逻辑判断": 10,
-            "资料分析": 20,
-        },
-    },
-
-    # 超格套题：125题，每题0.8
-    "超格套题（125题，0.8分/题）": {
-        "weight": FIXED_WEIGHT,
-        "totals": {
-            "政治理论": 15,
-            "常识判断": 15,
-            "言语-逻辑填空": 10,
-            "言语-片段阅读": 20,
-            "数量关系": 15,
-            "判断-图形推理": 5,
-            "判断-定义判断": 10,
-            "判断-类比推理": 5,
-            "判断-逻辑判断": 10,
-            "资料分析": 20,
-        },
-    },
-}
-
-
-
-# 默认策略：数量/资料/逻辑的时间上限等
-DEFAULT_STRATEGY = {
-    "数量_每题上限秒": 60,        # 数量：每题时间上限（秒）
-    "资料_每篇上限分钟": 6,      # 资料：每篇时间上限（分钟）
-    "逻辑_每题上限秒": 90,       # 逻辑判断：每题时间上限（秒）
-    "数量_只做简单题": True,     # 数量是否只做简单题
-    "资料_超时先跳": True,       # 资料是否超时先跳
-    "复盘_统计天数": 30,        # 看板错因统计范围（天）
-    "自定义策略备注": "",        # 用户自定义策略说明（长文本）
-}
-
-# 复盘记录表的列结构
-REVIEW_SCHEMA = [
-    "日期", "试卷", "模块", "错题数",
-    "错因1_知识点不会", "错因2_方法不熟", "错因3_审题选项坑",
-    "一句话原因", "下次做法"
-]
-
 # =========================================================
-# 3. 工具函数：模块 / 文件 / 存储
+# 3. 运行耗时埋点
 # =========================================================
-def get_leaf_modules() -> List[str]:
-    """展开所有叶子模块（直接做题的粒度）"""
-    leaves = []
-    for k, v in MODULE_STRUCTURE.items():
-        if v["type"] == "direct":
-            leaves.append(k)
-        else:
-            leaves.extend(v["subs"].keys())
-    return leaves
-
-LEAF_MODULES = get_leaf_modules()
-
-
-def hash_pw(pw: str) -> str:
-    """简单的密码哈希（sha256）"""
-    return hashlib.sha256(str(pw).encode()).hexdigest()
-
+# 每次 rerun 按阶段计时：css → init（配置 / 函数定义）→ loaders → sidebar → page，外加每个图表和整次 total。
+# 样本 (时间戳, 页面, 阶段, 毫秒) 同时写入本会话和进程级两个定长环形缓冲，管理后台按 p50 / p95 汇总。
+# css / init / loaders 发生在确定页面之前，先暂存，等 perf_set_page 后再一起落盘。
+# 页面中途 st.rerun() / st.stop() 的那次 rerun 不会有 page / total 样本。
+PERF_RING_SIZE = 5000          # 进程级最多保留的样本数
+PERF_SESSION_RING_SIZE = 500   # 每个会话最多保留的样本数
+
+_PERF_RUN = {
+    "page": None,
+    "last": _PERF_CSS_DONE,
+    "pending": [("css", (_PERF_CSS_DONE - _PERF_T0) * 1000)],
+}
 
-def data_file(un: str) -> str:
-    """当前用户的成绩文件路径"""
-    return f"data_storage_{un}.csv"
 
+@st.cache_resource
+def _perf_store() -> Dict:
+    """进程级耗时样本（所有会话共享）"""
+    return {"lock": threading.Lock(), "samples": deque(maxlen=PERF_RING_SIZE)}
 
-def review_file(un: str) -> str:
-    """当前用户的复盘记录文件路径"""
-    return f"review_notes_{un}.csv"
 
+def _perf_push(page: str, phase: str, ms: float):
+    sample = (datetime.now().isoformat(timespec="seconds"), page, phase, round(ms, 2))
+    store = _perf_store()
+    with store["lock"]:
+        store["samples"].append(sample)
+    if "_perf_samples" not in st.session_state:
+        st.session_state["_perf_samples"] = deque(maxlen=PERF_SESSION_RING_SIZE)
+    st.session_state["_perf_samples"].append(sample)
 
-def strategy_file(un: str) -> str:
-    """当前用户的策略配置文件路径"""
-    return f"strategy_{un}.json"
 
+def perf_set_page(page: str):
+    """确定本次 rerun 的页面，并写入之前暂存的阶段"""
+    _PERF_RUN["page"] = page
+    for phase, ms in _PERF_RUN["pending"]:
+        _perf_push(page, phase, ms)
+    _PERF_RUN["pending"] = []
 
-def checkin_file(un: str) -> str:
-    """当前用户的打卡记录文件路径"""
-    return f"checkin_{un}.json"
 
+def perf_mark(phase: str):
+    """记录“上一个 mark 到现在”的耗时，归入 phase"""
+    now = time.perf_counter()
+    ms = (now - _PERF_RUN["last"]) * 1000
+    _PERF_RUN["last"] = now
+    if _PERF_RUN["page"] is None:
+        _PERF_RUN["pending"].append((phase, ms))
+    else:
+        _perf_push(_PERF_RUN["page"], phase, ms)
 
-def build_all_columns() -> List[str]:
-    """构造成绩表需要的全部列"""
-    cols = ["日期", "试卷", "总分", "总正确数", "总题数", "总用时"]
-    for m in LEAF_MODULES:
-        cols.extend([
-            f"{m}_总题数", f"{m}_正确数", f"{m}_用时",
-            f"{m}_正确率", f"{m}_计划用时"
-        ])
-    return cols
 
+def perf_total():
+    """整次 rerun 的耗时（脚本末尾调用）"""
+    _perf_push(_PERF_RUN["page"] or "", "total", (time.perf_counter() - _PERF_T0) * 1000)
 
-def ensure_schema(df: pd.DataFrame) -> pd.DataFrame:
-    """保证成绩表 DataFrame 至少包含需要的所有列"""
-    if df is None or df.empty:
-        return pd.DataFrame(columns=build_all_columns())
 
-    need = build_all_columns()
-    for c in need:
-        if c not in df.columns:
-            df[c] = 0
+def perf_chart(fig, name: str, **kwargs):
+    """st.plotly_chart 的计时包装；阶段名为“图表·name”，不影响 perf_mark 的分段"""
+    t0 = time.perf_counter()
+    st.plotly_chart(fig, **kwargs)
+    _perf_push(_PERF_RUN["page"] or "", f"图表·{name}", (time.perf_counter() - t0) * 1000)
 
-    if "日期" in df.columns:
-        try:
-            df["日期"] = pd.to_datetime(df["日期"]).dt.date
-        except Exception:
-            pass
 
-    num_cols = [
-        c for c in df.columns
-        if any(c.endswith(s) for s in ["_正确数", "_总题数", "_用时", "_正确率", "_计划用时"])
-        or c in ["总分", "总正确数", "总题数", "总用时"]
-    ]
-    for c in num_cols:
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+def perf_samples(scope: str = "global") -> pd.DataFrame:
+    """取出样本；scope = "global"（所有会话）或 "session"（本会话）"""
+    if scope == "session":
+        rows = list(st.session_state.get("_perf_samples", []))
+    else:
+        store = _perf_store()
+        with store["lock"]:
+            rows = list(store["samples"])
+    return pd.DataFrame(rows, columns=["时间", "页面", "阶段", "毫秒"])
 
-    return df
 
+def perf_summary(samples: pd.DataFrame) -> pd.DataFrame:
+    """按 页面 × 阶段 汇总：次数 / p50 / p95 / 最大（毫秒）"""
+    if samples.empty:
+        return pd.DataFrame(columns=["页面", "阶段", "次数", "p50", "p95", "最大"])
+    g = samples.groupby(["页面", "阶段"], sort=False)["毫秒"]
+    out = pd.DataFrame({
+        "次数": g.size(),
+        "p50": g.quantile(0.5),
+        "p95": g.quantile(0.95),
+        "最大": g.max(),
+    }).round(1).reset_index()
+    return out.sort_values(["页面", "p95"], ascending=[True, False], ignore_index=True)
 
-def load_data(un: str) -> pd.DataFrame:
-    """读取当前用户的成绩记录"""
-    path = data_file(un)
-    if os.path.exists(path):
-        df = pd.read_csv(path, encoding="utf-8")
-        return ensure_schema(df)
-    return ensure_schema(pd.DataFrame())
 
+# ------------------- 图表缓存 -------------------
+# 图表只随数据变：按 (账号, 图表, 参数) 缓存序列化后的 figure JSON，值里带着数据版本（data_version），版本变了才重画。
+# 命中时跳过整理数据（长表 / 分桶）和画图，直接把 JSON 还原成 Figure（_validate=False，不再逐个属性校验）。
+# 进程级 LRU，按 JSON 长度封顶；一个账号的一张图只占一个条目，旧版本被新版本顶掉。
+FIG_CACHE_MAX_CHARS = 64 * 1024 * 1024
 
-def save_data(df: pd.DataFrame, un: str):
-    """保存当前用户的成绩记录"""
-    df = ensure_schema(df)
-    df.to_csv(data_file(un), index=False, encoding="utf-8-sig")
 
+@st.cache_resource
+def _fig_store() -> Dict:
+    """进程级图表缓存（所有会话共享）"""
+    return {"lock": threading.Lock(), "entries": OrderedDict(), "chars": 0, "hits": 0, "misses": 0}
 
-def load_users() -> Dict:
-    """加载用户数据库，不存在则创建默认 admin
 
-    admin 初始密码从 Streamlit Secrets 中的 ADMIN_DEFAULT_PASSWORD 读取：
-    - 本地开发：没有 secrets 时可以自行在本地创建 users_db.json
-    - 云端部署：强烈建议在 Secrets 中设置一个复杂密码
+def cached_figure(un: str, version, chart: str, build, params: tuple = ()):
     """
-    if not os.path.exists(USERS_FILE):
-        if ADMIN_DEFAULT_PASSWORD is None:
-            # 没有用户文件、也没有在 secrets 中配置管理员密码时，直接报错，避免生成弱密码
-            raise RuntimeError(
-                "首次运行检测不到 users_db.json，且未配置 ADMIN_DEFAULT_PASSWORD。\n"
-                "请在 Streamlit Cloud 的 Secrets 中设置 ADMIN_DEFAULT_PASSWORD，"
-                "例如：ADMIN_DEFAULT_PASSWORD='一串很长且安全的密码'。\n"
-                "本地开发如果嫌麻烦，也可以自己手动创建 users_db.json。"
-            )
-        d = {"admin": {"name": "管理员", "password": hash_pw(ADMIN_DEFAULT_PASSWORD), "role": "admin"}}
-        save_users(d)
-        return d
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_users(d: Dict):
-    """保存用户数据库"""
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(d, f, ensure_ascii=False, indent=2)
-
-
-def load_reviews(un: str) -> pd.DataFrame:
-    """读取当前用户的复盘记录"""
-    path = review_file(un)
-    if os.path.exists(path):
-        rdf = pd.read_csv(path, encoding="utf-8")
-        if "日期" in rdf.columns:
-            try:
-                rdf["日期"] = pd.to_datetime(rdf["日期"]).dt.date
-            except Exception:
-                pass
-        for c in REVIEW_SCHEMA:
-            if c not in rdf.columns:
-                rdf[c] = ""
-        return rdf[REVIEW_SCHEMA]
-    return pd.DataFrame(columns=REVIEW_SCHEMA)
-
-
-def save_reviews(rdf: pd.DataFrame, un: str):
-    """保存当前用户的复盘记录"""
-    for c in REVIEW_SCHEMA:
-        if c not in rdf.columns:
-            rdf[c] = ""
-    rdf = rdf[REVIEW_SCHEMA]
-    rdf.to_csv(review_file(un), index=False, encoding="utf-8-sig")
-
-
-def load_strategy(un: str) -> Dict:
-    """读取当前用户的策略配置"""
-    path = strategy_file(un)
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                s = json.load(f)
-            # 补全默认 key
-            for k, v in DEFAULT_STRATEGY.items():
-                if k not in s:
-                    s[k] = v
-            return s
-        except Exception:
-            pass
-    return dict(DEFAULT_STRATEGY)
-
-
-def save_strategy(un: str, s: Dict):
-    """保存当前用户策略"""
-    with open(strategy_file(un), "w", encoding="utf-8") as f:
-        json.dump(s, f, ensure_ascii=False, indent=2)
-
-
-def load_checkin(un: str) -> Dict:
-    """读取当前用户打卡信息"""
-    path = checkin_file(un)
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                d = json.load(f)
-            if "streak" not in d:
-                d["streak"] = 0
-            if "last_date" not in d:
-                d["last_date"] = ""
-            if "today_tasks" not in d:
-                d["today_tasks"] = []
-            if "today_tasks_source" not in d:
-                d["today_tasks_source"] = "auto_week_plan"
-            return d
-        except Exception:
-            pass
-    return {"streak": 0, "last_date": "", "today_tasks_source": "auto_week_plan", "today_tasks": []}
-
-
-def save_checkin(un: str, d: Dict):
-    """保存当前用户打卡记录"""
-    with open(checkin_file(un), "w", encoding="utf-8") as f:
-        json.dump(d, f, ensure_ascii=False, indent=2)
-
-
-# ================== 新增：导出/导入数据包 ==================
-def export_user_bundle(un: str) -> bytes:
-    """
-    打包当前账号的全部数据文件为 zip，并返回二进制内容。
-    包含：
-    - records.csv   -> 成绩（data_storage_xxx.csv）
-    - reviews.csv   -> 复盘（review_notes_xxx.csv）
-    - strategy.json -> 策略
-    - checkin.json  -> 打卡
-    """
-    mapping = {
-        "records.csv": data_file(un),
-        "reviews.csv": review_file(un),
-        "strategy.json": strategy_file(un),
-        "checkin.json": checkin_file(un),
-    }
-
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for arc_name, real_path in mapping.items():
-            if os.path.exists(real_path):
-                zf.write(real_path, arc_name)
-    buf.seek(0)
-    return buf.read()
-
-
-def import_user_bundle(un: str, uploaded_file) -> Tuple[bool, str]:
-    """
-    从上传的 zip 中读取标准文件名，并写回当前账号：
-    - records.csv   -> 成绩
-    - reviews.csv   -> 复盘
-    - strategy.json -> 策略
-    - checkin.json  -> 打卡
+    取 (un, chart, params) 的图：缓存里的数据版本等于 version 就直接还原，否则调用 build() 重画并写回。
+    build 返回 None 表示“没东西可画”，同样会被缓存。
     """
-    try:
-        data = uploaded_file.read()
-        buf = io.BytesIO(data)
-        with zipfile.ZipFile(buf, "r") as zf:
-            names = zf.namelist()
-            # 成绩
-            if "records.csv" in names:
-                with zf.open("records.csv") as f:
-                    df = pd.read_csv(f)
-                df = ensure_schema(df)
-                df.to_csv(data_file(un), index=False, encoding="utf-8-sig")
-            # 复盘
-            if "reviews.csv" in names:
-                with zf.open("reviews.csv") as f:
-                    rdf = pd.read_csv(f)
-                for c in REVIEW_SCHEMA:
-                    if c not in rdf.columns:
-                        rdf[c] = ""
-                rdf[REVIEW_SCHEMA].to_csv(review_file(un), index=False, encoding="utf-8-sig")
-            # 策略
-            if "strategy.json" in names:
-                with zf.open("strategy.json") as f:
-                    s = json.load(f)
-                for k, v in DEFAULT_STRATEGY.items():
-                    if k not in s:
-                        s[k] = v
-                with open(strategy_file(un), "w", encoding="utf-8") as sf:
-                    json.dump(s, sf, ensure_ascii=False, indent=2)
-            # 打卡
-            if "checkin.json" in names:
-                with zf.open("checkin.json") as f:
-                    d = json.load(f)
-                with open(checkin_file(un), "w", encoding="utf-8") as cf:
-                    json.dump(d, cf, ensure_ascii=False, indent=2)
-        return True, "数据导入成功！已覆盖当前账号的数据。"
-    except Exception as e:
-        return False, f"导入失败：{e}"
+    import plotly.graph_objects as go
+
+    store = _fig_store()
+    key = (un, chart, params)
+    with store["lock"]:
+        hit = store["entries"].get(key)
+        if hit is not None and hit[0] == version:
+            store["entries"].move_to_end(key)
+            store["hits"] += 1
+        else:
+            hit = None
+            store["misses"] += 1
+    if hit is not None:
+        return None if hit[1] is None else go.Figure(json.loads(hit[1]), _validate=False)
+
+    fig = build()
+    js = None if fig is None else fig.to_json()
+    with store["lock"]:
+        old = store["entries"].pop(key, None)
+        if old is not None:
+            store["chars"] -= len(old[1] or "")
+        store["entries"][key] = (version, js)
+        store["chars"] += len(js or "")
+        while store["chars"] > FIG_CACHE_MAX_CHARS and len(store["entries"]) > 1:
+            _, (_, old_js) = store["entries"].popitem(last=False)
+            store["chars"] -= len(old_js or "")
+    return fig
+
+
+def fig_cache_stats() -> Dict:
+    store = _fig_store()
+    with store["lock"]:
+        return {
+            "hits": store["hits"],
+            "misses": store["misses"],
+            "entries": len(store["entries"]),
+            "users": len({k[0] for k in store["entries"]}),
+            "mb": store["chars"] / 1024 / 1024,
+        }
 
 
 # =========================================================
-# 4. UI 辅助函数 + 逻辑函数
+# 4. UI 辅助函数
 # =========================================================
 def status_class(acc: float) -> str:
     """根据正确率返回模块卡片颜色"""
@@ -777,250 +585,171 @@ def render_module_card(
     """
 
 
-def module_tip(m: str, acc: float, t: float, plan: float, strategy: Dict) -> str:
-    """
-    根据模块、正确率、用时和策略，生成一段『复盘建议文字 + 彩色标签』HTML。
-    - 短板：红色 pill-short
-    - 可提升：蓝色 pill-mid
-    - 强项：绿色 pill-strong
-    - 超时：橙色 pill-time
-    """
-    tips = []
-
-    # 超时提示（橙色 pill）
-    if plan and t > plan + 2:
-        tips.append(
-            f"<span class='pill pill-time'>超时</span>"
-            f"用时 <b>{int(t)}m</b>，比计划 <b>+{int(t - plan)}m</b>。设置上限→超时先跳。"
-        )
-
-    # 正确率提示（红 / 蓝 / 绿）
-    if acc < 0.6:
-        tips.append(
-            f"<span class='pill pill-short'>短板</span>"
-            f"正确率 <b>{acc:.0%}</b>，错题拆三类：不会/不熟/审题坑，并只改一个做法。"
-        )
-    elif acc >= 0.8:
-        tips.append(
-            f"<span class='pill pill-strong'>强项</span>"
-            f"正确率 <b>{acc:.0%}</b>，重点：提速 + 降低粗心。"
-        )
-    else:
-        tips.append(
-            f"<span class='pill pill-mid'>可提升</span>"
-            f"正确率 <b>{acc:.0%}</b>，属于训练就能稳定涨的区间。"
-        )
-
-    # ====== 各模块专属做法（保持你原来的逻辑，只是接在新样式后） ======
-    if m == "资料分析":
-        per_block = int(strategy.get("资料_每篇上限分钟", 6))
-        skip = bool(strategy.get("资料_超时先跳", True))
-        skip_txt = "（超时先跳）" if skip else ""
-        tips.append(
-            f"做法：<b>每篇限时{per_block}分钟</b>{skip_txt}；"
-            f"每天15分钟练<b>速算（增长率/基期/比重/平均）</b>。"
-        )
-    elif m == "数量关系":
-        sec = int(strategy.get("数量_每题上限秒", 60))
-        easy_only = bool(strategy.get("数量_只做简单题", True))
-        easy_txt = "（只做简单题）" if easy_only else ""
-        tips.append(
-            f"做法：<b>每题{sec}秒上限</b>{easy_txt}；"
-            f"只保留你最稳的<b>3类题型</b>训练，其余秒放。"
-        )
-    elif m in ["言语-逻辑填空", "言语-片段阅读"]:
-        tips.append(
-            "做法：每天20题专项；错题只写一句："
-            "<b>语境/搭配/转折因果关键词</b>，下次遇坑能秒避。"
-        )
-    elif m in ["政治理论", "常识判断"]:
-        tips.append(
-            "做法：每天10分钟刷题；错题压成<b>1行卡片关键词</b>（法条/时政点）。"
-        )
-    elif m == "判断-逻辑判断":
-        sec = int(strategy.get("逻辑_每题上限秒", 90))
-        tips.append(
-            f"做法：设置<b>{sec}秒上限</b>；难题先跳，优先稳图推/类比/定义。"
-        )
-    elif m.startswith("判断-"):
-        tips.append(
-            "做法：图推/类比/定义优先稳分；复杂题设置上限，超过先跳。"
-        )
-
-    return "<div class='tip-box'>" + "<br>".join(tips) + "</div>"
-
-def compute_summary(df: pd.DataFrame):
-    """返回最新一套卷的 summary 信息"""
-    latest = df.iloc[-1]
-    prev = df.iloc[-2] if len(df) > 1 else None
-    delta = float(latest["总分"]) - float(prev["总分"]) if prev is not None else None
-    acc = float(latest["总正确数"]) / max(float(latest["总题数"]), 1)
-    return latest, delta, acc
-
-
-def compute_next_day_plan(row: pd.Series, strategy: Dict):
-    """基于单卷 row + 策略，生成“明天怎么练”的 3 条建议"""
-    items = []
-    for m in LEAF_MODULES:
-        acc = float(row.get(f"{m}_正确率", 0))
-        t = float(row.get(f"{m}_用时", 0))
-        plan = float(row.get(f"{m}_计划用时", PLAN_TIME.get(m, 0)))
-        diff = t - plan if plan else 0
-        items.append((m, acc, diff))
-
-    worst_acc = sorted(items, key=lambda x: x[1])[0]
-    worst_time = sorted(items, key=lambda x: x[2], reverse=True)[0]
-
-    tasks = [
-        "资料分析：15分钟限时速算（增长率/基期/比重/平均数），目标“更快不更错”。",
-        "言语理解：逻辑填空20题（每题标注：语境/搭配/转折因果关键词）。",
-    ]
-
-    if worst_acc[0] == "数量关系" or worst_time[0] == "数量关系":
-        sec = int(strategy.get("数量_每题上限秒", 60))
-        tasks.append(f"数量关系：只练你最稳的1个题型10题 + 每题{sec}秒上限；其余题型放弃训练。")
-    else:
-        tasks.append(f"短板专项：{worst_acc[0]} 10-20题（只做同一类型，做到“看见就会”）。")
-
-    return tasks, worst_acc, worst_time
-
-
-def build_week_plan(df: pd.DataFrame, strategy: Dict) -> List[Dict]:
-    """根据最近三套卷，构造一周训练计划（每天固定 3 件事）"""
-    if df.empty:
-        return []
+# 趋势折线：单条线超过这么多点改用 WebGL（Scattergl），浏览器不用为每个点建 SVG 节点
+TREND_WEBGL_MIN = 400
+TREND_TEXT_MAX = 60   # 逐套且点数不多时才在点上标数字
 
-    recent = df.tail(3)
-    acc_scores = {m: [] for m in LEAF_MODULES}
-    time_over = {m: [] for m in LEAF_MODULES}
 
-    for _, row in recent.iterrows():
-        for m in LEAF_MODULES:
-            acc_scores[m].append(float(row.get(f"{m}_正确率", 0)))
-            plan = float(row.get(f"{m}_计划用时", PLAN_TIME.get(m, 0)))
-            t = float(row.get(f"{m}_用时", 0))
-            time_over[m].append((t - plan) if plan else 0)
-
-    avg_acc = {m: sum(v) / max(len(v), 1) for m, v in acc_scores.items()}
-    avg_over = {m: sum(v) / max(len(v), 1) for m, v in time_over.items()}
-
-    worst_acc_mods = [x[0] for x in sorted(avg_acc.items(), key=lambda x: x[1])[:3]]
-    worst_over_mods = [x[0] for x in sorted(avg_over.items(), key=lambda x: x[1], reverse=True)[:2]]
-
-    focus_list = list(dict.fromkeys(worst_acc_mods + worst_over_mods))
-    if not focus_list:
-        focus_list = ["言语-逻辑填空"]
-
-    sec = int(strategy.get("数量_每题上限秒", 60))
-    block = int(strategy.get("资料_每篇上限分钟", 6))
-    logic_sec = int(strategy.get("逻辑_每题上限秒", 90))
-
-    plan = []
-    for i in range(7):
-        focus = focus_list[i % len(focus_list)]
-        day = (datetime.now().date() + timedelta(days=i)).isoformat()
-
-        base = [
-            "资料分析：15分钟速算训练（增长率/基期/比重/平均数）",
-            "言语：逻辑填空20题（错因标注：语境/搭配/转折因果）",
-        ]
-
-        if focus == "数量关系":
-            base.append(f"数量：保留题型10题 + 每题{sec}秒上限（其余秒放）")
-        elif focus == "资料分析":
-            base.append(f"资料：做2篇限时（每篇{block}分钟，上限跳题）")
-        elif focus == "判断-逻辑判断":
-            base.append(f"逻辑判断：10题，单题{logic_sec}秒上限，难题先跳")
-        else:
-            base.append(f"专项：{focus} 10-20题（只做同一类型）")
-
-        plan.append({"日期": day, "重点模块": focus, "任务": base})
-    return plan
-
-
-def get_today_tasks_from_week_plan(week_plan: List[Dict]) -> List[Dict]:
-    """从周计划中抽取“今天任务”"""
-    today = datetime.now().date().isoformat()
-    for d in week_plan:
-        if d["日期"] == today:
-            return [{"title": t, "done": False} for t in d["任务"]]
-    if week_plan:
-        return [{"title": t, "done": False} for t in week_plan[0]["任务"]]
-    return []
-
-
-def update_streak(checkin: Dict):
+def trend_figure(frame: pd.DataFrame, y_title: str, height: int, bands: bool, y_fmt: str = ".1f"):
     """
-    streak 规则：
-    - 若今天完成所有任务 → streak +1（与昨天连续则+1，否则重置为1）
-    - 若没完成，不变
+    趋势页折线图，frame 来自 trend_frames（带“模块”列时每个模块一条线）。
+    bands=True 时在均值线下画 最低~最高 的阴影带；每条线点数超过 TREND_WEBGL_MIN 时用 Scattergl。
     """
-    today = datetime.now().date()
-    today_str = today.isoformat()
-
-    tasks = checkin.get("today_tasks", [])
-    if not tasks:
-        return checkin
-
-    all_done = all(bool(x.get("done", False)) for x in tasks)
-    if not all_done:
-        return checkin
-
-    last = checkin.get("last_date", "")
-    if last:
-        try:
-            last_d = datetime.fromisoformat(last).date()
-        except Exception:
-            last_d = None
-    else:
-        last_d = None
-
-    if last_d is None:
-        checkin["streak"] = 1
-    else:
-        if (today - last_d).days == 1:
-            checkin["streak"] = int(checkin.get("streak", 0)) + 1
-        elif (today - last_d).days == 0:
-            checkin["streak"] = int(checkin.get("streak", 0))
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    groups = list(frame.groupby("模块", sort=False)) if "模块" in frame else [(y_title, frame)]
+    palette = px.colors.qualitative.Plotly
+    raw = "试卷" in frame
+    fig = go.Figure()
+    for i, (name, g) in enumerate(groups):
+        color = palette[i % len(palette)]
+        trace = go.Scattergl if len(g) > TREND_WEBGL_MIN else go.Scatter
+        if bands:
+            r, gr, b = (int(color[j:j + 2], 16) for j in (1, 3, 5))
+            fig.add_trace(trace(
+                x=g["时间"], y=g["最低"], mode="lines", line=dict(width=0),
+                legendgroup=name, showlegend=False, hoverinfo="skip",
+            ))
+            fig.add_trace(trace(
+                x=g["时间"], y=g["最高"], mode="lines", line=dict(width=0), fill="tonexty",
+                fillcolor=f"rgba({r},{gr},{b},0.15)", legendgroup=name, showlegend=False, hoverinfo="skip",
+            ))
+        if raw:
+            custom = g[["试卷"]].to_numpy()
+            hover = f"%{{x|%Y-%m-%d}} %{{customdata[0]}}<br>{name} %{{y:{y_fmt}}}<extra></extra>"
         else:
-            checkin["streak"] = 1
+            custom = g[["套数", "最低", "最高"]].to_numpy()
+            hover = (
+                f"%{{x|%Y-%m-%d}} 起 · %{{customdata[0]}} 套<br>{name} 均值 %{{y:{y_fmt}}}"
+                f"（%{{customdata[1]:{y_fmt}}} ~ %{{customdata[2]:{y_fmt}}}）<extra></extra>"
+            )
+        text = raw and len(g) <= TREND_TEXT_MAX and len(groups) == 1
+        fig.add_trace(trace(
+            x=g["时间"], y=g["均值"], name=name, legendgroup=name, line=dict(color=color),
+            mode="lines+markers+text" if text else "lines+markers",
+            text=g["均值"] if text else None, textposition="top center",
+            customdata=custom, hovertemplate=hover,
+        ))
+    fig.update_layout(
+        height=height, margin=dict(t=10, b=10), xaxis_title="", yaxis_title=y_title,
+        showlegend=len(groups) > 1,
+    )
+    return fig
 
-    checkin["last_date"] = today_str
-    return checkin
 
+# ============ 做题计时器：翻页钟（浏览器端走秒） ============
+# 计时状态（timer_start_ts / timer_elapsed_sec，按 time.monotonic 计，改系统时间不影响）仍由服务端维护；
+# 这里只把“渲染那一刻的已用时”交给浏览器，由 JS 自己每秒刷新数字，运行中不再需要整页 rerun。
+FLIP_CLOCK_CSS = """
+<style>
+html, body { margin:0; background:transparent; }
+.flip-clock-wrapper {
+    display:flex;
+    gap:12px;
+    justify-content:center;
+    align-items:center;
+}
+.flip-card {
+    background:#000;
+    border-radius:16px;
+    box-shadow:0 16px 40px rgba(0,0,0,0.7);
+    padding:8px 10px;
+}
+.flip-card-inner {
+    position:relative;
+    color:#f5f5f5;
+    font-family:"SF Mono","Consolas","Menlo",monospace;
+    font-weight:800;
+    display:flex;
+    justify-content:center;
+    align-items:center;
+    padding:0 22px;
+}
+/* 中间分割线：模拟上下两半的翻页 */
+.flip-card-inner::before {
+    content:"";
+    position:absolute;
+    left:0;
+    right:0;
+    top:50%;
+    height:1px;
+    background:rgba(255,255,255,0.22);
+}
+/* 简单的上下明暗渐变，增加“翻页块”质感 */
+.flip-card-inner::after {
+    content:"";
+    position:absolute;
+    left:0;
+    right:0;
+    top:0;
+    bottom:0;
+    background:linear-gradient(
+        to bottom,
+        rgba(255,255,255,0.10),
+        transparent 46%,
+        transparent 54%,
+        rgba(0,0,0,0.45)
+    );
+    border-radius:16px;
+    opacity:0.9;
+    pointer-events:none;
+}
+.flip-digit-large { font-size:90px; }
+.flip-digit-xlarge { font-size:150px; }
+.flip-separator {
+    color:#f5f5f5;
+    font-family:"SF Mono","Consolas","Menlo",monospace;
+    font-weight:800;
+    margin:0 4px;
+}
+.flip-separator-large { font-size:90px; }
+.flip-separator-xlarge { font-size:150px; }
+</style>
+"""
 
-def review_analytics(rdf: pd.DataFrame, days: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """
-    返回：
-    - 错因汇总（不会/不熟/审题坑）
-    - 模块错题数 Top
+
+def render_flip_clock(elapsed: float, running: bool, focus_mode: bool) -> str:
+    """翻页风格大计时器（mm:ss）的完整 HTML，供 components.html 在 iframe 里渲染"""
+    digit_class = "flip-digit-xlarge" if focus_mode else "flip-digit-large"
+    sep_class = "flip-separator-xlarge" if focus_mode else "flip-separator-large"
+    container_style = (
+        "height:100vh;display:flex;align-items:center;justify-content:center;"
+        if focus_mode
+        else "margin:26px 0;display:flex;justify-content:center;"
+    )
+    mm, ss = divmod(int(elapsed), 60)
+    return f"""
+    {FLIP_CLOCK_CSS}
+    <div style='{container_style}'>
+      <div class="flip-clock-wrapper">
+        <div class="flip-card">
+          <div class="flip-card-inner {digit_class}" id="mm">{mm:02d}</div>
+        </div>
+        <div class="{sep_class}">:</div>
+        <div class="flip-card">
+          <div class="flip-card-inner {digit_class}" id="ss">{ss:02d}</div>
+        </div>
+      </div>
+    </div>
+    <script>
+    (function() {{
+      const base = {float(elapsed)};
+      const running = {"true" if running else "false"};
+      if (!running) return;
+      const t0 = performance.now();
+      const mmEl = document.getElementById("mm");
+      const ssEl = document.getElementById("ss");
+      const pad = (n) => String(n).padStart(2, "0");
+      function tick() {{
+        const e = Math.floor(base + (performance.now() - t0) / 1000);
+        mmEl.textContent = pad(Math.floor(e / 60));
+        ssEl.textContent = pad(e % 60);
+      }}
+      setInterval(tick, 250);
+    }})();
+    </script>
     """
-    if rdf.empty:
-        return pd.DataFrame(), pd.DataFrame()
-    cutoff = datetime.now().date() - timedelta(days=days)
-    x = rdf.copy()
-    try:
-        x["日期"] = pd.to_datetime(x["日期"]).dt.date
-    except Exception:
-        pass
-    x = x[x["日期"] >= cutoff]
-
-    if x.empty:
-        return pd.DataFrame(), pd.DataFrame()
-
-    cause = pd.DataFrame([{
-        "错因": "不会", "数量": pd.to_numeric(x["错因1_知识点不会"], errors="coerce").fillna(0).sum()
-    }, {
-        "错因": "不熟", "数量": pd.to_numeric(x["错因2_方法不熟"], errors="coerce").fillna(0).sum()
-    }, {
-        "错因": "审题坑", "数量": pd.to_numeric(x["错因3_审题选项坑"], errors="coerce").fillna(0).sum()
-    }])
-
-    mod = x.copy()
-    mod["错题数"] = pd.to_numeric(mod["错题数"], errors="coerce").fillna(0)
-    mod_sum = mod.groupby("模块", as_index=False)["错题数"].sum().sort_values("错题数", ascending=False).head(10)
-
-    return cause, mod_sum
 
 
 # =========================================================
@@ -1030,6 +759,7 @@ if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 
 if not st.session_state.logged_in:
+    perf_set_page("🔑 登录")
     c1, c2 = st.columns([1, 1.2])
     with c1:
         st.markdown("""
@@ -1054,10 +784,10 @@ if not st.session_state.logged_in:
             u = st.text_input("账号", key="l_u")
             p = st.text_input("密码", type="password", key="l_p")
             if st.button("进入系统", type="primary", use_container_width=True):
-                users = load_users()
-                if u in users and users[u]["password"] == hash_pw(p):
+                info = get_user(u) if u else None
+                if info is not None and info["password"] == hash_pw(p):
                     st.session_state.logged_in = True
-                    st.session_state.u_info = {"un": u, **users[u]}
+                    st.session_state.u_info = {"un": u, **info}
                     st.rerun()
                 else:
                     st.error("账号或密码错误")
@@ -1066,25 +796,105 @@ if not st.session_state.logged_in:
             nn = st.text_input("昵称", key="r_n")
             npw = st.text_input("密码", type="password", key="r_p")
             if st.button("完成注册", use_container_width=True):
-                users = load_users()
-                if nu in users:
+                if nu and get_user(nu) is not None:
                     st.error("账号已存在")
                 elif nu and nn and npw:
-                    users[nu] = {"name": nn, "password": hash_pw(npw), "role": "user"}
-                    save_users(users)
-                    st.success("注册成功！请切回登录。")
+                    if create_user(nu, {"name": nn, "password": hash_pw(npw), "role": "user"}):
+                        st.success("注册成功！请切回登录。")
+                    else:
+                        st.error("账号已存在")
         st.markdown("</div>", unsafe_allow_html=True)
+    perf_mark("page")
+    perf_total()
     st.stop()
 
+# 登录之后才需要的重型依赖（登录页不加载，首屏更快）
+import pandas as pd
+import numpy as np
+
+from xingce.answers import (
+    apply_laps,
+    frame_sheet,
+    lap_durations,
+    new_sheet,
+    over_limit,
+    sheet_frame,
+    sheet_totals,
+    wrong_numbers,
+)
+from xingce.analytics import (
+    TREND_FREQS,
+    TREND_MAX_POINTS,
+    agg_histogram,
+    build_paper_index,
+    compute_summary,
+    module_stats,
+    paper_top_modules,
+    rank_modules,
+    review_analytics,
+    search_reviews,
+    trend_auto_freq,
+    trend_frames,
+    trend_window,
+)
+from xingce.cache import loader_cache_stats
+from xingce.cohort import COHORT_REVIEW_DAYS, COHORT_SORTS, rank_cohort, refresh_cohort
+from xingce.fileio import LOCK_CONTENDED_MS, lock_wait_stats
+from xingce.planning import (
+    build_week_plan,
+    compute_next_day_plan,
+    get_today_tasks_from_week_plan,
+    latest_paper_type,
+    module_tip,
+    project_module_gains,
+    update_streak,
+)
+from xingce.report import paper_summary_md, week_plan_md
+from xingce.schema import new_paper_id, records_plain
+from xingce.timer import LAP_MODULE_END, replay_timer, timer_event
+from xingce.storage import (
+    append_record,
+    append_timer_event,
+    clear_timer_events,
+    compact_data,
+    data_log_size,
+    data_version,
+    delete_records,
+    export_all_bundles,
+    export_user_bundle,
+    import_user_bundle,
+    load_answers,
+    load_checkin,
+    load_data,
+    load_reviews,
+    load_strategy,
+    load_timer_events,
+    migrate_files_to_sqlite,
+    pop_export,
+    record_aggregates,
+    review_index_sync,
+    save_answers,
+    save_checkin,
+    save_reviews,
+    save_strategy,
+)
+
 # =========================================================
 # 6. 主体加载
 # =========================================================
 un = st.session_state.u_info["un"]
 role = st.session_state.u_info["role"]
+perf_mark("init")
+# 版本号先于数据读取：读的过程中有人写入时，图表缓存宁可多重画一次也不会把新数据记在旧版本下
+data_ver = {k: data_version(un, k) for k in ("records", "reviews", "answers")}
 df = load_data(un)
+mstats = module_stats(df)
+pidx = build_paper_index(df)
+agg = record_aggregates(un, df, mstats)
 rdf = load_reviews(un)
 strategy = load_strategy(un)
 checkin = load_checkin(un)
+perf_mark("loaders")
 
 # 侧边栏
 with st.sidebar:
@@ -1113,12 +923,17 @@ with st.sidebar:
     if st.button("安全退出", use_container_width=True):
         st.session_state.logged_in = False
         st.rerun()
+perf_set_page(menu)
+perf_mark("sidebar")
 
 # =========================================================
 # 7. 各页面
 # =========================================================
 # ------------------- 数字化看板 -------------------
 if menu == "🏠 数字化看板":
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     st.markdown("""
     <div class="hero">
       <div class="hero-title">📊 数字化看板</div>
@@ -1129,7 +944,7 @@ if menu == "🏠 数字化看板":
     if df.empty:
         st.info("👋 你还没有录入任何模考。先去【✏️ 录入成绩】录一套，系统会自动生成复盘建议。")
     else:
-        latest, delta, acc = compute_summary(df)
+        latest, delta, acc = compute_summary(agg)
         delta_txt = f"较上次 {delta:+.1f}" if delta is not None else "首套记录"
 
         st.markdown(f"""
@@ -1152,29 +967,27 @@ if menu == "🏠 数字化看板":
             </div>
             <div class="kpi">
               <div class="k">近5次均分</div>
-              <div class="v">{df.tail(5)['总分'].mean():.1f}</div>
-              <div class="d">累计套数 {len(df)}</div>
+              <div class="v">{np.mean(agg['scores']):.1f}</div>
+              <div class="d">累计套数 {agg['n']} · 最高 {agg['best']:.1f}</div>
             </div>
           </div>
         </div>
         """, unsafe_allow_html=True)
 
         # 自动复盘一眼看：最低正确率 & 最大超时
-        stats = []
-        for m in LEAF_MODULES:
-            accm = float(latest.get(f"{m}_正确率", 0))
-            t = float(latest.get(f"{m}_用时", 0))
-            plan = float(latest.get(f"{m}_计划用时", PLAN_TIME.get(m, 0)))
-            stats.append((m, accm, (t-plan) if plan else 0))
-        worst_acc = sorted(stats, key=lambda x: x[1])[0]
-        worst_time = sorted(stats, key=lambda x: x[2], reverse=True)[0]
+        acc_last, over_last = agg["window"]["正确率"][-1], agg["window"]["超时"][-1]
+        acc_ewma, over_ewma = agg["ewma"]["正确率"], agg["ewma"]["超时"]
+        ia = rank_modules(acc_last, 1)[0]
+        it = rank_modules(over_last, 1, descending=True)[0]
+        worst_acc = (LEAF_MODULES[ia], acc_last[ia], over_last[ia])
+        worst_time = (LEAF_MODULES[it], acc_last[it], over_last[it])
 
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         c1, c2 = st.columns(2)
         with c1:
-            st.warning(f"🎯 当前短板：{worst_acc[0]}（正确率 {worst_acc[1]:.0%}）")
+            st.warning(f"🎯 当前短板：{worst_acc[0]}（正确率 {worst_acc[1]:.0%}，近期加权 {acc_ewma[ia]:.0%}）")
         with c2:
-            st.warning(f"⏱️ 时间黑洞：{worst_time[0]}（超时 {worst_time[2]:.0f} 分钟）")
+            st.warning(f"⏱️ 时间黑洞：{worst_time[0]}（超时 {worst_time[2]:.0f} 分钟，近期加权 {over_ewma[it]:.1f}）")
         st.markdown("</div>", unsafe_allow_html=True)
 
         # 图表
@@ -1182,42 +995,72 @@ if menu == "🏠 数字化看板":
         with col_l:
             st.markdown("<div class='card'>", unsafe_allow_html=True)
             st.markdown("<div class='mini-header'>能力雷达</div>", unsafe_allow_html=True)
-            fig = go.Figure(go.Scatterpolar(
-                r=[float(latest.get(f"{m}_正确率", 0)) for m in LEAF_MODULES],
-                theta=LEAF_MODULES, fill="toself"
-            ))
-            fig.update_layout(
-                polar=dict(radialaxis=dict(visible=True, range=[0, 1], tickfont=dict(size=9))),
-                height=350, margin=dict(t=20, b=10, l=30, r=30)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+
+            def _radar():
+                fig = go.Figure(go.Scatterpolar(
+                    r=acc_last.tolist(),
+                    theta=LEAF_MODULES, fill="toself"
+                ))
+                fig.update_layout(
+                    polar=dict(radialaxis=dict(visible=True, range=[0, 1], tickfont=dict(size=9))),
+                    height=350, margin=dict(t=20, b=10, l=30, r=30)
+                )
+                return fig
+
+            perf_chart(cached_figure(un, data_ver["records"], "能力雷达", _radar), "能力雷达", use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
 
         with col_r:
             st.markdown("<div class='card'>", unsafe_allow_html=True)
             st.markdown("<div class='mini-header'>分数稳定性</div>", unsafe_allow_html=True)
-            fig_hist = px.histogram(df, x="总分", nbins=10)
-            fig_hist.update_layout(height=350, margin=dict(t=10, b=10), xaxis_title="分数区间", yaxis_title="次数")
-            st.plotly_chart(fig_hist, use_container_width=True)
+
+            def _hist():
+                fig_hist = px.bar(agg_histogram(agg), x="分数区间", y="次数")
+                fig_hist.update_layout(height=350, margin=dict(t=10, b=10), xaxis_title="分数区间", yaxis_title="次数")
+                return fig_hist
+
+            perf_chart(cached_figure(un, data_ver["records"], "分数分布", _hist), "分数分布", use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
 
         # 复盘错因统计（过去N天）
+        # 统计窗口按天滑动，所以“今天”也是缓存参数；两张图共用一次统计，只在未命中时才算
         days = int(strategy.get("复盘_统计天数", 30))
-        cause_df, mod_df = review_analytics(rdf, days)
+        review_params = (days, datetime.now().date().isoformat())
+        review_stats = []
+
+        def _review_stats():
+            if not review_stats:
+                review_stats.extend(review_analytics(rdf, days))
+            return review_stats
+
+        def _cause_pie():
+            cause_df, _ = _review_stats()
+            if cause_df.empty:
+                return None
+            figc = px.pie(cause_df, values="数量", names="错因", hole=0.45)
+            figc.update_layout(height=320, margin=dict(t=10, b=10))
+            return figc
+
+        def _module_bar():
+            cause_df, mod_df = _review_stats()
+            if cause_df.empty:
+                return None
+            figm = px.bar(mod_df, x="错题数", y="模块", orientation="h")
+            figm.update_layout(height=320, margin=dict(t=10, b=10))
+            return figm
+
+        figc = cached_figure(un, data_ver["reviews"], "错因占比", _cause_pie, review_params)
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown(f"<div class='mini-header'>复盘错因统计（近 {days} 天）</div>", unsafe_allow_html=True)
-        if cause_df.empty:
+        if figc is None:
             st.caption("暂无复盘记录。去【🧠 复盘记录】填几条，系统会自动画图。")
         else:
             cc1, cc2 = st.columns([1, 1.15])
             with cc1:
-                figc = px.pie(cause_df, values="数量", names="错因", hole=0.45)
-                figc.update_layout(height=320, margin=dict(t=10, b=10))
-                st.plotly_chart(figc, use_container_width=True)
+                perf_chart(figc, "错因占比", use_container_width=True)
             with cc2:
-                figm = px.bar(mod_df, x="错题数", y="模块", orientation="h")
-                figm.update_layout(height=320, margin=dict(t=10, b=10))
-                st.plotly_chart(figm, use_container_width=True)
+                figm = cached_figure(un, data_ver["reviews"], "模块错题", _module_bar, review_params)
+                perf_chart(figm, "模块错题", use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
 # ------------------- 单卷详情 -------------------
@@ -1234,9 +1077,9 @@ elif menu == "📑 单卷详情":
     else:
 
         # =============== 选择试卷 ===============
-        sel_list = df.apply(lambda x: f"{x['日期']} | {x['试卷']}", axis=1).tolist()[::-1]
-        sel = st.selectbox("选择历史模考", sel_list)
-        row = df[df.apply(lambda x: f"{x['日期']} | {x['试卷']}", axis=1) == sel].iloc[0]
+        sel = st.selectbox("选择历史模考", pidx["ids"], format_func=pidx["label"].get)
+        pos = pidx["pos"][sel]
+        row = df.iloc[pos]
 
         # =============== 顶部汇总 ===============
         st.markdown("<div class='card'>", unsafe_allow_html=True)
@@ -1248,17 +1091,7 @@ elif menu == "📑 单卷详情":
         st.markdown("</div>", unsafe_allow_html=True)
 
         # =============== 计算模块表现 ===============
-        stats = []
-        for m in LEAF_MODULES:
-            accm = float(row.get(f"{m}_正确率", 0))
-            t = float(row.get(f"{m}_用时", 0))
-            plan = float(row.get(f"{m}_计划用时", PLAN_TIME.get(m, 0)))
-            total = float(row.get(f"{m}_总题数", 0))
-            diff = (t - plan) if plan else 0
-            stats.append((m, accm, t, plan, total, diff))
-
-        worst_by_acc = sorted(stats, key=lambda x: x[1])[:3]
-        worst_by_time = sorted(stats, key=lambda x: x[5], reverse=True)[:3]
+        worst_by_acc, worst_by_time = paper_top_modules(mstats, pos)
 
         # =============== 左右两栏 Top3 ===============
         left, right = st.columns(2)
@@ -1363,17 +1196,61 @@ elif menu == "📑 单卷详情":
                 ), unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
 
+        # 逐题记录（录入时选了“逐题记录”才有）
+        answers = load_answers(un).get(sel)
+        if answers is not None:
+            st.markdown("<div class='card'>", unsafe_allow_html=True)
+            st.markdown("<div class='mini-header'>错题题号（含主动放弃）</div>", unsafe_allow_html=True)
+            missed = wrong_numbers(answers)
+            if missed:
+                for m, nums in missed.items():
+                    st.markdown(f"**{m}**：{'、'.join(str(q) for q in nums)}")
+            else:
+                st.markdown("全对 🎉")
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            # 逐题用时（计时器逐题计次或手填过用时才有）：超过策略里每题上限的标红
+            if answers["sec"].any():
+                over = over_limit(answers, strategy)
+
+                def _q_times():
+                    import plotly.graph_objects as go
+
+                    fig_q = go.Figure(go.Bar(
+                        x=answers["q"].tolist(),
+                        y=answers["sec"].round(1).tolist(),
+                        customdata=np.asarray(LEAF_MODULES)[answers["module"]].tolist(),
+                        marker_color=np.where(over, "#ef4444", "#94a3b8").tolist(),
+                        hovertemplate="第 %{x} 题 · %{customdata}<br>%{y:.0f} 秒<extra></extra>",
+                    ))
+                    fig_q.update_layout(
+                        height=280, margin=dict(t=10, b=10), bargap=0.15, xaxis_title="题号", yaxis_title="用时(秒)"
+                    )
+                    return fig_q
+
+                st.markdown("<div class='card'>", unsafe_allow_html=True)
+                st.markdown("<div class='mini-header'>逐题用时（红色 = 超过每题上限）</div>", unsafe_allow_html=True)
+                limits = (strategy.get("数量_每题上限秒"), strategy.get("逻辑_每题上限秒"))
+                perf_chart(
+                    cached_figure(un, data_ver["answers"], "逐题用时", _q_times, params=(sel, limits)),
+                    "逐题用时",
+                    use_container_width=True,
+                )
+                if over.any():
+                    slow = answers[over]
+                    st.caption("超过上限：" + "；".join(
+                        f"{m} 第 {'、'.join(str(q) for q in slow['q'][slow['module'] == i])} 题"
+                        for i, m in enumerate(LEAF_MODULES)
+                        if (slow["module"] == i).any()
+                    ))
+                st.markdown("</div>", unsafe_allow_html=True)
+
+            with st.expander("🧾 逐题记录", expanded=False):
+                st.dataframe(sheet_frame(answers), hide_index=True, use_container_width=True)
+
         # 导出当前卷复盘摘要，方便复制到笔记
         with st.expander("📤 导出本卷复盘摘要（复制到笔记）", expanded=False):
-            md = []
-            md.append(f"### {row['日期']} | {row['试卷']}")
-            md.append(f"- 得分：{float(row['总分']):.1f} | 正确率：{float(row['总正确数'])/max(float(row['总题数']),1):.1%} | 用时：{int(row['总用时'])}min")
-            md.append(f"- 明天训练：1）{tasks[0]}  2）{tasks[1]}  3）{tasks[2]}")
-            md.append("")
-            md.append("**模块Top问题（自动）**")
-            md.append(f"- 正确率最低：{', '.join([x[0] for x in worst_by_acc])}")
-            md.append(f"- 超时最多：{', '.join([x[0] for x in worst_by_time])}")
-            st.code("\n".join(md), language="markdown")
+            st.code(paper_summary_md(row, tasks, worst_by_acc, worst_by_time), language="markdown")
 
 # ------------------- 复盘记录 -------------------
 elif menu == "🧠 复盘记录":
@@ -1387,21 +1264,14 @@ elif menu == "🧠 复盘记录":
     if df.empty:
         st.info("你还没录入套卷，先去【✏️ 录入成绩】。")
     else:
-        sel_list = df.apply(lambda x: f"{x['日期']} | {x['试卷']}", axis=1).tolist()[::-1]
-        sel = st.selectbox("选择要复盘的套卷", sel_list)
-        row = df[df.apply(lambda x: f"{x['日期']} | {x['试卷']}", axis=1) == sel].iloc[0]
+        sel = st.selectbox("选择要复盘的套卷", pidx["ids"], format_func=pidx["label"].get)
+        pos = pidx["pos"][sel]
+        row = df.iloc[pos]
 
         # 系统建议优先复盘的模块
-        stats = []
-        for m in LEAF_MODULES:
-            accm = float(row.get(f"{m}_正确率", 0))
-            t = float(row.get(f"{m}_用时", 0))
-            plan = float(row.get(f"{m}_计划用时", PLAN_TIME.get(m, 0)))
-            stats.append((m, accm, (t - plan) if plan else 0))
-
         pick = []
-        pick += [x[0] for x in sorted(stats, key=lambda x: x[1])[:4]]
-        pick += [x[0] for x in sorted(stats, key=lambda x: x[2], reverse=True)[:2]]
+        pick += [LEAF_MODULES[i] for i in rank_modules(mstats["正确率"][pos], 4)]
+        pick += [LEAF_MODULES[i] for i in rank_modules(mstats["超时"][pos], 2, descending=True)]
         pick = list(dict.fromkeys(pick))
 
         st.markdown("<div class='card'>", unsafe_allow_html=True)
@@ -1412,7 +1282,7 @@ elif menu == "🧠 复盘记录":
         # 复盘表单
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         with st.form("review_form"):
-            date = row["日期"]
+            date = row["日期"].date()
             paper = row["试卷"]
             chosen = st.multiselect("选择要记录复盘的模块", LEAF_MODULES, default=pick)
 
@@ -1463,27 +1333,35 @@ elif menu == "🧠 复盘记录":
         if rdf.empty:
             st.caption("还没有复盘记录。")
         else:
-            f1, f2, f3 = st.columns([1, 1, 2])
+            ridx = review_index_sync(un, rdf)
+            f1, f2, f3, f4 = st.columns([1, 1, 1.2, 2])
             with f1:
-                f_paper = st.selectbox("按试卷筛选", ["全部"] + sorted(rdf["试卷"].dropna().astype(str).unique().tolist()))
+                f_paper = st.selectbox("按试卷筛选", ["全部"] + sorted(ridx["codes"]["paper"]))
             with f2:
                 f_mod = st.selectbox("按模块筛选", ["全部"] + LEAF_MODULES)
             with f3:
-                keyword = st.text_input("关键词搜索（原因/做法）", placeholder="例：基期、速算、转折、60秒…")
+                f_days = st.date_input("日期范围", value=(), format="YYYY-MM-DD")
+            with f4:
+                keyword = st.text_input(
+                    "关键词搜索（原因/做法）",
+                    placeholder="例：基期 速算（空格 = 同时包含）；转折 | 60秒（| = 任一）",
+                )
 
-            view = rdf.copy()
-            if f_paper != "全部":
-                view = view[view["试卷"].astype(str) == f_paper]
-            if f_mod != "全部":
-                view = view[view["模块"].astype(str) == f_mod]
+            f_days = tuple(f_days) if isinstance(f_days, (tuple, list)) else (f_days,)
+            hits = search_reviews(
+                ridx,
+                keyword,
+                paper=None if f_paper == "全部" else f_paper,
+                module=None if f_mod == "全部" else f_mod,
+                start=f_days[0] if len(f_days) > 0 else None,
+                end=f_days[1] if len(f_days) > 1 else (f_days[0] if f_days else None),
+            )
+            view = rdf.iloc[hits]
             if keyword.strip():
-                k = keyword.strip()
-                view = view[
-                    view["一句话原因"].astype(str).str.contains(k, na=False) |
-                    view["下次做法"].astype(str).str.contains(k, na=False)
-                ]
-            st.dataframe(view.sort_values(["日期", "试卷", "模块"], ascending=[False, False, True]),
-                         use_container_width=True, hide_index=True)
+                st.caption(f"命中 {len(hits)} 条，按相关度排序")
+            else:
+                view = view.sort_values(["日期", "试卷", "模块"], ascending=[False, False, True])
+            st.dataframe(view, use_container_width=True, hide_index=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
 # ------------------- 今日任务（可编辑） -------------------
@@ -1495,7 +1373,7 @@ elif menu == "✅ 今日任务":
     </div>
     """, unsafe_allow_html=True)
 
-    wp = build_week_plan(df, strategy) if not df.empty else []
+    wp = build_week_plan(agg, strategy, latest_paper_type(df))
     today_str = datetime.now().date().isoformat()
 
     # 如果还没生成今日任务，或日期变化，则刷新为自动周计划
@@ -1577,73 +1455,6 @@ elif menu == "⏱️ 做题计时器":
     </div>
     """, unsafe_allow_html=True)
 
-    # ============ Flip Clock 风格 CSS，模拟翻页钟视觉 ============
-    flip_css = """
-    <style>
-    .flip-clock-wrapper {
-        display:flex;
-        gap:12px;
-        justify-content:center;
-        align-items:center;
-    }
-    .flip-card {
-        background:#000;
-        border-radius:16px;
-        box-shadow:0 16px 40px rgba(0,0,0,0.7);
-        padding:8px 10px;
-    }
-    .flip-card-inner {
-        position:relative;
-        color:#f5f5f5;
-        font-family:"SF Mono","Consolas","Menlo",monospace;
-        font-weight:800;
-        display:flex;
-        justify-content:center;
-        align-items:center;
-        padding:0 22px;
-    }
-    /* 中间分割线：模拟上下两半的翻页 */
-    .flip-card-inner::before {
-        content:"";
-        position:absolute;
-        left:0;
-        right:0;
-        top:50%;
-        height:1px;
-        background:rgba(255,255,255,0.22);
-    }
-    /* 简单的上下明暗渐变，增加“翻页块”质感 */
-    .flip-card-inner::after {
-        content:"";
-        position:absolute;
-        left:0;
-        right:0;
-        top:0;
-        bottom:0;
-        background:linear-gradient(
-            to bottom,
-            rgba(255,255,255,0.10),
-            transparent 46%,
-            transparent 54%,
-            rgba(0,0,0,0.45)
-        );
-        border-radius:16px;
-        opacity:0.9;
-        pointer-events:none;
-    }
-    .flip-digit-large { font-size:90px; }
-    .flip-digit-xlarge { font-size:150px; }
-    .flip-separator {
-        color:#f5f5f5;
-        font-family:"SF Mono","Consolas","Menlo",monospace;
-        font-weight:800;
-        margin:0 4px;
-    }
-    .flip-separator-large { font-size:90px; }
-    .flip-separator-xlarge { font-size:150px; }
-    </style>
-    """
-    st.markdown(flip_css, unsafe_allow_html=True)
 
     # 1）整理所有“叶子模块”（实际做题粒度）
     leaf_modules = []
@@ -1668,6 +1479,23 @@ elif menu == "⏱️ 做题计时器":
     ]
     default_order = [m for m in default_order if m in leaf_modules]
 
+    # 刷新页面 / 断线重连 / 服务重启后：按会话日志恢复（本会话里已经有计时状态时以会话为准）
+    if "timer_running" not in st.session_state:
+        saved = replay_timer(load_timer_events(un))
+        if saved is not None:
+            if saved["order"]:
+                st.session_state.timer_order_modules = saved["order"]
+                st.session_state.timer_order_snapshot = saved["order"]
+            st.session_state.timer_running = saved["running"]
+            st.session_state.timer_elapsed_sec = saved["elapsed"]
+            st.session_state.timer_start_ts = time.monotonic() - saved["running_for"] if saved["running"] else None
+            st.session_state.timer_lap_index = saved["lap_index"]
+            st.session_state.timer_lap_data = saved["lap_data"]
+            st.session_state.timer_last_lap_total_sec = saved["last_lap_total"]
+            st.session_state.timer_q_stamps = array("d", saved["q_stamps"])
+            st.session_state.timer_q_codes = array("B", saved["q_codes"])
+            st.toast("已恢复上次没做完的计时")
+
     st.markdown("<div class='card'>", unsafe_allow_html=True)
 
     # ① 选择做题顺序
@@ -1677,7 +1505,8 @@ elif menu == "⏱️ 做题计时器":
     order = st.multiselect(
         "做题顺序（点击顺序 = 实际顺序）",
         options=leaf_modules,
-        default=default_order,
+        # 恢复计时时顺序已经写进 session_state，再给 default 会触发 Streamlit 的重复赋值警告
+        default=None if "timer_order_modules" in st.session_state else default_order,
         key="timer_order_modules",
     )
 
@@ -1698,6 +1527,9 @@ elif menu == "⏱️ 做题计时器":
             st.session_state.timer_running = False
             st.session_state.timer_start_ts = None
             st.session_state.timer_elapsed_sec = 0.0
+            st.session_state.timer_q_stamps = array("d")
+            st.session_state.timer_q_codes = array("B")
+            clear_timer_events(un)
 
         # ② 各模块计划用时（可修改）—— 用 expander 可折叠
         with st.expander("② 各模块计划用时（可手动修改）", expanded=True):
@@ -1747,6 +1579,11 @@ elif menu == "⏱️ 做题计时器":
             st.session_state.timer_lap_data = {}  # 模块 -> 秒
         if "timer_last_lap_total_sec" not in st.session_state:
             st.session_state.timer_last_lap_total_sec = 0.0
+        # 逐题计次缓冲：每点一次“下一题”记下计时器读数（秒）和所在模块下标，
+        # 模块完成时记一条 LAP_MODULE_END；一题 9 字节，整套卷也不到 2KB
+        if "timer_q_stamps" not in st.session_state:
+            st.session_state.timer_q_stamps = array("d")
+            st.session_state.timer_q_codes = array("B")
 
         # 专注模式：只显示翻页计时器 + 控制按钮
         focus_mode = st.checkbox(
@@ -1762,20 +1599,30 @@ elif menu == "⏱️ 做题计时器":
         if "timer_elapsed_sec" not in st.session_state:
             st.session_state.timer_elapsed_sec = 0.0
 
-        # 控制按钮：开始 / 暂停 / 重置 / 计次
-        c1, c2, c3, c4 = st.columns(4)
+        per_question = st.checkbox(
+            "⏭️ 逐题计次：每做完一题点一次「下一题」，记下每道题的用时",
+            value=False,
+            key="timer_per_q",
+        )
+
+        # 控制按钮：开始 / 暂停 / 重置 / 计次（逐题计次时多一个“下一题”）
+        btn_cols = st.columns(5 if per_question else 4)
+        c1, c2, c3, c4 = btn_cols[:4]
         start_clicked = c1.button("▶️ 开始 / 继续", use_container_width=True)
         pause_clicked = c2.button("⏸️ 暂停", use_container_width=True)
         reset_clicked = c3.button("⏹️ 重置计时", use_container_width=True)
         lap_clicked = c4.button("✅ 本模块完成 / 记录用时", use_container_width=True)
+        q_clicked = per_question and btn_cols[4].button("⏭️ 下一题", type="primary", use_container_width=True)
 
-        now_ts = time.time()
+        now_ts = time.monotonic()
 
         # 开始 / 继续
+        # 每次状态变化都追加一条事件到会话日志（见 xingce/timer.py），刷新 / 重启后回放恢复
         if start_clicked:
             if not st.session_state.timer_running:
                 st.session_state.timer_running = True
                 st.session_state.timer_start_ts = now_ts
+                append_timer_event(un, timer_event("start", st.session_state.timer_elapsed_sec, order=order))
 
         # 暂停
         if pause_clicked and st.session_state.timer_running:
@@ -1785,6 +1632,7 @@ elif menu == "⏱️ 做题计时器":
                     now_ts - st.session_state.timer_start_ts
                 )
                 st.session_state.timer_start_ts = None
+            append_timer_event(un, timer_event("pause", st.session_state.timer_elapsed_sec))
 
         # 重置
         if reset_clicked:
@@ -1794,6 +1642,9 @@ elif menu == "⏱️ 做题计时器":
             st.session_state.timer_last_lap_total_sec = 0.0
             st.session_state.timer_lap_index = 0
             st.session_state.timer_lap_data = {}
+            st.session_state.timer_q_stamps = array("d")
+            st.session_state.timer_q_codes = array("B")
+            clear_timer_events(un)
 
         # 当前总用时（秒）
         elapsed = st.session_state.timer_elapsed_sec
@@ -1810,6 +1661,16 @@ elif menu == "⏱️ 做题计时器":
                 st.session_state.timer_lap_data[module_name] = lap_dur
                 st.session_state.timer_last_lap_total_sec = elapsed
                 st.session_state.timer_lap_index = current_idx + 1
+                st.session_state.timer_q_stamps.append(elapsed)
+                st.session_state.timer_q_codes.append(LAP_MODULE_END)
+                append_timer_event(un, timer_event("lap", elapsed, mod=module_name, order=order))
+
+        # 逐题计次：只在计时中、且还有模块没做完时记
+        if q_clicked and st.session_state.timer_running and st.session_state.timer_lap_index < len(order):
+            code = LEAF_MODULES.index(order[st.session_state.timer_lap_index])
+            st.session_state.timer_q_stamps.append(elapsed)
+            st.session_state.timer_q_codes.append(code)
+            append_timer_event(un, timer_event("q", elapsed, code=code))
 
         # ---------- 生成“计划 vs 实际”表 ----------
         rows_for_show = []
@@ -1834,40 +1695,35 @@ elif menu == "⏱️ 做题计时器":
             )
         actual_df = _pd.DataFrame(rows_for_show)
 
-        # ---------- 翻页风格大计时器（mm:ss） ----------
-        elapsed_int = int(elapsed)
-        mm, ss = divmod(elapsed_int, 60)
-
-        digit_class = "flip-digit-xlarge" if focus_mode else "flip-digit-large"
-        sep_class = "flip-separator-xlarge" if focus_mode else "flip-separator-large"
-
-        container_style = (
-            "height:calc(100vh - 140px);display:flex;align-items:center;justify-content:center;"
-            if focus_mode
-            else "margin:26px 0;display:flex;justify-content:center;"
+        # ---------- 翻页风格大计时器（mm:ss，浏览器端走秒） ----------
+        components.html(
+            render_flip_clock(elapsed, st.session_state.timer_running, focus_mode),
+            height=620 if focus_mode else 240,
         )
 
-        timer_html = f"""
-        <div style='{container_style}'>
-          <div class="flip-clock-wrapper">
-            <div class="flip-card">
-              <div class="flip-card-inner {digit_class}">{mm:02d}</div>
-            </div>
-            <div class="{sep_class}">:</div>
-            <div class="flip-card">
-              <div class="flip-card-inner {digit_class}">{ss:02d}</div>
-            </div>
-          </div>
-        </div>
-        """
-        st.markdown(timer_html, unsafe_allow_html=True)
-
         # ---------- 实际用时表（可折叠） ----------
         if not focus_mode:
             with st.expander("③ 实际用时（按模块自动记录）", expanded=True):
                 st.dataframe(actual_df, use_container_width=True, hide_index=True)
                 st.caption("完成一个模块时点一次「本模块完成 / 记录用时」，系统会自动把该段时间记到当前模块。")
 
+            if per_question:
+                q_secs = lap_durations(st.session_state.timer_q_stamps, st.session_state.timer_q_codes)
+                with st.expander("④ 逐题用时（秒）", expanded=True):
+                    if st.session_state.timer_lap_index < len(order):
+                        cur = order[st.session_state.timer_lap_index]
+                        st.caption(f"当前模块：{cur} ｜ 已记 {len(q_secs.get(cur, []))} 题")
+                    if q_secs:
+                        st.dataframe(
+                            _pd.DataFrame([
+                                {"模块": m, "题数": len(d), "均值": round(float(d.mean()), 1),
+                                 "最长": round(float(d.max()), 1), "各题": " ".join(f"{x:.0f}" for x in d)}
+                                for m, d in q_secs.items()
+                            ]),
+                            use_container_width=True,
+                            hide_index=True,
+                        )
+
         # ---------- 一键导入到「录入成绩」 ----------
         def _build_timer_export(plan_rows, lap_data):
             plan_minutes = {r["模块"]: r["计划用时(min)"] for r in plan_rows}
@@ -1884,39 +1740,61 @@ elif menu == "⏱️ 做题计时器":
             st.session_state["timer_to_input"] = {
                 "plan": plan_minutes,
                 "actual": actual_minutes,
+                "laps": (
+                    st.session_state.timer_q_stamps.tolist(),
+                    st.session_state.timer_q_codes.tolist(),
+                ),
             }
             # 修改侧边栏菜单选项（依赖上面给 menu 设置了 key="menu"）
             st.session_state["menu"] = "✏️ 录入成绩"
-            st.success("已将本次计划用时 & 实际用时写入缓存，并跳转到「✏️ 录入成绩」。")
+            st.success("已将本次计划用时 & 实际用时（及逐题用时）写入缓存，并跳转到「✏️ 录入成绩」。")
             st.rerun()
 
         st.markdown("</div>", unsafe_allow_html=True)
 
-        # 自动刷新形成“正计时”效果
-        if st.session_state.timer_running:
-            time.sleep(1)
-            st.rerun()
-
 
 # ------------------- 本周训练计划 -------------------
 elif menu == "🗓️ 本周训练计划":
     st.markdown("""
     <div class="hero">
       <div class="hero-title">🗓️ 本周训练计划</div>
-      <div class="hero-sub">系统基于最近 3 套卷：自动挑出短板&时间黑洞，并生成 7 天可执行清单。</div>
+      <div class="hero-sub">系统基于最近 3 套卷估算每个模块练一天能涨几分，把 7 天分给最划算的模块，生成可执行清单。</div>
     </div>
     """, unsafe_allow_html=True)
 
     if df.empty:
         st.info("还没有成绩数据，先去【录入成绩】。")
     else:
-        wp = build_week_plan(df, strategy)
+        paper_type = latest_paper_type(df)
+        wp = build_week_plan(agg, strategy, paper_type)
 
         # ---------- 生成规则说明 ----------
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("<div class='mini-header'>生成规则</div>", unsafe_allow_html=True)
-        st.write("每天固定三件事：**资料速算 15min** + **言语填空 20题** + **短板/超时专项**。")
+        st.write("每天固定三件事：**资料速算 15min** + **言语填空 20题** + **重点模块专项**。")
+        st.caption(
+            "重点模块按预计提分分配：模块分值（题量 × 每题分）、离满分的差距、最近 3 套的正确率走势、超时分钟"
+            "一起估出练一天能涨几分，同一模块练得越多收益越递减，7 天依次给当下最划算的模块。"
+        )
         st.caption("你可以在【策略设置】里调上限（数量秒 / 资料分钟 / 逻辑秒）与放弃策略。")
+        with st.expander("📈 各模块预计提分（练一天专项）", expanded=False):
+            proj = project_module_gains(agg, paper_type)
+            days = pd.Series([d["重点模块"] for d in wp]).value_counts()
+            st.dataframe(
+                pd.DataFrame({
+                    "模块": LEAF_MODULES,
+                    "近3套正确率": proj["正确率"].round(3),
+                    "正确率斜率(每套)": proj["斜率"].round(3),
+                    "近3套超时(min)": proj["超时"].round(1),
+                    "分值": proj["分值"].round(1),
+                    "每分钟提分": proj["每分钟"].round(4),
+                    "本周天数": [int(days.get(m, 0)) for m in LEAF_MODULES],
+                }).sort_values("每分钟提分", ascending=False),
+                use_container_width=True,
+                hide_index=True,
+            )
+            tpl_name = paper_type if paper_type in PAPER_TEMPLATES else next(iter(PAPER_TEMPLATES))
+            st.caption(f"分值按「{tpl_name}」模板计算。")
         st.markdown("</div>", unsafe_allow_html=True)
 
         # ---------- 7 天任务清单（这里改成可编辑） ----------
@@ -1924,7 +1802,7 @@ elif menu == "🗓️ 本周训练计划":
         st.markdown("<div class='mini-header'>7 天任务清单</div>", unsafe_allow_html=True)
 
         for idx, d in enumerate(wp):
-            with st.expander(f"📅 {d['日期']}  | 重点：{d['重点模块']}", expanded=False):
+            with st.expander(f"📅 {d['日期']}  | 重点：{d['重点模块']}（预计 +{d['预计提分']:.1f} 分）", expanded=False):
                 # 系统自动生成的默认文本
                 default_text = "\n".join([f"- {x}" for x in d["任务"]])
 
@@ -1942,12 +1820,7 @@ elif menu == "🗓️ 本周训练计划":
 
         # ---------- 导出周计划（原有功能，保持不变） ----------
         with st.expander("📤 导出周计划（复制到备忘录）", expanded=False):
-            lines = ["## 本周训练计划（自动生成）"]
-            for d in wp:
-                lines.append(f"\n### {d['日期']}（重点：{d['重点模块']}）")
-                for t in d["任务"]:
-                    lines.append(f"- {t}")
-            st.code("\n".join(lines), language="markdown")
+            st.code(week_plan_md(wp), language="markdown")
 
     # ---------- 新增：行测数据复盘 GPT Prompt，一键复制 ----------
     st.markdown("<div class='card'>", unsafe_allow_html=True)
@@ -2107,28 +1980,70 @@ elif menu == "📊 趋势分析":
     if df.empty:
         st.info("暂无数据")
     else:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        plot_df = df.copy()
-        plot_df["场次"] = plot_df.apply(lambda x: f"{x['日期']}\n{x['试卷']}", axis=1)
-
-        fig = px.line(plot_df, x="场次", y="总分", markers=True, text="总分")
-        fig.update_traces(textposition="top center")
-        fig.update_layout(height=380, margin=dict(t=10, b=10), xaxis_title="", yaxis_title="总分")
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.markdown("<div class='mini-header'>模块正确率波动</div>", unsafe_allow_html=True)
-        module_cols = [f"{m}_正确率" for m in LEAF_MODULES if f"{m}_正确率" in plot_df.columns]
-        if module_cols:
-            module_trends = plot_df[["场次"] + module_cols].melt(id_vars="场次", var_name="模块", value_name="正确率")
-            module_trends["模块"] = module_trends["模块"].str.replace("_正确率", "")
-            fig2 = px.line(module_trends, x="场次", y="正确率", color="模块", markers=True)
-            fig2.update_layout(height=360, margin=dict(t=10, b=10), yaxis_title="正确率")
-            st.plotly_chart(fig2, use_container_width=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        # 时间窗口 + 粒度：长历史按周 / 月分桶，每条线的点数有上限，图表大小不随历史变长
+        w1, w2, w3 = st.columns([1.2, 1, 2])
+        with w1:
+            t_days = st.date_input("时间窗口（留空 = 全部）", value=(), format="YYYY-MM-DD", key="trend_win")
+        with w2:
+            gran = st.selectbox("粒度", ["自动", "逐套"] + list(TREND_FREQS), key="trend_gran")
+        with w3:
+            t_mods = st.multiselect("模块", LEAF_MODULES, default=LEAF_MODULES, key="trend_mods")
+
+        t_days = tuple(t_days) if isinstance(t_days, (tuple, list)) else (t_days,)
+        t_start = t_days[0] if len(t_days) > 0 else None
+        t_end = t_days[1] if len(t_days) > 1 else t_start
+        positions = trend_window(df, t_start, t_end)
+        freq = trend_auto_freq(df, positions) if gran == "自动" else TREND_FREQS.get(gran)
+        freq_name = next((k for k, v in TREND_FREQS.items() if v == freq), "逐套")
+
+        if len(positions) == 0:
+            st.info("这个时间窗口里没有成绩记录。")
+        else:
+            params = (str(t_start), str(t_end), freq)
+            frames = []
+
+            def _frames():
+                # 两张图共用一次分桶，只在未命中缓存时才算
+                if not frames:
+                    frames.extend(trend_frames(df, mstats, positions, freq))
+                return frames
+
+            def _score_line():
+                score_df, _, _ = _frames()
+                return trend_figure(score_df, "总分", 380, bands=freq is not None)
+
+            def _module_lines():
+                _, module_df, _ = _frames()
+                sel = module_df[module_df["模块"].isin(t_mods)]
+                if sel.empty:
+                    return None
+                return trend_figure(
+                    sel, "正确率", 360, bands=freq is not None and len(t_mods) <= 3, y_fmt=".0%"
+                )
+
+            st.markdown("<div class='card'>", unsafe_allow_html=True)
+            cap = f"窗口内 {len(positions)} 套卷 · {freq_name}"
+            if freq is not None:
+                cap += "（线为均值，阴影为最低~最高；模块图选 3 个以内模块时显示阴影）"
+            elif len(positions) > TREND_MAX_POINTS:
+                cap += f"（只画最近 {TREND_MAX_POINTS} 套，更早的请缩小窗口或按周 / 月查看）"
+            st.caption(cap)
+            perf_chart(
+                cached_figure(un, data_ver["records"], "总分趋势", _score_line, params),
+                "总分趋势", use_container_width=True,
+            )
+
+            st.markdown("<div class='mini-header'>模块正确率波动</div>", unsafe_allow_html=True)
+            fig2 = cached_figure(un, data_ver["records"], "模块正确率", _module_lines, params + (tuple(t_mods),))
+            if fig2 is None:
+                st.caption("至少选一个模块。")
+            else:
+                perf_chart(fig2, "模块正确率", use_container_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
 
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("<div class='mini-header'>历史成绩明细</div>", unsafe_allow_html=True)
-        display_df = df[["日期", "试卷", "总分", "总正确数", "总题数", "总用时"]].copy()
+        display_df = records_plain(df.iloc[positions][["日期", "试卷", "总分", "总正确数", "总题数", "总用时"]])
         display_df["正确率"] = (display_df["总正确数"] / display_df["总题数"]).map(lambda x: f"{x:.1%}" if x else "0.0%")
         st.dataframe(display_df.sort_values("日期", ascending=False), use_container_width=True, hide_index=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -2156,6 +2071,24 @@ elif menu == "✏️ 录入成绩":
     per_score = tpl_cfg["weight"]
 
     st.caption(f"当前选择：{paper_type} ｜ 每题 {per_score} 分")
+
+    # 计时器「导入到录入成绩」带过来的：各模块计划 / 实际用时（分钟）和逐题计次
+    timer_in = st.session_state.get("timer_to_input") or {}
+    timer_plan, timer_act = timer_in.get("plan", {}), timer_in.get("actual", {})
+    timer_laps = timer_in.get("laps") or ([], [])
+    has_q_laps = any(c != LAP_MODULE_END for c in timer_laps[1])
+    if timer_in:
+        st.info(
+            "已带入计时器的用时" + ("（含逐题用时，默认用逐题记录）" if has_q_laps else "") + "，存档后自动清除。"
+        )
+    entry_mode = st.radio(
+        "录入方式",
+        ["按模块填合计", "逐题记录"],
+        index=1 if has_q_laps else 0,
+        horizontal=True,
+        key="entry_mode",
+        help="逐题记录：逐题勾对错 / 跳过 / 蒙猜，单卷详情里能看到错题题号，模块合计自动算。",
+    )
     st.divider()
 
     # ② 录入表单
@@ -2199,119 +2132,143 @@ elif menu == "✏️ 录入成绩":
 
         tc, tq, tt, ts = 0, 0, 0, 0  # 总正确数 / 总题数 / 总用时 / 总分
 
-        # ③ 逐模块录入
-        for m, config in MODULE_STRUCTURE.items():
-            if config["type"] == "direct":
-                leaf_name = m
-                # 题量：优先用模板的配置，没有就用 MODULE_STRUCTURE 默认
-                total_q = int(tpl_totals.get(leaf_name, config.get("total", 0)))
-
-                st.markdown(f"**📌 {m}**")
-                a, b, c = st.columns([1, 1, 1])
-                mq = a.number_input("对题数", 0, total_q, 0, key=f"q_{m}")
-                mt = b.number_input(
-                    "实际用时(min)",
-                    0.0, 180.0,
-                    float(PLAN_TIME.get(m, 5.0)),
-                    step=0.5,
-                    key=f"t_{m}",
-                )
-                mp = c.number_input(
-                    "计划用时(min)",
-                    0.0, 180.0,
-                    float(PLAN_TIME.get(m, 5.0)),
-                    step=0.5,
-                    key=f"p_{m}",
-                )
-
-                entry[f"{m}_总题数"] = total_q
-                entry[f"{m}_正确数"] = mq
-                entry[f"{m}_用时"] = mt
-                entry[f"{m}_正确率"] = mq / total_q if total_q > 0 else 0
-                entry[f"{m}_计划用时"] = mp
-
-                # 数量关系 / 资料分析：可选的“主动放弃 & 蒙猜”
-                if m == "数量关系":
-                    with st.expander("数量补充信息（可选）", expanded=False):
-                        s_skip, s_guess = st.columns(2)
-                        num_skip = s_skip.number_input(
-                            "数量-主动放弃题数",
-                            0, total_q, 0,
-                            key="数量_主动放弃题数",
-                        )
-                        num_guess = s_guess.number_input(
-                            "数量-蒙猜题数",
-                            0, total_q, 0,
-                            key="数量_蒙猜题数",
-                        )
-                        entry["数量关系_跳过题数"] = num_skip
-                        entry["数量关系_蒙猜题数"] = num_guess
-
-                if m == "资料分析":
-                    with st.expander("资料补充信息（可选）", expanded=False):
-                        s_skip2, s_guess2 = st.columns(2)
-                        d_skip = s_skip2.number_input(
-                            "资料-主动放弃题数",
-                            0, total_q, 0,
-                            key="资料_主动放弃题数",
-                        )
-                        d_guess = s_guess2.number_input(
-                            "资料-蒙猜题数",
-                            0, total_q, 0,
-                            key="资料_蒙猜题数",
-                        )
-                        entry["资料分析_跳过题数"] = d_skip
-                        entry["资料分析_蒙猜题数"] = d_guess
-
-                # 汇总
-                tc += mq
-                tq += total_q
-                tt += mt
-                ts += mq * per_score
-
-            else:
-                # 有子模块（言语 / 判断）
-                st.markdown(f"**📌 {m}**")
-                sub_cols = st.columns(len(config["subs"]))
-                for idx, (sm, stot) in enumerate(config["subs"].items()):
-                    leaf_name = sm
-                    sub_total = int(tpl_totals.get(leaf_name, stot))
-
-                    with sub_cols[idx]:
-                        st.caption(sm)
-                        sq = st.number_input("对题", 0, sub_total, 0, key=f"sq_{sm}")
-                        st_time = st.number_input(
-                            "实(min)",
-                            0.0, 180.0,
-                            float(PLAN_TIME.get(sm, 5.0)),
-                            step=0.5,
-                            key=f"st_{sm}",
-                        )
-                        st_plan = st.number_input(
-                            "计(min)",
-                            0.0, 180.0,
-                            float(PLAN_TIME.get(sm, 5.0)),
-                            step=0.5,
-                            key=f"sp_{sm}",
-                        )
+        # ③ 逐题记录：勾错题 / 跳过 / 蒙猜，模块合计提交时自动推出
+        if entry_mode == "逐题记录":
+            st.caption("默认全部做对：只勾做错、主动放弃、蒙猜的题；用时可不填（按计划用时记）。")
+            sheet = st.data_editor(
+                sheet_frame(apply_laps(new_sheet(tpl_totals), *timer_laps)),
+                disabled=["题号", "模块"],
+                num_rows="fixed",
+                hide_index=True,
+                use_container_width=True,
+                height=420,
+                key=f"answer_sheet_{paper_type}",
+            )
 
-                    entry[f"{sm}_总题数"] = sub_total
-                    entry[f"{sm}_正确数"] = sq
-                    entry[f"{sm}_用时"] = st_time
-                    entry[f"{sm}_正确率"] = sq / sub_total if sub_total > 0 else 0
-                    entry[f"{sm}_计划用时"] = st_plan
+        else:
+            # ③ 逐模块录入
+            for m, config in MODULE_STRUCTURE.items():
+                if config["type"] == "direct":
+                    leaf_name = m
+                    # 题量：优先用模板的配置，没有就用 MODULE_STRUCTURE 默认
+                    total_q = int(tpl_totals.get(leaf_name, config.get("total", 0)))
+
+                    st.markdown(f"**📌 {m}**")
+                    a, b, c = st.columns([1, 1, 1])
+                    mq = a.number_input("对题数", 0, total_q, 0, key=f"q_{m}")
+                    mt = b.number_input(
+                        "实际用时(min)",
+                        0.0, 180.0,
+                        float(timer_act.get(m, PLAN_TIME.get(m, 5.0))),
+                        step=0.5,
+                        key=f"t_{m}",
+                    )
+                    mp = c.number_input(
+                        "计划用时(min)",
+                        0.0, 180.0,
+                        float(timer_plan.get(m, PLAN_TIME.get(m, 5.0))),
+                        step=0.5,
+                        key=f"p_{m}",
+                    )
 
-                    tc += sq
-                    tq += sub_total
-                    tt += st_time
-                    ts += sq * per_score
+                    entry[f"{m}_总题数"] = total_q
+                    entry[f"{m}_正确数"] = mq
+                    entry[f"{m}_用时"] = mt
+                    entry[f"{m}_正确率"] = mq / total_q if total_q > 0 else 0
+                    entry[f"{m}_计划用时"] = mp
+
+                    # 数量关系 / 资料分析：可选的“主动放弃 & 蒙猜”
+                    if m == "数量关系":
+                        with st.expander("数量补充信息（可选）", expanded=False):
+                            s_skip, s_guess = st.columns(2)
+                            num_skip = s_skip.number_input(
+                                "数量-主动放弃题数",
+                                0, total_q, 0,
+                                key="数量_主动放弃题数",
+                            )
+                            num_guess = s_guess.number_input(
+                                "数量-蒙猜题数",
+                                0, total_q, 0,
+                                key="数量_蒙猜题数",
+                            )
+                            entry["数量关系_跳过题数"] = num_skip
+                            entry["数量关系_蒙猜题数"] = num_guess
+
+                    if m == "资料分析":
+                        with st.expander("资料补充信息（可选）", expanded=False):
+                            s_skip2, s_guess2 = st.columns(2)
+                            d_skip = s_skip2.number_input(
+                                "资料-主动放弃题数",
+                                0, total_q, 0,
+                                key="资料_主动放弃题数",
+                            )
+                            d_guess = s_guess2.number_input(
+                                "资料-蒙猜题数",
+                                0, total_q, 0,
+                                key="资料_蒙猜题数",
+                            )
+                            entry["资料分析_跳过题数"] = d_skip
+                            entry["资料分析_蒙猜题数"] = d_guess
+
+                    # 汇总
+                    tc += mq
+                    tq += total_q
+                    tt += mt
+                    ts += mq * per_score
 
-            st.markdown("---")
+                else:
+                    # 有子模块（言语 / 判断）
+                    st.markdown(f"**📌 {m}**")
+                    sub_cols = st.columns(len(config["subs"]))
+                    for idx, (sm, stot) in enumerate(config["subs"].items()):
+                        leaf_name = sm
+                        sub_total = int(tpl_totals.get(leaf_name, stot))
+
+                        with sub_cols[idx]:
+                            st.caption(sm)
+                            sq = st.number_input("对题", 0, sub_total, 0, key=f"sq_{sm}")
+                            st_time = st.number_input(
+                                "实(min)",
+                                0.0, 180.0,
+                                float(timer_act.get(sm, PLAN_TIME.get(sm, 5.0))),
+                                step=0.5,
+                                key=f"st_{sm}",
+                            )
+                            st_plan = st.number_input(
+                                "计(min)",
+                                0.0, 180.0,
+                                float(timer_plan.get(sm, PLAN_TIME.get(sm, 5.0))),
+                                step=0.5,
+                                key=f"sp_{sm}",
+                            )
+
+                        entry[f"{sm}_总题数"] = sub_total
+                        entry[f"{sm}_正确数"] = sq
+                        entry[f"{sm}_用时"] = st_time
+                        entry[f"{sm}_正确率"] = sq / sub_total if sub_total > 0 else 0
+                        entry[f"{sm}_计划用时"] = st_plan
+
+                        tc += sq
+                        tq += sub_total
+                        tt += st_time
+                        ts += sq * per_score
+
+                st.markdown("---")
 
         # ④ 提交整套卷
         if st.form_submit_button("🚀 提交存档", type="primary", use_container_width=True):
             if not paper:
                 st.error("请输入试卷名称")
+            elif entry_mode == "逐题记录":
+                answers = frame_sheet(sheet)
+                entry.update(sheet_totals(answers, {**PLAN_TIME, **timer_plan}, per_score, timer_act))
+                entry["试卷ID"] = new_paper_id()
+                append_record(entry, un)
+                save_answers(un, entry["试卷ID"], answers)
+                st.session_state.pop("timer_to_input", None)
+                st.success("数据已存档（含逐题记录）")
+                time.sleep(0.7)
+                st.rerun()
             else:
                 entry.update({
                     "总分": round(ts, 2),
@@ -2319,9 +2276,8 @@ elif menu == "✏️ 录入成绩":
                     "总题数": tq,
                     "总用时": tt,
                 })
-                df2 = pd.concat([df, pd.DataFrame([entry])], ignore_index=True)
-                df2 = ensure_schema(df2)
-                save_data(df2, un)
+                append_record(entry, un)
+                st.session_state.pop("timer_to_input", None)
                 st.success("数据已存档")
                 time.sleep(0.7)
                 st.rerun()
@@ -2329,7 +2285,6 @@ elif menu == "✏️ 录入成绩":
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-
 # ------------------- 数据管理 -------------------
 elif menu == "⚙️ 数据管理":
     st.markdown("""
@@ -2343,16 +2298,30 @@ elif menu == "⚙️ 数据管理":
         st.info("暂无数据")
     else:
         st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.dataframe(df.sort_values("日期", ascending=False), use_container_width=True, hide_index=True)
-        del_target = st.selectbox("选择要删除的记录", df.apply(lambda x: f"{x['日期']} | {x['试卷']}", axis=1))
+        st.dataframe(records_plain(df).sort_values("日期", ascending=False), use_container_width=True, hide_index=True)
+        del_target = st.selectbox("选择要删除的记录", pidx["ids"][::-1], format_func=pidx["label"].get)
         if st.button("🗑️ 确认删除该记录", type="secondary"):
-            df2 = df[df.apply(lambda x: f"{x['日期']} | {x['试卷']}", axis=1) != del_target]
-            save_data(df2, un)
+            delete_records(un, del_target)
             st.success("删除成功")
             time.sleep(0.5)
             st.rerun()
         st.markdown("</div>", unsafe_allow_html=True)
 
+    if APPEND_ONLY_RECORDS:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown("<div class='mini-header'>存储压缩</div>", unsafe_allow_html=True)
+        pending = data_log_size(un)
+        st.caption(
+            f"新增 / 删除会先追加到日志，累计 {DATA_LOG_COMPACT_AT} 条自动并入成绩表。"
+            f"当前待压缩：{pending} 条。"
+        )
+        if st.button("🧱 立即压缩", disabled=pending == 0):
+            compact_data(un)
+            st.success("已压缩")
+            time.sleep(0.4)
+            st.rerun()
+        st.markdown("</div>", unsafe_allow_html=True)
+
 # ------------------- 数据备份 / 迁移 -------------------
 elif menu == "📂 数据备份 / 迁移":
     st.markdown("""
@@ -2368,33 +2337,58 @@ elif menu == "📂 数据备份 / 迁移":
     # 导出
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.markdown("<div class='mini-header'>导出当前账号数据（zip）</div>", unsafe_allow_html=True)
-    st.caption("建议：重要考试前后导出一份备份到本地 / 网盘。")
-    if st.button("📦 生成数据包", use_container_width=True):
-        data_bytes = export_user_bundle(un)
-        st.session_state["export_zip"] = data_bytes
-        st.success("已生成数据包，请在下方下载。")
-    if "export_zip" in st.session_state:
-        st.download_button(
-            label="⬇️ 下载数据包（zip）",
-            data=st.session_state["export_zip"],
-            file_name=f"civil_service_pro_max_{un}.zip",
-            mime="application/zip",
-            use_container_width=True
-        )
+    st.caption("建议：重要考试前后导出一份备份到本地 / 网盘。点击时才打包，下载完不会留在服务器上。")
+    st.download_button(
+        label="⬇️ 下载数据包（zip）",
+        data=lambda: pop_export(export_user_bundle(un)),
+        file_name=f"civil_service_pro_max_{un}.zip",
+        mime="application/zip",
+        on_click="ignore",
+        use_container_width=True
+    )
     st.markdown("</div>", unsafe_allow_html=True)
 
     # 导入
     st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown("<div class='mini-header'>导入数据包（覆盖当前账号）</div>", unsafe_allow_html=True)
-    st.caption("注意：导入会覆盖当前账号的已有数据（成绩 / 复盘 / 策略 / 打卡）。")
+    st.markdown("<div class='mini-header'>导入数据包</div>", unsafe_allow_html=True)
+    st.caption(
+        "合并：成绩按“日期 + 试卷”去重后并入现有数据，复盘去掉完全相同的条目，策略 / 打卡保持不变；"
+        "覆盖：用数据包替换当前账号的成绩 / 复盘 / 策略 / 打卡。"
+        "每一行都会按列和取值范围校验，不合格的行不导入，并在下方列出。"
+    )
+    mode = st.radio("导入方式", ["合并", "覆盖"], horizontal=True, key="import_mode")
     up = st.file_uploader("选择 zip 文件", type=["zip"])
-    if up is not None:
-        ok, msg = import_user_bundle(un, up)
+    if up is not None and st.button("📥 开始导入", type="primary", use_container_width=True):
+        status = st.empty()
+        ok, msg, rep = import_user_bundle(
+            un, up, mode="merge" if mode == "合并" else "replace",
+            progress=lambda name, n: status.caption(f"正在读取 {name}：{n} 行"),
+            trace_memory=False,
+        )
+        status.empty()
         if ok:
             st.success(msg)
             st.info("请刷新页面以确保所有图表/统计按新数据重新计算。")
         else:
             st.error(msg)
+        # 报告里按行统计的只有成绩 / 复盘；逐题记录只有试卷数
+        parts = {k: rep[k] for k in ("成绩", "复盘") if k in rep}
+        rows = [
+            {"文件": k, "读取": v["读取"], "导入": v["有效"] - v.get("重复", 0), "重复": v.get("重复", 0), "拒绝": v["拒绝"]}
+            for k, v in parts.items()
+        ]
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        if "逐题" in rep:
+            st.caption(f"数据包里有 {rep['逐题']['试卷']} 套卷的逐题记录。")
+        k1, k2, k3 = st.columns(3)
+        k1.metric("读取 + 校验", f"{rep['读取校验秒']:.2f}s", help=f"{rep['行每秒'] or 0:,.0f} 行/秒")
+        k2.metric("写入", f"{rep['写入秒']:.2f}s")
+        k3.metric("峰值内存（读取阶段）", f"{rep['峰值内存MB']} MB" if rep["峰值内存MB"] is not None else "—")
+        problems = [p for v in parts.values() for p in v["问题"]]
+        if problems:
+            st.warning(f"有 {sum(v['拒绝'] for v in parts.values())} 行未通过校验，未导入：")
+            st.dataframe(pd.DataFrame(problems), use_container_width=True, hide_index=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ------------------- 策略设置（含自定义策略备注） -------------------
@@ -2452,17 +2446,82 @@ elif menu == "🛡️ 管理后台" and role == "admin":
     st.markdown("""
     <div class="hero">
       <div class="hero-title">🛡️ 管理后台</div>
-      <div class="hero-sub">管理员可维护账号与权限。</div>
+      <div class="hero-sub">管理员可维护账号与权限，并按模块 / 活跃度查看全部学员。</div>
     </div>
     """, unsafe_allow_html=True)
 
-    users = load_users()
     st.markdown("<div class='card'>", unsafe_allow_html=True)
-    t_list, t_add, t_edit = st.tabs(["👥 用户列表", "➕ 新增用户", "🔧 账号维护"])
+    t_list, t_cohort, t_add, t_edit, t_stat = st.tabs(
+        ["👥 用户列表", "📊 学员总览", "➕ 新增用户", "🔧 账号维护", "📈 运行状态"]
+    )
 
     with t_list:
-        u_table = pd.DataFrame([{"账号": k, "昵称": v["name"], "角色": v["role"]} for k, v in users.items()])
-        st.table(u_table)
+        # 分页：只读当前页的账号资料，账号再多也不用整库加载
+        c1, c2, c3 = st.columns([2, 1, 1])
+        query = c1.text_input("按账号搜索", key="adm_q").strip()
+        page_size = c2.selectbox("每页", [20, 50, 100], key="adm_ps")
+        total = count_users(query)
+        n_pages = max(1, -(-total // page_size))
+        if st.session_state.get("adm_pg", 1) > n_pages:
+            st.session_state["adm_pg"] = n_pages
+        page_no = int(c3.number_input("页码", min_value=1, max_value=n_pages, step=1, key="adm_pg"))
+        page_users = list_users((page_no - 1) * page_size, page_size, query)
+        st.caption(f"共 {total} 个账号，第 {page_no} / {n_pages} 页")
+        if page_users:
+            st.table(pd.DataFrame([{"账号": k, "昵称": v["name"], "角色": v["role"]} for k, v in page_users]))
+        else:
+            st.info("没有匹配的账号。")
+        n_all = count_users() if query else total
+        st.download_button(
+            label=f"⬇️ 导出全部账号数据（zip，{n_all} 个账号）",
+            data=lambda: pop_export(export_all_bundles()),
+            file_name=f"civil_service_pro_max_all_{datetime.now():%Y%m%d}.zip",
+            mime="application/zip",
+            on_click="ignore",
+        )
+        st.caption("每个账号一个目录（<账号>/records.csv 等，与单账号数据包同格式）；点击时逐个账号写入临时文件，交付后删除。")
+
+    with t_cohort:
+        # 第一次点“加载”才把所有账号读一遍；之后每次 rerun 只重读数据有变化的账号
+        if st.button("🔄 加载 / 刷新学员数据", key="cohort_load"):
+            st.session_state["cohort_on"] = True
+        if not st.session_state.get("cohort_on"):
+            st.caption("按账号汇总：最近录入、近5套均分、各模块近3套正确率 / 较历史均值的变化 / 超时、复盘活跃度。")
+        else:
+            with st.spinner("正在读取学员数据…"):
+                cohort, cstat = refresh_cohort()
+            idle_all = cohort["未录入天数"].to_numpy()
+            k1, k2, k3, k4 = st.columns(4)
+            k1.metric("有成绩 / 全部账号", f"{int((cohort['套数'] > 0).sum())} / {len(cohort)}")
+            k2.metric("7 天内有录入", int((idle_all <= 7).sum()))
+            k3.metric("30 天以上没录", int((idle_all > 30).sum()))
+            k4.metric("本次重读 / 复用", f"{cstat['重读']} / {cstat['复用']}", f"{cstat['秒']:.2f}s", delta_color="off")
+
+            c1, c2, c3, c4 = st.columns([1.2, 1.6, 1, 1.2])
+            c_mod = c1.selectbox("模块", ["全部模块"] + LEAF_MODULES, key="cohort_mod")
+            c_sort = c2.selectbox("排序", list(COHORT_SORTS), key="cohort_sort")
+            c_idle = int(c3.number_input("至少几天没录成绩（0 = 不限）", min_value=0, step=1, key="cohort_idle"))
+            c_q = c4.text_input("按账号搜索", key="cohort_q").strip()
+            by, ascending = COHORT_SORTS[c_sort]
+            view = rank_cohort(cohort, None if c_mod == "全部模块" else c_mod, by, ascending, c_idle, c_q)
+
+            def pct(x, f):
+                return "—" if pd.isna(x) else format(x, f)
+
+            view["近5套均分"] = view["近5套均分"].map(lambda x: pct(x, ".1f"))
+            view["均分变化"] = view["均分变化"].map(lambda x: pct(x, "+.1f"))
+            view["近期正确率"] = view["近期正确率"].map(lambda x: pct(x, ".0%"))
+            view["正确率变化"] = view["正确率变化"].map(lambda x: pct(x, "+.0%"))
+            view["近期超时"] = view["近期超时"].map(lambda x: pct(x, ".1f"))
+            if not (view["错误"] != "").any():
+                view = view.drop(columns="错误")
+            st.caption(f"{len(view)} 个学员（{c_mod}）")
+            st.dataframe(view, use_container_width=True, hide_index=True)
+            st.caption(
+                "近期 = 最近 3 套；正确率变化 = 近期正确率 − 全部历史均值（负得越多越像在崩）；"
+                f"近期超时单位为分钟（全部模块时为合计）；近{COHORT_REVIEW_DAYS}天错题来自复盘记录。"
+                "数据版本（文件 mtime / SQLite 版本号）没变的账号不重读。"
+            )
 
     with t_add:
         with st.form("add_user"):
@@ -2471,65 +2530,108 @@ elif menu == "🛡️ 管理后台" and role == "admin":
             new_p = st.text_input("初始密码", type="password")
             new_r = st.selectbox("角色", ["user", "admin"])
             if st.form_submit_button("确认创建"):
-                if new_u in users:
-                    st.error("该账号已存在")
-                elif new_u:
-                    users[new_u] = {"name": new_n, "password": hash_pw(new_p), "role": new_r}
-                    save_users(users)
+                if new_u and create_user(new_u, {"name": new_n, "password": hash_pw(new_p), "role": new_r}):
                     st.success("创建成功")
                     st.rerun()
+                elif new_u:
+                    st.error("该账号已存在")
 
     with t_edit:
-        target_u = st.selectbox("选择目标用户", list(users.keys()))
-        col1, col2 = st.columns(2)
-        with col1:
-            new_name = st.text_input("修改昵称", value=users[target_u]["name"])
-            new_pwd = st.text_input("重置密码 (留空不修改)", type="password")
-            if st.button("更新资料"):
-                users[target_u]["name"] = new_name
-                if new_pwd:
-                    users[target_u]["password"] = hash_pw(new_pwd)
-                save_users(users)
-                st.success("更新成功")
-        with col2:
-            st.warning("危险操作")
-            if st.button("🔥 彻底删除此账号"):
-                if target_u == "admin":
-                    st.error("无法删除主管理员")
-                else:
-                    del users[target_u]
-                    save_users(users)
-                    st.success("已删除")
-                    st.rerun()
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        page_info = dict(page_users)
+        target_u = st.selectbox("选择目标用户（用户列表当前页）", list(page_info))
+        if target_u is None:
+            st.info("用户列表当前页没有账号，先在「👥 用户列表」里搜索或翻页。")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                new_name = st.text_input("修改昵称", value=page_info[target_u]["name"])
+                new_pwd = st.text_input("重置密码 (留空不修改)", type="password")
+                if st.button("更新资料"):
+                    info = get_user(target_u) or page_info[target_u]
+                    info["name"] = new_name
+                    if new_pwd:
+                        info["password"] = hash_pw(new_pwd)
+                    save_user(target_u, info)
+                    st.success("更新成功")
+            with col2:
+                st.warning("危险操作")
+                if st.button("🔥 彻底删除此账号"):
+                    if target_u == "admin":
+                        st.error("无法删除主管理员")
+                    else:
+                        delete_user(target_u)
+                        st.success("已删除")
+                        st.rerun()
+
+    with t_stat:
+        st.markdown("<div class='mini-header'>读盘缓存</div>", unsafe_allow_html=True)
+        cs = loader_cache_stats()
+        total = cs["hits"] + cs["misses"]
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("命中", cs["hits"])
+        k2.metric("未命中（读盘）", cs["misses"])
+        k3.metric("命中率", f"{cs['hits'] / total:.1%}" if total else "—")
+        k4.metric("缓存条目 / 用户", f"{cs['entries']} / {cs['users']}")
+        st.caption("命中 = 本次 rerun 未读盘，直接复用已规整好的 DataFrame / dict；文件 mtime 或大小变化即自动失效。")
+
+        st.markdown("<div class='mini-header'>写盘锁等待</div>", unsafe_allow_html=True)
+        lw = lock_wait_stats()
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("取锁次数", lw["count"])
+        k2.metric(f"争用（≥{LOCK_CONTENDED_MS:g}ms）", lw["contended"])
+        k3.metric("p50 / p95", f"{lw['p50_ms']:.2f} / {lw['p95_ms']:.2f} ms")
+        k4.metric("最长等待", f"{lw['max_ms']:.1f} ms")
+        if lw["files"]:
+            st.dataframe(pd.DataFrame(lw["files"]), use_container_width=True, hide_index=True)
+        st.caption("file 后端每次写盘都先取该文件的写锁，再写临时文件并原子替换；等待时间长说明同一文件有多个会话在同时写。")
+
+        st.markdown("<div class='mini-header'>图表缓存</div>", unsafe_allow_html=True)
+        fc = fig_cache_stats()
+        total = fc["hits"] + fc["misses"]
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("命中", fc["hits"])
+        k2.metric("未命中（重画）", fc["misses"])
+        k3.metric("命中率", f"{fc['hits'] / total:.1%}" if total else "—")
+        k4.metric("条目 / 占用", f"{fc['entries']} / {fc['mb']:.2f}MB")
+        st.caption(f"看板与趋势页的图表按账号缓存序列化后的 JSON，成绩或复盘有写入即重画；超过 {FIG_CACHE_MAX_CHARS // 1024 // 1024}MB 时淘汰最久未用的。")
+
+        st.markdown("<div class='mini-header'>存储后端</div>", unsafe_allow_html=True)
+        st.caption(
+            f"当前后端：{xc_config.STORAGE_BACKEND}（在 Secrets 中设置 STORAGE_BACKEND = \"sqlite\" 切换）｜"
+            f"SQLite 路径：{xc_config.SQLITE_PATH}"
+        )
+        if st.button("🗄️ 把现有文件数据迁移到 SQLite", disabled=xc_config.STORAGE_BACKEND == "sqlite"):
+            summary = migrate_files_to_sqlite()
+            st.success(
+                f"迁移完成：用户 {summary['users']} 个，成绩 {summary['records']} 条，"
+                f"复盘 {summary['reviews']} 条，策略/打卡 {summary['docs']} 份。原文件未删除。"
+            )
 
+        st.markdown("<div class='mini-header'>页面耗时（毫秒）</div>", unsafe_allow_html=True)
+        scope = st.radio("样本范围", ["所有会话", "本会话"], horizontal=True, key="perf_scope")
+        samples = perf_samples("session" if scope == "本会话" else "global")
+        st.caption(
+            f"共 {len(samples)} 个样本（进程最多保留 {PERF_RING_SIZE} 个，每会话 {PERF_SESSION_RING_SIZE} 个）。"
+            "阶段：css 注入样式｜init 配置与函数定义｜loaders 读数据｜sidebar 侧边栏｜page 页面主体｜图表·xx 单个图表｜total 整次 rerun。"
+        )
+        if samples.empty:
+            st.info("暂无样本，切换几个页面后再来看。")
+        else:
+            summ = perf_summary(samples)
+            pages_tbl = summ[summ["阶段"] == "total"].drop(columns="阶段").sort_values("p95", ascending=False)
+            st.markdown("**按页面（整次 rerun）**")
+            st.dataframe(pages_tbl, use_container_width=True, hide_index=True)
+            st.markdown("**按页面 × 阶段**")
+            st.dataframe(summ, use_container_width=True, hide_index=True)
+            st.download_button(
+                "⬇️ 导出样本（CSV）",
+                data=samples.to_csv(index=False).encode("utf-8-sig"),
+                file_name="perf_samples.csv",
+                mime="text/csv",
+            )
+    st.markdown("</div>", unsafe_allow_html=True)
 
+perf_mark("page")
+perf_total()
 
 
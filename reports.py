@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+行测复盘系统 · 批量周报
+
+不启动 Streamlit，直接用 xingce 包为用户库里的每个账号生成周报：
+<输出目录>/<账号>.md 和 <账号>.json（账号名按 URL 编码，和用户库文件名一致）（单卷复盘摘要 / 短板建议 / 趋势数字 / 复盘错因 / 本周训练计划）。
+账号之间互不依赖，用进程池并行；某个账号出错（文件损坏等）只记进失败列表，其余照常生成。
+结束时打印吞吐（账号/秒、试卷/秒）和失败的账号。
+
+用法：
+    python reports.py                                  # 当前目录的数据，输出到 reports/
+    python reports.py --data-dir /srv/xingce -o /tmp/weekly --workers 8
+    python reports.py --backend sqlite --sqlite-path xingce.db --users alice,bob
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from urllib.parse import quote
+
+from xingce import config as xc_config
+from xingce.accounts import list_usernames
+from xingce.db import _json_default
+
+
+def _init_worker(backend: str, sqlite_path: str):
+    # 子进程（spawn 方式启动时）拿不到父进程里改过的配置，这里再设一次
+    xc_config.configure(storage_backend=backend, sqlite_path=sqlite_path)
+
+
+def write_user_report(un: str, out_dir: str, days: int) -> Dict:
+    """
+    生成并写出一个账号的周报，返回 {账号, 套数, 毫秒}；
+    出错时返回 {账号, 错误}，不抛出（否则 pool.map 会中断整批，已生成的结果也拿不到）。
+    """
+    from xingce.report import build_user_report
+
+    t0 = time.perf_counter()
+    # 账号名里可能有 / 或 ..，和 config.user_file 一样编码后再当文件名，保证写在输出目录里
+    base = os.path.join(out_dir, quote(un, safe=""))
+    try:
+        md, data = build_user_report(un, days)
+        with open(f"{base}.md", "w", encoding="utf-8") as f:
+            f.write(md)
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=_json_default)
+    except Exception as e:
+        return {"un": un, "error": f"{type(e).__name__}: {e}"}
+    return {"un": un, "papers": data["套数"], "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def main(argv: List[str] = None) -> Dict:
+    ap = argparse.ArgumentParser(description="行测复盘系统批量周报")
+    ap.add_argument("--data-dir", default=".", help="数据目录（users_db.json 与各用户文件所在目录）")
+    ap.add_argument("-o", "--out", default="reports", help="输出目录（相对路径按数据目录解析）")
+    ap.add_argument("--users", help="只生成这些账号（逗号分隔），默认用户库里的全部账号")
+    ap.add_argument("--days", type=int, default=7, help="单卷复盘覆盖最近多少天")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="进程数（1 = 不开进程池）")
+    ap.add_argument("--backend", choices=["file", "sqlite"], default=None, help="默认沿用 XC_STORAGE_BACKEND")
+    ap.add_argument("--sqlite-path", default=None, help="默认沿用 XC_SQLITE_PATH")
+    args = ap.parse_args(argv)
+
+    os.chdir(args.data_dir)
+    xc_config.configure(storage_backend=args.backend, sqlite_path=args.sqlite_path)
+    os.makedirs(args.out, exist_ok=True)
+    users = args.users.split(",") if args.users else list_usernames()
+
+    t0 = time.perf_counter()
+    if args.workers <= 1:
+        done = [write_user_report(un, args.out, args.days) for un in users]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(xc_config.STORAGE_BACKEND, xc_config.SQLITE_PATH),
+        ) as pool:
+            chunk = max(1, len(users) // (args.workers * 4))
+            done = list(pool.map(
+                write_user_report, users, [args.out] * len(users), [args.days] * len(users), chunksize=chunk
+            ))
+    elapsed = time.perf_counter() - t0
+
+    failed = [r for r in done if "error" in r]
+    done = [r for r in done if "error" not in r]
+    papers = sum(r["papers"] for r in done)
+    summary = {
+        "users": len(done),
+        "failed": len(failed),
+        "errors": failed,
+        "papers": papers,
+        "workers": args.workers,
+        "seconds": round(elapsed, 3),
+        "users_per_s": round(len(done) / elapsed, 1) if elapsed else None,
+        "papers_per_s": round(papers / elapsed, 1) if elapsed else None,
+        "slowest": sorted(done, key=lambda r: -r["ms"])[:3],
+    }
+    print(
+        f"已生成 {len(done)} 个账号的周报（{papers} 套卷），失败 {len(failed)} 个 → {os.path.abspath(args.out)}\n"
+        f"耗时 {elapsed:.2f}s，{summary['users_per_s']} 账号/秒，{summary['papers_per_s']} 套卷/秒（{args.workers} 进程）",
+        file=sys.stderr,
+    )
+    for r in failed:
+        print(f"失败：{r['un']} —— {r['error']}", file=sys.stderr)
+    return summary
+
+
+if __name__ == "__main__":
+    # 有账号失败时退出码为 1，定时任务据此报警
+    sys.exit(1 if main()["failed"] else 0)
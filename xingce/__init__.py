@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+行测复盘系统的核心逻辑（不依赖 Streamlit / plotly）：
+
+- config    ：模块结构 / 试卷模板 / 默认策略 / 部署配置
+- accounts  ：用户库与密码哈希
+- schema    ：成绩表结构与规整
+- fileio    ：原子写 / 按文件加锁的写入层与锁等待统计
+- answers   ：逐题作答记录（定长二进制答题卡）与模块合计推导
+- storage   ：成绩 / 复盘 / 逐题记录 / 策略 / 打卡的读写（file / sqlite）
+- analytics ：模块统计、成绩聚合、复盘统计与检索
+- cohort    ：管理后台的学员总览（所有账号一张表，增量刷新）
+- planning  ：模块建议、明日训练、周计划、打卡
+- timer     ：做题计时器的会话日志事件与回放（刷新 / 重启后恢复计时）
+- report    ：Markdown / JSON 报告
+
+常用函数可以直接 from xingce import build_week_plan；子模块按需导入，
+config / fileio / accounts / planning / timer 不会带上 pandas，其余模块需要 pandas / numpy。
+"""
+
+import importlib
+
+_EXPORTS = {
+    "config": [
+        "DEFAULT_STRATEGY", "LEAF_MODULES", "MODULE_STRUCTURE", "PAPER_TEMPLATES", "PLAN_TIME", "REVIEW_SCHEMA",
+        "configure", "get_leaf_modules",
+    ],
+    "fileio": ["atomic_write", "atomic_write_json", "file_lock", "lock_wait_stats"],
+    "accounts": [
+        "count_users", "create_user", "delete_user", "get_user", "hash_pw", "list_usernames", "list_users",
+        "load_users", "save_user", "save_users",
+    ],
+    "schema": [
+        "RECORD_DTYPES", "RECORD_RANGES", "build_all_columns", "ensure_schema", "new_paper_id", "records_plain",
+        "validate_records", "validate_reviews",
+    ],
+    "answers": ["ANSWER_DTYPE", "frame_sheet", "new_sheet", "sheet_frame", "sheet_totals", "wrong_numbers"],
+    "storage": [
+        "append_record", "append_timer_event", "clear_timer_events", "compact_data", "data_version", "delete_answers",
+        "delete_records", "export_all_bundles", "export_user_bundle", "import_user_bundle", "load_answers",
+        "load_checkin", "load_data", "load_reviews", "load_strategy", "load_timer_events", "migrate_files_to_sqlite",
+        "peek_data", "peek_reviews", "pop_export", "record_aggregates", "review_index_sync", "save_answers",
+        "save_checkin", "save_data", "save_reviews", "save_strategy",
+    ],
+    "analytics": [
+        "build_paper_index", "build_record_aggregates", "compute_summary", "module_stats", "rank_modules",
+        "review_analytics", "search_reviews", "trend_frames", "trend_window",
+    ],
+    "cohort": ["rank_cohort", "refresh_cohort"],
+    "planning": [
+        "allocate_focus_days", "build_week_plan", "compute_next_day_plan", "get_today_tasks_from_week_plan",
+        "latest_paper_type", "module_tip", "project_module_gains", "update_streak",
+    ],
+    "report": ["build_user_report", "paper_summary_md", "week_plan_md"],
+    "timer": ["replay_timer", "timer_event"],
+}
+_HOME = {name: mod for mod, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_HOME)
+
+
+def __getattr__(name: str):
+    """第一次访问时才导入所在子模块"""
+    mod = _HOME.get(name)
+    if mod is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{mod}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_HOME) | set(_EXPORTS))
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+账号：用户库的读写（file / sqlite 两种后端）与密码哈希。
+
+用户库按账号分片：file 后端每个账号一个 JSON（users_db/<账号>.json），sqlite 后端按主键读写 users 表。
+登录、注册、改资料只读写这一个账号，和总账号数无关；管理页的用户列表按页取
+（file 后端的账号名列表按目录 mtime 缓存在进程里，页面重跑时不重新列目录、排序）。
+load_users / save_users 仍可整库读写（迁移、基准测试用）。
+
+不依赖 pandas，登录页只需要这一块。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from . import config
+from .config import USERS_DIR, USERS_FILE, user_file
+from .db import _sqlite_conn
+from .fileio import atomic_write_json, file_lock
+
+
+def hash_pw(pw: str) -> str:
+    """简单的密码哈希（sha256）"""
+    return hashlib.sha256(str(pw).encode()).hexdigest()
+
+
+def _admin_bootstrap() -> Dict:
+    """首次运行时生成默认 admin 账号"""
+    if config.ADMIN_DEFAULT_PASSWORD is None:
+        # 没有用户文件、也没有在 secrets 中配置管理员密码时，直接报错，避免生成弱密码
+        raise RuntimeError(
+            "首次运行检测不到 users_db.json，且未配置 ADMIN_DEFAULT_PASSWORD。\n"
+            "请在 Streamlit Cloud 的 Secrets 中设置 ADMIN_DEFAULT_PASSWORD，"
+            "例如：ADMIN_DEFAULT_PASSWORD='一串很长且安全的密码'。\n"
+            "本地开发如果嫌麻烦，也可以自己手动创建 users_db.json。"
+        )
+    return {"admin": {"name": "管理员", "password": hash_pw(config.ADMIN_DEFAULT_PASSWORD), "role": "admin"}}
+
+
+# ================== file 后端 ==================
+def _file_registry(bootstrap: bool = True):
+    """
+    确保 USERS_DIR 存在：首次访问时把旧版 users_db.json 拆成每账号一个文件（旧文件保留不动），
+    两者都没有时生成默认 admin（bootstrap=False 时建空库，整库覆盖用）。
+    先在临时目录写好再整体改名，其他进程看到的要么没有目录要么是完整的库。
+    """
+    if os.path.isdir(USERS_DIR):
+        return
+    with file_lock(USERS_DIR):
+        if os.path.isdir(USERS_DIR):
+            return
+        if os.path.exists(USERS_FILE):
+            with open(USERS_FILE, "r", encoding="utf-8") as f:
+                d = json.load(f)
+        else:
+            d = _admin_bootstrap() if bootstrap else {}
+        tmp = f"{USERS_DIR}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for un, v in d.items():
+            with open(os.path.join(tmp, os.path.basename(user_file(un))), "w", encoding="utf-8") as f:
+                json.dump(v, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, USERS_DIR)
+
+
+@lru_cache(maxsize=None)
+def _names_store() -> Dict:
+    """进程级：(USERS_DIR 绝对路径, mtime) -> 排好序的账号名"""
+    return {"lock": threading.Lock(), "sig": None, "names": ()}
+
+
+def _names_invalidate():
+    # 本进程的增删不等 mtime：有的文件系统 mtime 精度只到秒，同一秒内的两次改动看不出来
+    store = _names_store()
+    with store["lock"]:
+        store["sig"] = None
+
+
+def _file_names() -> Tuple[str, ...]:
+    """全部账号名（已排序）；目录 mtime 没变就直接用缓存，其他进程增删账号会改 mtime"""
+    path = os.path.abspath(USERS_DIR)
+    sig = (path, os.stat(path).st_mtime_ns)
+    store = _names_store()
+    with store["lock"]:
+        if store["sig"] == sig:
+            return store["names"]
+    names = tuple(sorted(unquote(e.name[:-5]) for e in os.scandir(path) if e.name.endswith(".json")))
+    with store["lock"]:
+        store["sig"], store["names"] = sig, names
+    return names
+
+
+def _file_get_user(un: str) -> Optional[Dict]:
+    _file_registry()
+    try:
+        with open(user_file(un), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _file_save_user(un: str, info: Dict):
+    _file_registry()
+    atomic_write_json(user_file(un), info)
+    _names_invalidate()
+
+
+def _file_create_user(un: str, info: Dict) -> bool:
+    _file_registry()
+    path = user_file(un)
+    with file_lock(path):
+        if os.path.exists(path):
+            return False
+        atomic_write_json(path, info)
+    _names_invalidate()
+    return True
+
+
+def _file_delete_user(un: str):
+    _file_registry()
+    path = user_file(un)
+    with file_lock(path):
+        if os.path.exists(path):
+            os.remove(path)
+    _names_invalidate()
+
+
+def _file_usernames(query: str = "", bootstrap: bool = True) -> List[str]:
+    """只列目录、不解析文件；query 非空时按账号子串过滤"""
+    _file_registry(bootstrap)
+    return [un for un in _file_names() if query in un]
+
+
+def _file_load_users() -> Dict:
+    users = {}
+    for un in _file_usernames():
+        info = _file_get_user(un)
+        if info is not None:
+            users[un] = info
+    return users
+
+
+def _file_save_users(d: Dict):
+    # 每个账号单独原子替换：写到一半崩溃也不会留下截断的用户库（那样所有人都登录不了）
+    for un in set(_file_usernames(bootstrap=False)) - set(d):
+        _file_delete_user(un)
+    for un, info in d.items():
+        atomic_write_json(user_file(un), info)
+    _names_invalidate()
+
+
+# ================== sqlite 后端 ==================
+def _sql_registry(path: str = None):
+    """表为空时生成默认 admin（主键索引上查一行，开销可忽略）"""
+    conn = _sqlite_conn(path)
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None:
+        _sql_save_users(_admin_bootstrap(), path)
+    return conn
+
+
+def _sql_get_user(un: str, path: str = None) -> Optional[Dict]:
+    row = _sql_registry(path).execute("SELECT body FROM users WHERE un=?", (un,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _sql_save_user(un: str, info: Dict, path: str = None):
+    _sql_registry(path).execute(
+        "INSERT OR REPLACE INTO users(un, body) VALUES(?, ?)", (un, json.dumps(info, ensure_ascii=False))
+    )
+
+
+def _sql_create_user(un: str, info: Dict, path: str = None) -> bool:
+    cur = _sql_registry(path).execute(
+        "INSERT OR IGNORE INTO users(un, body) VALUES(?, ?)", (un, json.dumps(info, ensure_ascii=False))
+    )
+    return cur.rowcount == 1
+
+
+def _sql_delete_user(un: str, path: str = None):
+    _sql_registry(path).execute("DELETE FROM users WHERE un=?", (un,))
+
+
+def _sql_usernames(query: str = "", path: str = None) -> List[str]:
+    rows = _sql_registry(path).execute(
+        "SELECT un FROM users WHERE instr(un, ?) > 0 OR ? = '' ORDER BY un", (query, query)
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _sql_list_users(offset: int, limit: int, query: str = "", path: str = None) -> List[Tuple[str, Dict]]:
+    rows = _sql_registry(path).execute(
+        "SELECT un, body FROM users WHERE instr(un, ?) > 0 OR ? = '' ORDER BY un LIMIT ? OFFSET ?",
+        (query, query, limit, offset),
+    ).fetchall()
+    return [(un, json.loads(body)) for un, body in rows]
+
+
+def _sql_count_users(query: str = "", path: str = None) -> int:
+    return _sql_registry(path).execute(
+        "SELECT COUNT(*) FROM users WHERE instr(un, ?) > 0 OR ? = ''", (query, query)
+    ).fetchone()[0]
+
+
+def _sql_load_users(path: str = None) -> Dict:
+    rows = _sql_registry(path).execute("SELECT un, body FROM users").fetchall()
+    return {un: json.loads(body) for un, body in rows}
+
+
+def _sql_save_users(d: Dict, path: str = None):
+    conn = _sqlite_conn(path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM users")
+        conn.executemany(
+            "INSERT INTO users(un, body) VALUES(?, ?)",
+            [(un, json.dumps(v, ensure_ascii=False)) for un, v in d.items()],
+        )
+
+
+# ================== 对外：按账号读写 ==================
+# admin 初始密码从 Streamlit Secrets 中的 ADMIN_DEFAULT_PASSWORD 读取：
+# - 本地开发：没有 secrets 时可以自行在本地创建 users_db.json（首次访问时自动拆分）
+# - 云端部署：强烈建议在 Secrets 中设置一个复杂密码
+def get_user(un: str) -> Optional[Dict]:
+    """取一个账号的资料（name / password / role），不存在返回 None"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_get_user(un)
+    return _file_get_user(un)
+
+
+def save_user(un: str, info: Dict):
+    """新增或覆盖一个账号"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_user(un, info)
+    return _file_save_user(un, info)
+
+
+def create_user(un: str, info: Dict) -> bool:
+    """账号不存在时才创建，返回是否创建成功（两人同时注册同一账号只有一个成功）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_create_user(un, info)
+    return _file_create_user(un, info)
+
+
+def delete_user(un: str):
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_delete_user(un)
+    return _file_delete_user(un)
+
+
+def list_usernames(query: str = "") -> List[str]:
+    """按账号排序的账号名列表（不读资料）；query 非空时按账号子串过滤"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_usernames(query)
+    return _file_usernames(query)
+
+
+def count_users(query: str = "") -> int:
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_count_users(query)
+    if not query:
+        _file_registry()
+        return len(_file_names())
+    return len(_file_usernames(query))
+
+
+def list_users(offset: int = 0, limit: int = 50, query: str = "") -> List[Tuple[str, Dict]]:
+    """按账号排序的一页 (账号, 资料)；只读这一页的账号"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_list_users(offset, limit, query)
+    _file_registry()
+    names = _file_usernames(query) if query else _file_names()
+    page = []
+    for un in names[offset:offset + limit]:
+        info = _file_get_user(un)
+        if info is not None:
+            page.append((un, info))
+    return page
+
+
+# ================== 对外：整库读写 ==================
+def load_users() -> Dict:
+    """整库读取（迁移 / 基准测试用；页面里按账号读写请用 get_user / save_user）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_load_users()
+    return _file_load_users()
+
+
+def save_users(d: Dict):
+    """整库覆盖：d 里没有的账号会被删除"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_users(d)
+    return _file_save_users(d)
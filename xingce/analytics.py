@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""
+分析：模块统计矩阵、试卷索引、成绩聚合、复盘错因统计与复盘检索。
+
+这里只做纯计算，不读写磁盘；按用户缓存 / 随写入同步的部分在 storage 里。
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import LEAF_MODULES, REVIEW_SCHEMA
+from .schema import _paper_label_series
+
+
+# ================== 模块统计引擎（试卷 × 模块 矩阵） ==================
+# 成绩表是宽表：每个叶子模块 5 列（{m}_总题数 / _正确数 / _用时 / _正确率 / _计划用时）。
+# 这里一次性取出这 50 列并 reshape 成 (试卷数, 模块数, 字段数) 的 float 数组，
+# 各页面的短板 / 超时 / 近 N 套均值都在矩阵上按列计算，不再逐格 float(row.get(...))。
+MODULE_FIELDS = ["总题数", "正确数", "用时", "正确率", "计划用时"]
+MODULE_STAT_COLS = [f"{m}_{f}" for m in LEAF_MODULES for f in MODULE_FIELDS]
+
+
+def module_stats(data) -> Dict[str, np.ndarray]:
+    """
+    宽表 → 模块矩阵。data 可以是整张成绩表，也可以是单行（Series）。
+    返回 {字段: (n, 模块数) 矩阵}，另含：
+    - "超时"：计划用时 > 0 时为 用时 - 计划用时，否则为 0（与原先逐模块计算的口径一致）
+    缺失的列按 0 处理。
+    """
+    if isinstance(data, pd.Series):
+        flat = pd.to_numeric(data.reindex(MODULE_STAT_COLS), errors="coerce").to_numpy(dtype=float)
+        arr = flat.reshape(1, len(LEAF_MODULES), len(MODULE_FIELDS))
+    else:
+        flat = data.reindex(columns=MODULE_STAT_COLS).to_numpy(dtype=float)
+        arr = flat.reshape(len(data), len(LEAF_MODULES), len(MODULE_FIELDS))
+    # 成绩表里是 float32，这里统一转 float64 并去掉单精度尾数（0.6 → 0.6000000238 → 0.6）
+    arr = np.nan_to_num(arr).round(6)
+    out = {f: arr[:, :, i] for i, f in enumerate(MODULE_FIELDS)}
+    plan = out["计划用时"]
+    out["超时"] = np.where(plan > 0, out["用时"] - plan, 0.0)
+    return out
+
+
+def rank_modules(values: np.ndarray, k: int = None, descending: bool = False) -> List[int]:
+    """
+    按一行模块数值排序，返回模块下标（对应 LEAF_MODULES）。
+    稳定排序：并列时保持 LEAF_MODULES 的顺序，与原来 sorted(...) 的结果一致。
+    """
+    order = np.argsort(-values if descending else values, kind="stable")
+    return order[:k].tolist() if k is not None else order.tolist()
+
+
+def recent_module_mean(ms: Dict[str, np.ndarray], field: str, n: int = 3) -> np.ndarray:
+    """最近 n 套卷各模块的均值"""
+    mat = ms[field]
+    if len(mat) == 0:
+        return np.zeros(len(LEAF_MODULES))
+    return mat[-n:].mean(axis=0)
+
+
+def rolling_module_mean(ms: Dict[str, np.ndarray], field: str, window: int = 3) -> np.ndarray:
+    """各模块按试卷顺序的滚动均值（前几套不足 window 时按已有套数平均）"""
+    mat = ms[field]
+    n = len(mat)
+    csum = np.vstack([np.zeros((1, mat.shape[1])), np.cumsum(mat, axis=0)])
+    idx = np.arange(1, n + 1)
+    start = np.maximum(idx - window, 0)
+    return (csum[idx] - csum[start]) / np.minimum(idx, window)[:, None]
+
+
+def module_long_frame(ms: Dict[str, np.ndarray], labels=None) -> pd.DataFrame:
+    """模块矩阵 → 长表（每行 = 一套卷 × 一个模块），labels 为每套卷的展示名"""
+    n, k = ms["正确率"].shape
+    long = {
+        "场次": np.repeat(np.asarray(labels if labels is not None else np.arange(n)), k),
+        "模块": np.tile(np.asarray(LEAF_MODULES), n),
+    }
+    for f in MODULE_FIELDS + ["超时"]:
+        long[f] = ms[f].reshape(-1)
+    return pd.DataFrame(long)
+
+
+def paper_module_rows(ms: Dict[str, np.ndarray], pos: int) -> List[Tuple]:
+    """单套卷的模块明细：[(模块, 正确率, 用时, 计划用时, 总题数, 超时), ...]"""
+    return list(zip(
+        LEAF_MODULES,
+        ms["正确率"][pos].tolist(), ms["用时"][pos].tolist(), ms["计划用时"][pos].tolist(),
+        ms["总题数"][pos].tolist(), ms["超时"][pos].tolist(),
+    ))
+
+
+def paper_top_modules(ms: Dict[str, np.ndarray], pos: int, k: int = 3) -> Tuple[List[Tuple], List[Tuple]]:
+    """单套卷 正确率最低 / 超时最多 的前 k 个模块（元素同 paper_module_rows）"""
+    stats = paper_module_rows(ms, pos)
+    worst_by_acc = [stats[i] for i in rank_modules(ms["正确率"][pos], k)]
+    worst_by_time = [stats[i] for i in rank_modules(ms["超时"][pos], k, descending=True)]
+    return worst_by_acc, worst_by_time
+
+
+def build_paper_index(df: pd.DataFrame) -> Dict:
+    """
+    试卷选择索引（每次加载算一次）：
+    - ids   ：试卷ID列表，最新的在前（下拉框选项）
+    - label ：试卷ID -> “日期 | 试卷”展示名；同日同名的卷追加 (#2)、(#3) 区分
+    - pos   ：试卷ID -> 在 df 中的行位置，选中后 O(1) 取行
+    """
+    if df.empty:
+        return {"ids": [], "label": {}, "pos": {}}
+    ids = df["试卷ID"].astype(str).tolist()
+    labels = _paper_label_series(df)
+    nth = labels.groupby(labels).cumcount().to_numpy()
+    shown = [lb if k == 0 else f"{lb} (#{k + 1})" for lb, k in zip(labels.tolist(), nth)]
+    return {
+        "ids": ids[::-1],
+        "label": dict(zip(ids, shown)),
+        "pos": {pid: i for i, pid in enumerate(ids)},
+    }
+
+
+# ================== 成绩聚合（写入时增量维护） ==================
+AGG_SCORE_WINDOW = 5       # 看板“近5次均分”
+AGG_MODULE_WINDOW = 3      # 周计划：最近三套卷的模块均值
+AGG_EWMA_ALPHA = 0.3       # 模块正确率 / 超时的指数加权平均系数
+AGG_HIST_WIDTH = 5         # 分数分布每档 5 分
+AGG_TOTAL_COLS = ["总分", "总正确数", "总题数", "总用时"]
+
+
+def _new_aggregates() -> Dict:
+    """
+    聚合结构：
+    - n / sum / best：套数、四项合计的累计和、最高分
+    - latest / prev_score：最新一套的合计、上一套总分
+    - scores：最近 AGG_SCORE_WINDOW 套总分
+    - window：{正确率/超时: 最近 AGG_MODULE_WINDOW 套的模块向量}
+    - ewma：{正确率/超时: 模块向量的指数加权平均}
+    - hist：{分档起点: 次数}
+    """
+    return {
+        "sig": None, "n": 0,
+        "sum": {c: 0.0 for c in AGG_TOTAL_COLS}, "best": None,
+        "latest": None, "prev_score": None, "scores": [],
+        "window": {"正确率": [], "超时": []},
+        "ewma": {"正确率": None, "超时": None},
+        "hist": {},
+    }
+
+
+def _agg_add(agg: Dict, totals: Dict, acc: np.ndarray, over: np.ndarray):
+    """追加一套卷：O(模块数)"""
+    score = totals["总分"]
+    agg["n"] += 1
+    for c in AGG_TOTAL_COLS:
+        agg["sum"][c] += totals[c]
+    agg["best"] = score if agg["best"] is None else max(agg["best"], score)
+    agg["prev_score"] = agg["latest"]["总分"] if agg["latest"] else None
+    agg["latest"] = totals
+    agg["scores"] = (agg["scores"] + [score])[-AGG_SCORE_WINDOW:]
+    for field, vec in (("正确率", acc), ("超时", over)):
+        agg["window"][field] = (agg["window"][field] + [vec])[-AGG_MODULE_WINDOW:]
+        old = agg["ewma"][field]
+        agg["ewma"][field] = vec if old is None else AGG_EWMA_ALPHA * vec + (1 - AGG_EWMA_ALPHA) * old
+    b = int(score // AGG_HIST_WIDTH) * AGG_HIST_WIDTH
+    agg["hist"][b] = agg["hist"].get(b, 0) + 1
+
+
+def build_record_aggregates(df: pd.DataFrame, ms: Dict[str, np.ndarray] = None) -> Dict:
+    """从整张成绩表重建聚合（冷启动 / 删除 / 整表保存后）"""
+    agg = _new_aggregates()
+    if df.empty:
+        return agg
+    ms = ms if ms is not None else module_stats(df)
+    tot = df.reindex(columns=AGG_TOTAL_COLS).to_numpy(dtype=float)
+    # 合计列是 float32，保留 4 位足以去掉单精度尾数（67.8 → 67.8000031 → 67.8）
+    tot = np.nan_to_num(tot).round(4)
+    scores = tot[:, 0]
+    agg["n"] = len(df)
+    agg["sum"] = dict(zip(AGG_TOTAL_COLS, tot.sum(axis=0).tolist()))
+    agg["best"] = float(scores.max())
+    agg["latest"] = dict(zip(AGG_TOTAL_COLS, tot[-1].tolist()))
+    agg["prev_score"] = float(scores[-2]) if len(scores) > 1 else None
+    agg["scores"] = scores[-AGG_SCORE_WINDOW:].tolist()
+    for field in ("正确率", "超时"):
+        mat = ms[field]
+        agg["window"][field] = list(mat[-AGG_MODULE_WINDOW:])
+        agg["ewma"][field] = pd.DataFrame(mat).ewm(alpha=AGG_EWMA_ALPHA, adjust=False).mean().to_numpy()[-1]
+    bins = (scores // AGG_HIST_WIDTH).astype(int) * AGG_HIST_WIDTH
+    agg["hist"] = {int(b): int(c) for b, c in zip(*np.unique(bins, return_counts=True))}
+    return agg
+
+
+def agg_module_mean(agg: Dict, field: str) -> np.ndarray:
+    """最近 AGG_MODULE_WINDOW 套卷各模块均值（对应 recent_module_mean）"""
+    win = agg["window"][field]
+    if not win:
+        return np.zeros(len(LEAF_MODULES))
+    return np.mean(win, axis=0)
+
+
+def agg_histogram(agg: Dict) -> pd.DataFrame:
+    """分数分布：按分档排序的 (分数区间, 次数)"""
+    rows = [(f"{b}-{b + AGG_HIST_WIDTH}", c) for b, c in sorted(agg["hist"].items())]
+    return pd.DataFrame(rows, columns=["分数区间", "次数"])
+
+
+def compute_summary(agg: Dict):
+    """返回最新一套卷的 summary 信息（读聚合，不扫历史）"""
+    latest = agg["latest"]
+    prev = agg["prev_score"]
+    delta = latest["总分"] - prev if prev is not None else None
+    acc = latest["总正确数"] / max(latest["总题数"], 1)
+    return latest, delta, acc
+
+
+def review_analytics(rdf: pd.DataFrame, days: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    返回：
+    - 错因汇总（不会/不熟/审题坑）
+    - 模块错题数 Top
+    """
+    if rdf.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    cutoff = datetime.now().date() - timedelta(days=days)
+    x = rdf.copy()
+    try:
+        x["日期"] = pd.to_datetime(x["日期"]).dt.date
+    except Exception:
+        pass
+    x = x[x["日期"] >= cutoff]
+
+    if x.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    cause = pd.DataFrame([{
+        "错因": "不会", "数量": pd.to_numeric(x["错因1_知识点不会"], errors="coerce").fillna(0).sum()
+    }, {
+        "错因": "不熟", "数量": pd.to_numeric(x["错因2_方法不熟"], errors="coerce").fillna(0).sum()
+    }, {
+        "错因": "审题坑", "数量": pd.to_numeric(x["错因3_审题选项坑"], errors="coerce").fillna(0).sum()
+    }])
+
+    mod = x.copy()
+    mod["错题数"] = pd.to_numeric(mod["错题数"], errors="coerce").fillna(0)
+    mod_sum = mod.groupby("模块", as_index=False)["错题数"].sum().sort_values("错题数", ascending=False).head(10)
+
+    return cause, mod_sum
+
+
+# ================== 趋势（时间窗口 + 按周 / 月分桶） ==================
+# 趋势页不再把每套卷当一个分类刻度：先按日期窗口取出试卷，套数多时按周 / 月 / 季 / 年分桶，
+# 每桶只给 套数 / 均值 / 最低 / 最高。无论历史多长，每条线的点数都有上限，图表 JSON 的大小随之有界。
+TREND_FREQS = {"按周": "W", "按月": "M", "按季": "Q", "按年": "Y"}
+TREND_RAW_AUTO = 200       # “自动”粒度下，窗口内不超过这么多套卷时逐套画
+TREND_MAX_BUCKETS = 160    # “自动”粒度选桶数不超过此值的最细一档
+TREND_MAX_POINTS = 2000    # 每条线最多的点数（手动选逐套 / 按周时也不超过），超出时只留最近的
+
+
+def trend_window(df: pd.DataFrame, start=None, end=None) -> np.ndarray:
+    """日期落在 [start, end]（含两端，None 表示不限）的试卷位置，按日期排序"""
+    dates = pd.to_datetime(df["日期"], errors="coerce")
+    mask = dates.notna().to_numpy().copy()
+    if start is not None:
+        mask &= (dates >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (dates < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+    pos = np.flatnonzero(mask)
+    return pos[np.argsort(dates.to_numpy()[pos], kind="stable")]
+
+
+def _periods(dates: np.ndarray, freq: str) -> pd.PeriodIndex:
+    return pd.DatetimeIndex(dates).to_period(freq)
+
+
+def trend_auto_freq(df: pd.DataFrame, positions: np.ndarray):
+    """“自动”粒度：套数少时逐套（None），否则取桶数不超过 TREND_MAX_BUCKETS 的最细一档"""
+    if len(positions) <= TREND_RAW_AUTO:
+        return None
+    dates = pd.to_datetime(df["日期"]).to_numpy()[positions]
+    for freq in TREND_FREQS.values():
+        if _periods(dates, freq).nunique() <= TREND_MAX_BUCKETS:
+            return freq
+    return "Y"
+
+
+def trend_frames(
+    df: pd.DataFrame, ms: Dict[str, np.ndarray], positions: np.ndarray, freq: str = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    趋势页的数据：(总分表, 模块正确率长表, 截掉的早期点数)。
+    两张表都有 时间 / 套数 / 均值 / 最低 / 最高；逐套（freq=None）时 最低 = 最高 = 均值，总分表另带“试卷”，
+    按桶时“时间”是桶的起始日。模块表多一列“模块”。每条线最多 TREND_MAX_POINTS 个点。
+    """
+    dates = pd.to_datetime(df["日期"]).to_numpy()[positions]
+    score = df["总分"].to_numpy(dtype=float)[positions]
+    acc = ms["正确率"][positions]
+    k = len(LEAF_MODULES)
+
+    if freq is None:
+        dropped = max(0, len(positions) - TREND_MAX_POINTS)
+        keep = slice(dropped, None)
+        dates, score, acc = dates[keep], score[keep], acc[keep]
+        score_df = pd.DataFrame({
+            "时间": dates,
+            "试卷": df["试卷"].astype(str).to_numpy()[positions][keep],
+            "套数": 1,
+            "均值": score,
+            "最低": score,
+            "最高": score,
+        })
+        flat = acc.reshape(-1)
+        module_df = pd.DataFrame({
+            "时间": np.repeat(dates, k),
+            "模块": np.tile(np.asarray(LEAF_MODULES), len(dates)),
+            "套数": 1,
+            "均值": flat,
+            "最低": flat,
+            "最高": flat,
+        })
+        return _trend_round(score_df, module_df) + (dropped,)
+
+    vals = pd.DataFrame(np.column_stack([score, acc]), columns=["总分"] + LEAF_MODULES)
+    g = vals.groupby(_periods(dates, freq).start_time, sort=True)
+    mean, lo, hi, cnt = g.mean(), g.min(), g.max(), g.size()
+    dropped = max(0, len(mean) - TREND_MAX_POINTS)
+    mean, lo, hi, cnt = mean.iloc[dropped:], lo.iloc[dropped:], hi.iloc[dropped:], cnt.iloc[dropped:]
+    t = mean.index.to_numpy()
+    score_df = pd.DataFrame({
+        "时间": t,
+        "套数": cnt.to_numpy(),
+        "均值": mean["总分"].to_numpy(),
+        "最低": lo["总分"].to_numpy(),
+        "最高": hi["总分"].to_numpy(),
+    })
+    module_df = pd.DataFrame({
+        "时间": np.repeat(t, k),
+        "模块": np.tile(np.asarray(LEAF_MODULES), len(t)),
+        "套数": np.repeat(cnt.to_numpy(), k),
+        "均值": mean[LEAF_MODULES].to_numpy().reshape(-1),
+        "最低": lo[LEAF_MODULES].to_numpy().reshape(-1),
+        "最高": hi[LEAF_MODULES].to_numpy().reshape(-1),
+    })
+    return _trend_round(score_df, module_df) + (dropped,)
+
+
+def _trend_round(score_df: pd.DataFrame, module_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """去掉单精度尾数（分数 2 位、正确率 4 位），图表 JSON 也更短"""
+    cols = ["均值", "最低", "最高"]
+    score_df[cols] = score_df[cols].round(2)
+    module_df[cols] = module_df[cols].round(4)
+    return score_df, module_df
+
+
+# ================== 复盘检索（字二元组倒排索引） ==================
+# “一句话原因 + 下次做法”按字切成 单字 + 相邻二字：中文没有空格分词，二字组合已足够区分“基期 / 现期”这类词。
+# 倒排表：词元 -> (行号列表, 词频列表)，行号递增，新增复盘只需往后追加。
+# 按用户缓存、随 save_reviews 同步的部分在 storage.review_index_sync：已索引的行仍是新表的前缀时只补新增行。
+# 已发布的索引只读：页面不加锁地查它，补新增行时先 _review_index_copy 出一份新的，补完再换引用。
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def review_tokens(text: str) -> List[str]:
+    """切词：每段连续文字输出全部单字 + 相邻二字"""
+    grams = []
+    for run in _TOKEN_RE.findall(str(text).lower()):
+        grams.extend(run)
+        grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def _query_grams(term: str) -> List[str]:
+    """查询词只用二字（更有区分度）；单字词才用单字；不含文字的词返回空列表（search_reviews 改用子串匹配）"""
+    grams = [g for g in review_tokens(term) if len(g) == 2]
+    return list(dict.fromkeys(grams or review_tokens(term)))
+
+
+def _new_review_index() -> Dict:
+    return {
+        "sig": None,
+        "keys": [],          # 每行的内容指纹，用来判断“旧行是否仍是前缀”
+        "texts": [],         # 小写后的 原因 + 换行 + 做法，用于长词的精确校验
+        "paper": [], "module": [], "day": [],   # 筛选列（试卷 / 模块编码，日期序数，无日期为 -1）
+        "codes": {"paper": {}, "module": {}},
+        "post": {},          # 词元 -> ([行号], [词频])
+        "arr": {},           # 词元 / 筛选列 -> numpy 数组缓存（长度变了就重建）
+    }
+
+
+def _review_index_copy(idx: Dict) -> Dict:
+    """浅拷贝各列表 / 字典（倒排表的行号 / 词频列表由 _review_index_add 在第一次写时再复制）"""
+    return {
+        "sig": idx["sig"],
+        "keys": list(idx["keys"]),
+        "texts": list(idx["texts"]),
+        "paper": list(idx["paper"]), "module": list(idx["module"]), "day": list(idx["day"]),
+        "codes": {col: dict(codes) for col, codes in idx["codes"].items()},
+        "post": dict(idx["post"]),
+        "arr": dict(idx["arr"]),
+    }
+
+
+def _review_row_keys(rdf: pd.DataFrame) -> List[str]:
+    cols = [rdf[c].astype(str) for c in REVIEW_SCHEMA]
+    key = cols[0]
+    for c in cols[1:]:
+        key = key + "\x1f" + c
+    return key.tolist()
+
+
+def _review_index_add(idx: Dict, rows: pd.DataFrame, keys: List[str]):
+    """
+    把 rows 追加进索引（行号接在已有行后面）。
+    倒排表里每个词元的列表第一次碰到时换成新列表再追加，拷贝出来的索引不会改到原索引的列表。
+    """
+    days = pd.to_datetime(rows["日期"], errors="coerce")
+    touched = set()
+    texts = (rows["一句话原因"].fillna("").astype(str) + "\n" + rows["下次做法"].fillna("").astype(str)).str.lower()
+    base = len(idx["keys"])
+    for i, (text, paper, module, day) in enumerate(zip(
+        texts.tolist(), rows["试卷"].astype(str).tolist(), rows["模块"].astype(str).tolist(), days.tolist()
+    )):
+        doc = base + i
+        tf: Dict[str, int] = {}
+        for g in review_tokens(text):
+            tf[g] = tf.get(g, 0) + 1
+        for g, n in tf.items():
+            if g not in touched:
+                ids, tfs = idx["post"].get(g, ((), ()))
+                idx["post"][g] = (list(ids), list(tfs))
+                touched.add(g)
+            ids, tfs = idx["post"][g]
+            ids.append(doc)
+            tfs.append(n)
+        idx["texts"].append(text)
+        idx["paper"].append(idx["codes"]["paper"].setdefault(paper, len(idx["codes"]["paper"])))
+        idx["module"].append(idx["codes"]["module"].setdefault(module, len(idx["codes"]["module"])))
+        idx["day"].append(day.toordinal() if not pd.isna(day) else -1)
+    idx["keys"].extend(keys)
+
+
+def _index_array(idx: Dict, name: str, values: List, dtype) -> np.ndarray:
+    cached = idx["arr"].get(name)
+    if cached is None or len(cached) != len(values):
+        cached = np.array(values, dtype=dtype)
+        idx["arr"][name] = cached
+    return cached
+
+
+def parse_review_query(q: str) -> List[List[str]]:
+    """
+    “基期 速算” → [["基期", "速算"]]（空格 = 同时包含）
+    “基期 | 速算” / “基期 OR 速算” → [["基期"], ["速算"]]（任一组命中即可）
+    """
+    groups = re.split(r"\s*(?:\||｜|\bOR\b)\s*", q.strip())
+    return [g.split() for g in groups if g.split()]
+
+
+def search_reviews(
+    idx: Dict,
+    query: str = "",
+    paper: str = None,
+    module: str = None,
+    start=None,
+    end=None,
+) -> np.ndarray:
+    """
+    在索引里查复盘，返回 rdf 的行号：
+    - 有关键词：按相关度（Σ 词频 × idf，再按日期新→旧）排序
+    - 无关键词：只做筛选，保持原有行序
+    paper / module 为 None 表示不筛选；start / end 为 date，含端点。
+    """
+    n = len(idx["keys"])
+    mask = np.ones(n, dtype=bool)
+    day = _index_array(idx, "day", idx["day"], np.int32)
+    for col, val in (("paper", paper), ("module", module)):
+        if val is not None:
+            code = idx["codes"][col].get(str(val))
+            if code is None:
+                return np.array([], dtype=np.int64)
+            mask &= _index_array(idx, col, idx[col], np.int32) == code
+    if start is not None:
+        mask &= day >= start.toordinal()
+    if end is not None:
+        mask &= day <= end.toordinal()
+
+    groups = parse_review_query(query)
+    if not groups:
+        return np.flatnonzero(mask)
+
+    score = np.zeros(n, dtype=np.float32)
+    hit = np.zeros(n, dtype=bool)
+    for terms in groups:
+        group_hit = mask.copy()
+        for term in terms:
+            term_hit = np.zeros(n, dtype=bool)
+            grams = _query_grams(term)
+            if not grams:
+                # 不含文字的词（%、+、× 等）切不出词元，退回到逐行子串匹配（只看还在候选里的行）
+                cand = np.flatnonzero(group_hit)
+                term_hit[[i for i in cand if term.lower() in idx["texts"][i]]] = True
+                group_hit &= term_hit
+                continue
+            first = True
+            for g in grams:
+                post = idx["post"].get(g)
+                if post is None:
+                    term_hit[:] = False
+                    break
+                ids = _index_array(idx, ("ids", g), post[0], np.int32)
+                tfs = _index_array(idx, ("tf", g), post[1], np.float32)
+                gram_hit = np.zeros(n, dtype=bool)
+                gram_hit[ids] = True
+                term_hit = gram_hit if first else term_hit & gram_hit
+                first = False
+                score[ids] += tfs * np.float32(np.log1p(n / len(ids)))
+            # 超过两个字的词：二元组都在不代表连续出现，候选行再做一次子串校验
+            term_l = term.lower()
+            if len(term_l) > 2 and term_hit.any():
+                cand = np.flatnonzero(term_hit & group_hit)
+                keep = [i for i in cand if term_l in idx["texts"][i]]
+                term_hit[:] = False
+                term_hit[keep] = True
+            group_hit &= term_hit
+        hit |= group_hit
+
+    rows = np.flatnonzero(hit)
+    order = np.lexsort((-day[rows], -score[rows]))
+    return rows[order]
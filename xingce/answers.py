@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+逐题作答：每套卷一块定长记录（numpy 结构化数组），记 题号 / 模块 / 对错·放弃·蒙猜标记 / 用时秒。
+
+- 每题 8 字节（题号 u2 + 模块 u1 + 标记 u1 + 用时 f4），125 题一套约 1KB，几千套卷也只有几 MB，
+  读盘就是一次 read + 按块头切片，不解析文本；
+- 存盘格式：块头（试卷ID 16 字节 + 题数 u2）后面跟该卷的题目记录，一块接一块追加；
+  同一试卷ID 后写的块覆盖先写的，题数为 0 的块表示删除；超长或含非 ASCII 字符的试卷ID 在块头里存成定长哈希；
+- 模块合计（总题数 / 正确数 / 用时 / 正确率，以及数量 / 资料的跳过、蒙猜题数）从逐题记录推出，录入时不用再手填；
+- 计时器逐题计次：每点一次记下计时器读数（暂停不走），相邻两次之差就是一道题的用时，导出时填进答题卡。
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import DEFAULT_STRATEGY, LEAF_MODULES
+
+ANSWER_DTYPE = np.dtype([("q", "<u2"), ("module", "u1"), ("flags", "u1"), ("sec", "<f4")])
+BLOCK_HEAD_DTYPE = np.dtype([("pid", "S16"), ("n", "<u2")])
+PID_BYTES = BLOCK_HEAD_DTYPE["pid"].itemsize
+
+FLAG_CORRECT = 1
+FLAG_SKIP = 2
+FLAG_GUESS = 4
+
+# 成绩表里已有“跳过题数 / 蒙猜题数”两列的模块（录入页的补充信息）
+SKIP_GUESS_MODULES = ["数量关系", "资料分析"]
+
+# 有每题时间上限的模块 -> 策略里的键
+QUESTION_LIMIT_KEYS = {"数量关系": "数量_每题上限秒", "判断-逻辑判断": "逻辑_每题上限秒"}
+
+
+# ================== 答题卡 ==================
+def new_sheet(totals: Dict[str, int]) -> np.ndarray:
+    """按 LEAF_MODULES 顺序生成一张答题卡（题号从 1 连续编号，默认全部做对、用时 0，录入时只勾错题）"""
+    counts = [int(totals.get(m, 0)) for m in LEAF_MODULES]
+    arr = np.zeros(sum(counts), dtype=ANSWER_DTYPE)
+    arr["q"] = np.arange(1, len(arr) + 1)
+    arr["module"] = np.repeat(np.arange(len(LEAF_MODULES)), counts)
+    arr["flags"] = FLAG_CORRECT
+    return arr
+
+
+def sheet_frame(arr: np.ndarray) -> pd.DataFrame:
+    """答题卡 → 表格（录入页的可编辑表 / 单卷详情展示）：题号 / 模块 / 错 / 跳过 / 蒙猜 / 用时(秒)"""
+    flags = arr["flags"]
+    return pd.DataFrame({
+        "题号": arr["q"].astype(int),
+        "模块": np.asarray(LEAF_MODULES)[arr["module"]],
+        "错": (flags & (FLAG_CORRECT | FLAG_SKIP)) == 0,
+        "跳过": (flags & FLAG_SKIP) != 0,
+        "蒙猜": (flags & FLAG_GUESS) != 0,
+        "用时(秒)": arr["sec"].astype(float).round(1),
+    })
+
+
+def frame_sheet(frame: pd.DataFrame) -> np.ndarray:
+    """sheet_frame 的逆：表格 → 答题卡。没勾“错”也没勾“跳过”的算做对"""
+    arr = np.zeros(len(frame), dtype=ANSWER_DTYPE)
+    arr["q"] = frame["题号"].to_numpy(dtype=int)
+    arr["module"] = pd.Categorical(frame["模块"], categories=LEAF_MODULES).codes
+    wrong = frame["错"].fillna(False).to_numpy(dtype=bool)
+    skip = frame["跳过"].fillna(False).to_numpy(dtype=bool)
+    guess = frame["蒙猜"].fillna(False).to_numpy(dtype=bool)
+    arr["flags"] = (~wrong & ~skip) * FLAG_CORRECT + skip * FLAG_SKIP + guess * FLAG_GUESS
+    arr["sec"] = pd.to_numeric(frame["用时(秒)"], errors="coerce").fillna(0).clip(lower=0).to_numpy()
+    return arr
+
+
+def sheet_totals(arr: np.ndarray, plan: Dict[str, float], weight: float, actual: Dict[str, float] = None) -> Dict:
+    """
+    答题卡 → 成绩记录里的合计字段（模块 5 列、数量 / 资料的跳过 / 蒙猜题数、总分 / 总正确数 / 总题数 / 总用时）。
+    actual 是计时器按模块记下的用时（分钟，含最后一题之后检查的时间），有就优先用；
+    否则取逐题用时之和，某模块一道题都没填用时就按计划用时记，免得算成 0 分钟。
+    """
+    actual = actual or {}
+    k = len(LEAF_MODULES)
+    mod = arr["module"]
+    total = np.bincount(mod, minlength=k)
+    correct = np.bincount(mod, weights=(arr["flags"] & FLAG_CORRECT) != 0, minlength=k)
+    skip = np.bincount(mod, weights=(arr["flags"] & FLAG_SKIP) != 0, minlength=k)
+    guess = np.bincount(mod, weights=(arr["flags"] & FLAG_GUESS) != 0, minlength=k)
+    sec = np.bincount(mod, weights=arr["sec"], minlength=k)
+
+    out = {}
+    for i, m in enumerate(LEAF_MODULES):
+        p = float(plan.get(m, 0))
+        if m in actual:
+            minutes = float(actual[m])
+        else:
+            minutes = round(float(sec[i]) / 60, 1) if sec[i] > 0 else p
+        out.update({
+            f"{m}_总题数": int(total[i]),
+            f"{m}_正确数": int(correct[i]),
+            f"{m}_用时": minutes,
+            f"{m}_正确率": float(correct[i]) / total[i] if total[i] else 0,
+            f"{m}_计划用时": p,
+        })
+        if m in SKIP_GUESS_MODULES:
+            out[f"{m}_跳过题数"] = int(skip[i])
+            out[f"{m}_蒙猜题数"] = int(guess[i])
+    out.update({
+        "总分": round(float(correct.sum()) * weight, 2),
+        "总正确数": int(correct.sum()),
+        "总题数": int(total.sum()),
+        "总用时": round(sum(out[f"{m}_用时"] for m in LEAF_MODULES), 1),
+    })
+    return out
+
+
+def wrong_numbers(arr: np.ndarray) -> Dict[str, List[int]]:
+    """各模块做错（含跳过）的题号"""
+    miss = (arr["flags"] & FLAG_CORRECT) == 0
+    return {
+        m: arr["q"][miss & (arr["module"] == i)].astype(int).tolist()
+        for i, m in enumerate(LEAF_MODULES)
+        if (miss & (arr["module"] == i)).any()
+    }
+
+
+def over_limit(arr: np.ndarray, strategy: Dict) -> np.ndarray:
+    """每道题是否超过策略里的每题上限（数量 / 逻辑判断；其余模块恒为 False）"""
+    limit = np.full(len(LEAF_MODULES), np.inf)
+    for m, key in QUESTION_LIMIT_KEYS.items():
+        limit[LEAF_MODULES.index(m)] = float(strategy.get(key, DEFAULT_STRATEGY[key]))
+    return arr["sec"] > limit[arr["module"]]
+
+
+# ================== 计时器逐题计次 ==================
+def lap_durations(stamps, codes) -> Dict[str, np.ndarray]:
+    """
+    计次缓冲 → 各模块每道题的用时（秒，按点击顺序）。
+    stamps 是每次点击时的计时器读数，codes 是当时所在模块在 LEAF_MODULES 里的下标（timer.LAP_MODULE_END = 模块结束）。
+    """
+    t = np.asarray(stamps, dtype=float)
+    c = np.asarray(codes, dtype=np.uint8)
+    dur = np.diff(t, prepend=0.0)
+    return {m: dur[c == i] for i, m in enumerate(LEAF_MODULES) if (c == i).any()}
+
+
+def apply_laps(arr: np.ndarray, stamps, codes) -> np.ndarray:
+    """
+    把计次用时按顺序填进答题卡各模块的题，返回新的答题卡。
+    某模块点的次数比题多时，多出来的时间并进该模块最后一题；没点到的题用时保持原样。
+    """
+    out = arr.copy()
+    for m, dur in lap_durations(stamps, codes).items():
+        idx = np.flatnonzero(out["module"] == LEAF_MODULES.index(m))
+        if not len(idx):
+            continue
+        n = min(len(idx), len(dur))
+        out["sec"][idx[:n]] = dur[:n]
+        if len(dur) > n:
+            out["sec"][idx[n - 1]] += dur[n:].sum()
+    return out
+
+
+# ================== 存盘格式（块头 + 定长记录） ==================
+def answer_key(pid: str) -> str:
+    """
+    试卷ID 在块头里的键：可打印 ASCII 且不超过 16 字节的原样存；
+    其余（导入或手填的长ID、中文ID）存成 "#" + 15 位哈希，读出来后用 resolve_keys 换回原ID。
+    """
+    pid = str(pid)
+    if pid.isascii() and pid.isprintable() and len(pid) <= PID_BYTES:
+        return pid
+    return "#" + hashlib.blake2b(pid.encode("utf-8"), digest_size=8).hexdigest()[:PID_BYTES - 1]
+
+
+def resolve_keys(sheets: Dict[str, np.ndarray], pids: Iterable[str]) -> Dict[str, np.ndarray]:
+    """把哈希键换回完整试卷ID（pids 取成绩表里的试卷ID）；对不上的键保持原样"""
+    if not any(k.startswith("#") for k in sheets):
+        return sheets
+    full = {answer_key(p): p for p in map(str, pids)}
+    return {full.get(k, k): a for k, a in sheets.items()}
+
+
+def encode_block(pid: str, arr: np.ndarray = None) -> bytes:
+    """一套卷的块；arr 为 None 时写删除标记"""
+    head = np.zeros(1, dtype=BLOCK_HEAD_DTYPE)
+    head["pid"] = answer_key(pid).encode("ascii")
+    if arr is None:
+        return head.tobytes()
+    head["n"] = len(arr)
+    return head.tobytes() + np.ascontiguousarray(arr, dtype=ANSWER_DTYPE).tobytes()
+
+
+def encode_blocks(sheets: Dict[str, np.ndarray]) -> bytes:
+    """整份重写（压缩 / 导出）：每套卷一块，不含删除标记"""
+    return b"".join(encode_block(pid, arr) for pid, arr in sheets.items())
+
+
+def decode_blocks(buf: bytes, strict: bool = False) -> Tuple[Dict[str, np.ndarray], int, int]:
+    """
+    依次读块，返回 (块头键 -> 答题卡, 完整块读到的字节数, 损坏块数)。
+    答题卡是只读视图，直接指向 buf；后写的块覆盖先写的，题数为 0 的块删除该卷。
+    末尾不完整的块（写到一半断电）不算在读到的字节数里，追加前按它截掉。
+    块头不是 ASCII、模块 / 标记越界的块跳过并计数；strict=True（导入）时抛 ValueError。
+    """
+    out, bad = {}, 0
+    off, head, size = 0, BLOCK_HEAD_DTYPE.itemsize, ANSWER_DTYPE.itemsize
+    while off + head <= len(buf):
+        h = np.frombuffer(buf, BLOCK_HEAD_DTYPE, count=1, offset=off)[0]
+        n = int(h["n"])
+        end = off + head + n * size
+        if end > len(buf):
+            break
+        arr = np.frombuffer(buf, ANSWER_DTYPE, count=n, offset=off + head)
+        pid = h["pid"].decode("ascii", errors="replace")
+        if not h["pid"].isascii():
+            problem = "试卷ID 不是 ASCII"
+        elif n and (arr["module"].max() >= len(LEAF_MODULES) or arr["flags"].max() > FLAG_CORRECT | FLAG_SKIP | FLAG_GUESS):
+            problem = "模块或标记越界"
+        else:
+            problem = None
+        if problem:
+            if strict:
+                raise ValueError(f"逐题记录损坏：试卷 {pid} 的{problem}")
+            bad += 1
+        else:
+            if n == 0:
+                out.pop(pid, None)
+            else:
+                out[pid] = arr
+        off = end
+    return out, off, bad
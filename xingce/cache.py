@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+读盘缓存：进程级，按 (用户, 文件路径 / 数据类别) 缓存解析结果，签名变了就失效。
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import Dict
+
+
+# ================== 读盘缓存（按 mtime / size 失效） ==================
+# Streamlit 每次 rerun 都会重新执行整个脚本，这里把“读盘 + 规整”的结果缓存在进程里，
+# 键为 (用户, 文件路径)，值里带上文件签名 (mtime_ns, size)，签名变了就视为失效。
+# SQLite 后端用同一套缓存，签名换成该用户该类数据的版本号。
+@lru_cache(maxsize=None)
+def _loader_cache() -> Dict:
+    """进程级读盘缓存（所有会话共享），附带命中 / 未命中计数"""
+    return {"lock": threading.Lock(), "entries": {}, "hits": 0, "misses": 0}
+
+
+def _file_sig(path: str):
+    """文件签名 (mtime_ns, size)；文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _cached_value(un: str, key, sig, build):
+    """按 (用户, key) 缓存 build() 的结果，sig 不同即重新构建"""
+    cache = _loader_cache()
+    with cache["lock"]:
+        ent = cache["entries"].get((un, key))
+        if ent is not None and ent[0] == sig:
+            cache["hits"] += 1
+            return ent[1]
+        cache["misses"] += 1
+    value = build()
+    with cache["lock"]:
+        cache["entries"][(un, key)] = (sig, value)
+    return value
+
+
+def _cached_read(un: str, path, parse):
+    """
+    读取 path 并缓存 parse(path) 的结果；文件不存在返回 None。
+    path 也可以是多个文件组成的 tuple（如 快照 + 日志），任一文件变化都会失效。
+    返回的是缓存对象本身，调用方需要自行 copy 后再交给页面修改。
+    """
+    if isinstance(path, tuple):
+        sig = tuple(_file_sig(p) for p in path)
+        if all(x is None for x in sig):
+            return None
+    else:
+        sig = _file_sig(path)
+        if sig is None:
+            return None
+    # 签名取在解析之前：解析期间文件若被改写，下次读取会因签名不符而重新解析
+    return _cached_value(un, path, sig, lambda: parse(path))
+
+
+def _cache_invalidate(un: str, path: str = None):
+    """写盘后让缓存失效；不传 path 时清掉该用户的全部缓存"""
+    cache = _loader_cache()
+    with cache["lock"]:
+        for key in [k for k in cache["entries"] if k[0] == un]:
+            if path is None or key[1] == path or (isinstance(key[1], tuple) and path in key[1]):
+                del cache["entries"][key]
+
+
+def loader_cache_stats() -> Dict:
+    """读盘缓存统计：命中 / 未命中次数、缓存条目数"""
+    cache = _loader_cache()
+    with cache["lock"]:
+        return {
+            "hits": cache["hits"],
+            "misses": cache["misses"],
+            "entries": len(cache["entries"]),
+            "users": len({k[0] for k in cache["entries"]}),
+        }
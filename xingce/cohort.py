@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+学员总览（管理后台）：把所有账号的成绩 / 复盘压成一张列式总表，每个账号一行。
+
+- 每行只留汇总：套数、最近录入 / 复盘日期、近 5 套均分及变化、各模块近 3 套正确率 / 较全部均值的变化 / 近 3 套超时，
+  复盘错题按天累计（“近 30 天错题”在出表时按当天算）。读盘走 peek_*，不把任何人的整张表留在进程里。
+- 要重读的账号多时用进程池并行（和 reports.py 一样）：读盘后的规整（ensure_schema）基本是纯 Python，
+  线程池受 GIL 限制几乎没有加速。子进程用 spawn 启动，不从多线程的 Streamlit 进程里 fork；只回传汇总行。
+- 增量刷新：每行带着该账号的数据版本（file 后端是快照 + 日志 + 复盘文件的 mtime / 大小，sqlite 是版本号），
+  版本没变的账号直接复用，只重读变了的。
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import config
+from .accounts import list_usernames
+from .analytics import AGG_MODULE_WINDOW, AGG_SCORE_WINDOW, module_stats, recent_module_mean
+from .config import LEAF_MODULES
+from .storage import data_version, peek_data, peek_reviews
+
+COHORT_WORKERS = min(8, os.cpu_count() or 1)   # 进程数
+COHORT_POOL_MIN = 24       # 要重读的账号不少于这么多才开进程池（起进程本身要 1 秒左右）
+COHORT_REVIEW_DAYS = 30    # “近 N 天错题”
+
+# 排序方式 -> (rank_cohort 输出的列, 是否升序)
+COHORT_SORTS = {
+    "正确率变化（跌得多的在前）": ("正确率变化", True),
+    "近期正确率（低的在前）": ("近期正确率", True),
+    "近期超时（多的在前）": ("近期超时", False),
+    "未录入天数（久的在前）": ("未录入天数", False),
+    "近5套均分（低的在前）": ("近5套均分", True),
+}
+
+_MODULE_FIELDS = ("近期正确率", "正确率变化", "近期超时")
+
+
+# ================== 单个账号的汇总 ==================
+def _empty_row() -> Dict:
+    nan = np.full(len(LEAF_MODULES), np.nan)
+    return {
+        "套数": 0,
+        "最近录入": None,
+        "近5套均分": np.nan,
+        "均分变化": np.nan,
+        "复盘条数": 0,
+        "最近复盘": None,
+        "错题按天": (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)),
+        "近期正确率": nan,
+        "正确率变化": nan,
+        "近期超时": nan,
+        "错误": "",
+    }
+
+
+def _user_row(un: str) -> Dict:
+    """读一个账号并压成一行；读失败（文件损坏等）时只在“错误”里记原因，不影响其他人"""
+    row = _empty_row()
+    try:
+        df = peek_data(un)
+        if not df.empty:
+            ms = module_stats(df)
+            scores = df["总分"].to_numpy(dtype=float)
+            recent, before = scores[-AGG_SCORE_WINDOW:], scores[-2 * AGG_SCORE_WINDOW:-AGG_SCORE_WINDOW]
+            acc_recent = recent_module_mean(ms, "正确率", AGG_MODULE_WINDOW)
+            row.update({
+                "套数": len(df),
+                "最近录入": pd.Timestamp(df["日期"].max()).date() if df["日期"].notna().any() else None,
+                "近5套均分": float(recent.mean()),
+                "均分变化": float(recent.mean() - before.mean()) if len(before) else np.nan,
+                "近期正确率": acc_recent,
+                "正确率变化": acc_recent - ms["正确率"].mean(axis=0),
+                "近期超时": recent_module_mean(ms, "超时", AGG_MODULE_WINDOW),
+            })
+
+        rdf = peek_reviews(un)
+        if not rdf.empty:
+            days = pd.to_datetime(rdf["日期"], errors="coerce")
+            wrong = pd.to_numeric(rdf["错题数"], errors="coerce").fillna(0)
+            per_day = wrong[days.notna()].groupby(days[days.notna()].dt.date).sum()
+            row.update({
+                "复盘条数": len(rdf),
+                "最近复盘": per_day.index.max() if len(per_day) else None,
+                "错题按天": (
+                    np.array([d.toordinal() for d in per_day.index], dtype=np.int32),
+                    per_day.to_numpy(dtype=np.float32),
+                ),
+            })
+    except Exception as e:
+        row = _empty_row()
+        row["错误"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _init_worker(backend: str, sqlite_path: str):
+    # spawn 出来的子进程拿不到父进程里改过的配置，这里再设一次
+    config.configure(storage_backend=backend, sqlite_path=sqlite_path)
+
+
+def _read_rows(users: List[str], workers: int) -> List[Dict]:
+    if len(users) < COHORT_POOL_MIN or workers <= 1:
+        return [_user_row(un) for un in users]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(users)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(config.STORAGE_BACKEND, config.SQLITE_PATH),
+    ) as pool:
+        return list(pool.map(_user_row, users, chunksize=max(1, len(users) // (workers * 4))))
+
+
+# ================== 总表（进程级，按数据版本增量刷新） ==================
+@lru_cache(maxsize=None)
+def _cohort_store() -> Dict:
+    """进程级：账号 -> (数据版本, 汇总行)"""
+    return {"lock": threading.Lock(), "users": {}}
+
+
+def _user_sig(un: str):
+    return (data_version(un, "records"), data_version(un, "reviews"))
+
+
+def cohort_table(rows: Dict[str, Dict], today: date = None) -> pd.DataFrame:
+    """
+    汇总行 -> 列式总表：每个账号一行，标量列 + 每个模块 3 列（{模块}_近期正确率 / _正确率变化 / _近期超时）。
+    未录入天数、近 N 天错题按 today 现算（从没录过成绩的未录入天数为 NaN）。
+    """
+    today = today or date.today()
+    names = list(rows)
+    vals = [rows[un] for un in names]
+    cutoff = today.toordinal() - COHORT_REVIEW_DAYS
+    cols = {
+        "账号": names,
+        "套数": np.array([v["套数"] for v in vals], dtype=np.int64),
+        "最近录入": [v["最近录入"] for v in vals],
+        "未录入天数": np.array(
+            [(today - v["最近录入"]).days if v["最近录入"] else np.nan for v in vals], dtype=float
+        ),
+        "近5套均分": np.array([v["近5套均分"] for v in vals], dtype=float),
+        "均分变化": np.array([v["均分变化"] for v in vals], dtype=float),
+        "复盘条数": np.array([v["复盘条数"] for v in vals], dtype=np.int64),
+        "最近复盘": [v["最近复盘"] for v in vals],
+        f"近{COHORT_REVIEW_DAYS}天错题": np.array(
+            [float(w[d > cutoff].sum()) for d, w in (v["错题按天"] for v in vals)], dtype=float
+        ),
+    }
+    k = len(LEAF_MODULES)
+    for field in _MODULE_FIELDS:
+        mat = np.vstack([v[field] for v in vals]) if vals else np.zeros((0, k))
+        for i, m in enumerate(LEAF_MODULES):
+            cols[f"{m}_{field}"] = mat[:, i]
+    cols["错误"] = [v["错误"] for v in vals]
+    return pd.DataFrame(cols)
+
+
+def refresh_cohort(users: List[str] = None, workers: int = COHORT_WORKERS) -> Tuple[pd.DataFrame, Dict]:
+    """
+    增量刷新并返回 (总表, 统计)。users 默认取用户库里的全部账号（此时已删除的账号也会被清掉）。
+    统计：账号 / 重读 / 复用 / 秒。
+    """
+    t0 = time.perf_counter()
+    full = users is None
+    users = list_usernames() if full else list(users)
+    # 版本取在读盘之前：读的过程中有人写入时，下次刷新会因版本不符再读一次
+    sigs = {un: _user_sig(un) for un in users}
+    store = _cohort_store()
+    with store["lock"]:
+        stale = [un for un in users if store["users"].get(un, (None,))[0] != sigs[un]]
+
+    fresh = _read_rows(stale, workers)
+
+    with store["lock"]:
+        for un, row in zip(stale, fresh):
+            store["users"][un] = (sigs[un], row)
+        if full:
+            for un in set(store["users"]) - set(users):
+                del store["users"][un]
+        rows = {un: store["users"][un][1] for un in users}
+
+    stats = {
+        "账号": len(users),
+        "重读": len(stale),
+        "复用": len(users) - len(stale),
+        "秒": round(time.perf_counter() - t0, 3),
+    }
+    return cohort_table(rows), stats
+
+
+def rank_cohort(
+    table: pd.DataFrame,
+    module: str = None,
+    sort: str = "正确率变化",
+    ascending: bool = True,
+    idle_days: int = 0,
+    query: str = "",
+) -> pd.DataFrame:
+    """
+    按一个模块（None = 各模块平均；超时取合计）排序 / 筛选总表，返回展示用的窄表。
+    idle_days > 0 时只看至少这么多天没录成绩的（从没录过的也算）；query 按账号子串过滤。
+    空值（没有成绩）排在最后。
+    """
+    out = table[["账号", "套数", "最近录入", "未录入天数", "近5套均分", "均分变化"]].copy()
+    if module is None:
+        for field in _MODULE_FIELDS:
+            mat = table[[f"{m}_{field}" for m in LEAF_MODULES]].to_numpy(dtype=float)
+            cnt = (~np.isnan(mat)).sum(axis=1)
+            total = np.nansum(mat, axis=1)
+            agg = total if field == "近期超时" else total / np.maximum(cnt, 1)
+            out[field] = np.where(cnt > 0, agg, np.nan)
+    else:
+        for field in _MODULE_FIELDS:
+            out[field] = table[f"{module}_{field}"].to_numpy(dtype=float)
+    out[f"近{COHORT_REVIEW_DAYS}天错题"] = table[f"近{COHORT_REVIEW_DAYS}天错题"]
+    out["最近复盘"] = table["最近复盘"]
+    out["错误"] = table["错误"]
+
+    keep = np.ones(len(out), dtype=bool)
+    if idle_days > 0:
+        idle = out["未录入天数"].to_numpy()
+        keep &= np.isnan(idle) | (idle >= idle_days)
+    if query:
+        keep &= out["账号"].str.contains(query, regex=False).to_numpy()
+    out = out[keep]
+    return out.sort_values(sort, ascending=ascending, na_position="last", kind="stable", ignore_index=True)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+配置与模块结构：题型 / 计划用时 / 试卷模板 / 默认策略，以及每个用户的数据文件路径。
+
+只依赖标准库，登录页也可以直接导入。
+部署相关的配置（存储后端、SQLite 路径、管理员初始密码）默认读环境变量，
+Streamlit 页面启动时再用 st.secrets 里的值调用 configure() 覆盖。
+"""
+
+import os
+from typing import List
+from urllib.parse import quote
+
+
+USERS_FILE = "users_db.json"   # 旧版单文件用户库，首次访问时拆分到 USERS_DIR
+USERS_DIR = "users_db"         # 每个账号一个 JSON：users_db/<账号>.json
+FIXED_WEIGHT = 0.8           # 默认：省考 / 超格 每个对题0.8分
+GOAL_SCORE = 75.0            # 目标分，可按需调整
+
+# 模块结构：大模块 / 子模块
+MODULE_STRUCTURE = {
+    "政治理论": {"type": "direct", "total": 15},
+    "常识判断": {"type": "direct", "total": 15},
+    "言语理解": {
+        "type": "parent",
+        "subs": {"言语-逻辑填空": 10, "言语-片段阅读": 15}
+    },
+    "数量关系": {"type": "direct", "total": 15},
+    "判断推理": {
+        "type": "parent",
+        "subs": {
+            "判断-图形推理": 5,
+            "判断-定义判断": 10,
+            "判断-类比推理": 10,
+            "判断-逻辑判断": 10
+        }
+    },
+    "资料分析": {"type": "direct", "total": 20},
+}
+
+# 每个子模块推荐的计划用时（分钟）
+PLAN_TIME = {
+    "判断-图形推理": 6.0,
+    "判断-类比推理": 5.0,
+    "判断-逻辑判断": 10.0,
+    "判断-定义判断": 6.0,
+    "资料分析": 25.0,
+    "数量关系": 25.0,
+    "政治理论": 5.0,
+    "常识判断": 5.0,
+    "言语-逻辑填空": 5.0,
+    "言语-片段阅读": 12.0,
+}
+
+
+# ================= 试卷题量与每题分值模板 =================
+# 试卷题量 & 每题分值模板（录入成绩时选择）
+PAPER_TEMPLATES = {
+    # 省考试卷：125题，每题0.8
+    "省考套题（125题，0.8分/题）": {
+        "weight": FIXED_WEIGHT,
+        "totals": {
+            "政治理论": 15,
+            "常识判断": 15,
+            "言语-逻辑填空": 10,
+            "言语-片段阅读": 15,
+            "数量关系": 15,
+            "判断-图形推理": 5,
+            "判断-定义判断": 10,
+            "判断-类比推理": 10,
+            "判断-逻辑判断": 10,
+            "资料分析": 20,
+        },
+    },
+
+    # 花生套题：120题，每题0.85
+    "花生套题（120题，0.85分/题）": {
+        "weight": 0.85,
+        "totals": {
+            "政治理论": 15,
+            "常识判断": 10,
+            "言语-逻辑填空": 15,
+            "言语-片段阅读": 15,
+            "数量关系": 15,
+            "判断-图形推理": 5,
+            "判断-定义判断": 10,
+            "判断-类比推理": 5,
+            "判断-逻辑判断": 10,
+            "资料分析": 20,
+        },
+    },
+
+    # 超格套题：125题，每题0.8
+    "超格套题（125题，0.8分/题）": {
+        "weight": FIXED_WEIGHT,
+        "totals": {
+            "政治理论": 15,
+            "常识判断": 15,
+            "言语-逻辑填空": 10,
+            "言语-片段阅读": 20,
+            "数量关系": 15,
+            "判断-图形推理": 5,
+            "判断-定义判断": 10,
+            "判断-类比推理": 5,
+            "判断-逻辑判断": 10,
+            "资料分析": 20,
+        },
+    },
+}
+
+
+
+# 默认策略：数量/资料/逻辑的时间上限等
+DEFAULT_STRATEGY = {
+    "数量_每题上限秒": 60,        # 数量：每题时间上限（秒）
+    "资料_每篇上限分钟": 6,      # 资料：每篇时间上限（分钟）
+    "逻辑_每题上限秒": 90,       # 逻辑判断：每题时间上限（秒）
+    "数量_只做简单题": True,     # 数量是否只做简单题
+    "资料_超时先跳": True,       # 资料是否超时先跳
+    "复盘_统计天数": 30,        # 看板错因统计范围（天）
+    "自定义策略备注": "",        # 用户自定义策略说明（长文本）
+}
+
+# 成绩存储模式：True = 新增试卷只追加一行日志（删除写墓碑），累计到一定条数再压缩进 CSV 快照；
+# False = 每次都整表重写 data_storage_<un>.csv（旧行为）
+APPEND_ONLY_RECORDS = True
+DATA_LOG_COMPACT_AT = 50     # 日志累计多少条后自动压缩
+
+# 复盘记录表的列结构
+REVIEW_SCHEMA = [
+    "日期", "试卷", "模块", "错题数",
+    "错因1_知识点不会", "错因2_方法不熟", "错因3_审题选项坑",
+    "一句话原因", "下次做法"
+]
+
+
+# ================== 部署配置 ==================
+# 存储后端：file（默认，每个用户若干 CSV / JSON 文件）或 sqlite（单个数据库，WAL 模式）
+STORAGE_BACKEND = os.environ.get("XC_STORAGE_BACKEND", "file")
+SQLITE_PATH = os.environ.get("XC_SQLITE_PATH", "xingce.db")
+# 管理员初始密码：首次运行、还没有用户库时用来生成 admin 账号
+ADMIN_DEFAULT_PASSWORD = os.environ.get("ADMIN_DEFAULT_PASSWORD") or None
+
+
+def configure(storage_backend: str = None, sqlite_path: str = None, admin_default_password: str = None):
+    """覆盖部署配置；传 None 的项保持不变"""
+    global STORAGE_BACKEND, SQLITE_PATH, ADMIN_DEFAULT_PASSWORD
+    if storage_backend:
+        STORAGE_BACKEND = storage_backend
+    if sqlite_path:
+        SQLITE_PATH = sqlite_path
+    if admin_default_password:
+        ADMIN_DEFAULT_PASSWORD = admin_default_password
+
+
+def get_leaf_modules() -> List[str]:
+    """展开所有叶子模块（直接做题的粒度）"""
+    leaves = []
+    for k, v in MODULE_STRUCTURE.items():
+        if v["type"] == "direct":
+            leaves.append(k)
+        else:
+            leaves.extend(v["subs"].keys())
+    return leaves
+
+
+LEAF_MODULES = get_leaf_modules()
+
+
+def data_file(un: str) -> str:
+    """当前用户的成绩文件路径"""
+    return f"data_storage_{un}.csv"
+
+
+def review_file(un: str) -> str:
+    """当前用户的复盘记录文件路径"""
+    return f"review_notes_{un}.csv"
+
+
+def strategy_file(un: str) -> str:
+    """当前用户的策略配置文件路径"""
+    return f"strategy_{un}.json"
+
+
+def checkin_file(un: str) -> str:
+    """当前用户的打卡记录文件路径"""
+    return f"checkin_{un}.json"
+
+
+def user_file(un: str) -> str:
+    """账号在用户库里的文件路径（账号名按 URL 编码，斜杠等字符不会逃出目录）"""
+    return os.path.join(USERS_DIR, quote(un, safe="") + ".json")
+
+
+def data_log_file(un: str) -> str:
+    """当前用户的成绩追加日志路径（新增 / 删除先写这里，压缩时再并入快照）"""
+    return f"data_log_{un}.jsonl"
+
+
+def answer_file(un: str) -> str:
+    """当前用户的逐题作答记录（二进制，定长记录按卷分块追加）"""
+    return f"answers_{un}.bin"
+
+
+def timer_file(un: str) -> str:
+    """当前用户做题计时器的会话日志（每行一条事件，重置时清空）"""
+    return f"timer_{un}.jsonl"
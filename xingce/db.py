@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 连接与版本号（sqlite 后端共用）：每个线程一条连接，首次连接时建表。
+"""
+
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Tuple
+
+from . import config
+from .cache import _cache_invalidate
+
+
+def _json_default(o):
+    """json.dumps 兜底：numpy 标量 / 日期 等转成普通值"""
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+# ================== sqlite 后端 ==================
+# 表结构：成绩 / 复盘按行存 JSON（列随模板可变），另外冗余出 un / day / paper 等列建索引；
+# 策略 / 打卡存在 docs 表；versions 表记录每个用户每类数据的版本号，供读盘缓存判断失效。
+_SQLITE_DDL = """
+CREATE TABLE IF NOT EXISTS records(
+    seq   INTEGER PRIMARY KEY AUTOINCREMENT,
+    un    TEXT NOT NULL,
+    pid   TEXT,
+    day   TEXT,
+    paper TEXT,
+    label TEXT,
+    body  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_un_day ON records(un, day);
+CREATE INDEX IF NOT EXISTS idx_records_un_label ON records(un, label);
+CREATE TABLE IF NOT EXISTS reviews(
+    seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+    un     TEXT NOT NULL,
+    day    TEXT,
+    paper  TEXT,
+    module TEXT,
+    body   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_un_day ON reviews(un, day);
+CREATE TABLE IF NOT EXISTS docs(
+    un   TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY(un, kind)
+);
+CREATE TABLE IF NOT EXISTS answers(
+    un   TEXT NOT NULL,
+    pid  TEXT NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY(un, pid)
+);
+CREATE TABLE IF NOT EXISTS timer_events(
+    seq  INTEGER PRIMARY KEY AUTOINCREMENT,
+    un   TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_timer_events_un ON timer_events(un);
+CREATE TABLE IF NOT EXISTS users(
+    un   TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions(
+    un   TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    v    INTEGER NOT NULL,
+    PRIMARY KEY(un, kind)
+);
+"""
+
+
+@lru_cache(maxsize=None)
+def _sqlite_local() -> threading.local:
+    """每个线程一条 SQLite 连接（Streamlit 的会话跑在不同线程上）"""
+    return threading.local()
+
+
+def _sqlite_conn(path: str = None) -> sqlite3.Connection:
+    """取当前线程的连接；首次连接时打开 WAL 并建表"""
+    path = path or config.SQLITE_PATH
+    local = _sqlite_local()
+    conns = getattr(local, "conns", None)
+    if conns is None:
+        conns = local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SQLITE_DDL)
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(records)")}
+        if "pid" not in cols:
+            conn.execute("ALTER TABLE records ADD COLUMN pid TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_records_un_pid ON records(un, pid)")
+        conns[path] = conn
+    return conn
+
+
+def _sql_version(conn: sqlite3.Connection, un: str, kind: str) -> int:
+    row = conn.execute("SELECT v FROM versions WHERE un=? AND kind=?", (un, kind)).fetchone()
+    return row[0] if row else 0
+
+
+def _sql_key(kind: str, path: str = None) -> Tuple[str, str, str]:
+    """读盘缓存里 sqlite 数据的 key（带上库路径，迁移目标库与在用库互不干扰）"""
+    return ("sqlite", path or config.SQLITE_PATH, kind)
+
+
+def _sql_bump(conn: sqlite3.Connection, un: str, kind: str, path: str = None):
+    conn.execute(
+        "INSERT INTO versions(un, kind, v) VALUES(?, ?, 1) "
+        "ON CONFLICT(un, kind) DO UPDATE SET v = v + 1",
+        (un, kind),
+    )
+    _cache_invalidate(un, _sql_key(kind, path))
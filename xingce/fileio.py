@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+写盘：原子替换 + 按文件串行化的写入层。
+
+- 整文件写（用户库 / 成绩快照 / 复盘 / 策略 / 打卡）：先写同目录临时文件，flush + fsync 后 os.replace，
+  再 fsync 目录；中途崩溃只会留下临时文件，目标文件要么是旧内容要么是新内容。
+- 追加写（成绩追加日志 / 逐题记录）：持锁追加一段并 fsync。
+- 同一个文件的写入方用 <文件>.lock 上的 flock 串行化（跨进程、跨线程都有效）；
+  同一线程内可重入，方便“压缩 = 读 + 写快照 + 删日志”整段持锁。
+- 每次取锁的等待时间记在进程里，管理页“运行状态”可以看到并发写入的争用情况。
+
+只依赖标准库，登录页导入 accounts 时不会带进 pandas。
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, IO
+
+try:
+    import fcntl
+except ImportError:  # Windows 本地开发：退化为进程内的线程锁
+    fcntl = None
+
+LOCK_SUFFIX = ".lock"
+LOCK_WAIT_RING_SIZE = 2000
+LOCK_CONTENDED_MS = 1.0
+
+
+# ================== 锁等待统计 ==================
+@lru_cache(maxsize=None)
+def _lock_store() -> Dict:
+    """进程级：最近的锁等待样本 + 按文件累计；无 fcntl 时也放进程内的线程锁"""
+    return {
+        "lock": threading.Lock(),
+        "waits": deque(maxlen=LOCK_WAIT_RING_SIZE),
+        "files": {},
+        "count": 0,
+        "contended": 0,
+        "thread_locks": {},
+    }
+
+
+def _record_wait(path: str, ms: float):
+    store = _lock_store()
+    with store["lock"]:
+        store["waits"].append(ms)
+        store["count"] += 1
+        if ms >= LOCK_CONTENDED_MS:
+            store["contended"] += 1
+        f = store["files"].setdefault(os.path.basename(path), {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        f["count"] += 1
+        f["total_ms"] += ms
+        f["max_ms"] = max(f["max_ms"], ms)
+
+
+def _percentile(sorted_ms, q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, int(round(q * (len(sorted_ms) - 1))))]
+
+
+def lock_wait_stats(top: int = 10) -> Dict:
+    """
+    锁等待汇总：count 取锁次数，contended 等待超过 LOCK_CONTENDED_MS 的次数，
+    p50 / p95 / max 基于最近 LOCK_WAIT_RING_SIZE 个样本（毫秒），files 按累计等待排序的前 top 个文件。
+    """
+    store = _lock_store()
+    with store["lock"]:
+        waits = sorted(store["waits"])
+        files = [
+            {"文件": name, "次数": v["count"], "累计等待ms": round(v["total_ms"], 2), "最长等待ms": round(v["max_ms"], 2)}
+            for name, v in store["files"].items()
+        ]
+        count, contended = store["count"], store["contended"]
+    files.sort(key=lambda r: -r["累计等待ms"])
+    return {
+        "count": count,
+        "contended": contended,
+        "p50_ms": round(_percentile(waits, 0.5), 3),
+        "p95_ms": round(_percentile(waits, 0.95), 3),
+        "max_ms": round(waits[-1], 3) if waits else 0.0,
+        "files": files[:top],
+    }
+
+
+def lock_wait_reset():
+    store = _lock_store()
+    with store["lock"]:
+        store["waits"].clear()
+        store["files"].clear()
+        store["count"] = store["contended"] = 0
+
+
+# ================== 文件锁 ==================
+_held = threading.local()
+
+
+@contextmanager
+def file_lock(path: str):
+    """对 path 加排他写锁（锁在 path + LOCK_SUFFIX 上，不影响读方）；同一线程内可重入"""
+    key = os.path.abspath(path)
+    depth = getattr(_held, "depth", None)
+    if depth is None:
+        depth = _held.depth = {}
+    if depth.get(key):
+        depth[key] += 1
+        try:
+            yield
+        finally:
+            depth[key] -= 1
+        return
+
+    t0 = time.perf_counter()
+    if fcntl is not None:
+        fd = os.open(key + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+    else:
+        store = _lock_store()
+        with store["lock"]:
+            tl = store["thread_locks"].setdefault(key, threading.Lock())
+        tl.acquire()
+    _record_wait(key, (time.perf_counter() - t0) * 1000)
+    depth[key] = 1
+    try:
+        yield
+    finally:
+        depth.pop(key, None)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        else:
+            tl.release()
+
+
+def _fsync_dir(path: str):
+    """rename 之后同步目录项；Windows 上打不开目录，跳过"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# ================== 原子写 / 追加写 ==================
+def atomic_write(
+    path: str, write: Callable[[IO], None], encoding: str = "utf-8", newline: str = None, mode: str = "w"
+):
+    """持锁把 write(f) 的内容写进同目录临时文件，fsync 后替换 path；失败时删掉临时文件，path 保持原样"""
+    with file_lock(path):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, mode, encoding=encoding, newline=newline) as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        _fsync_dir(path)
+
+
+def atomic_write_json(path: str, d, **kwargs):
+    """JSON 文档的原子写；默认 ensure_ascii=False, indent=2，与原来的直接写保持同样的格式"""
+    kwargs.setdefault("ensure_ascii", False)
+    kwargs.setdefault("indent", 2)
+    atomic_write(path, lambda f: json.dump(d, f, **kwargs))
+
+
+def atomic_write_csv(path: str, df):
+    """DataFrame → CSV（utf-8-sig，不带索引）的原子写"""
+    atomic_write(path, lambda f: df.to_csv(f, index=False), encoding="utf-8-sig", newline="")
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """二进制文件（逐题记录）的原子写"""
+    atomic_write(path, lambda f: f.write(data), encoding=None, mode="wb")
+
+
+def locked_append(path: str, text, encoding: str = "utf-8"):
+    """持锁追加 text（str 或 bytes）并 fsync；同一文件的其他写入方（含整文件替换）在此期间等待"""
+    binary = isinstance(text, bytes)
+    with file_lock(path):
+        with open(path, "ab" if binary else "a", encoding=None if binary else encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
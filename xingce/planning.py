@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+计划：模块建议、明日训练、一周训练计划、今日任务与连续打卡。
+
+模块建议 / 今日任务 / 打卡只用标准库；用到模块统计矩阵的函数在调用时才导入 analytics（pandas / numpy），
+只做打卡的进程不用付 pandas 的导入开销。
+
+周计划的重点模块按“预计提分”分配：每个模块练一天能涨多少分由它的分值（题量 × 每题分）、
+离满分的差距、最近的正确率斜率和超时估出来，练得越多收益越递减，7 天贪心地分给当下收益最大的模块。
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List
+
+from .config import LEAF_MODULES, PAPER_TEMPLATES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def module_tip(m: str, acc: float, t: float, plan: float, strategy: Dict) -> str:
+    """
+    根据模块、正确率、用时和策略，生成一段『复盘建议文字 + 彩色标签』HTML。
+    - 短板：红色 pill-short
+    - 可提升：蓝色 pill-mid
+    - 强项：绿色 pill-strong
+    - 超时：橙色 pill-time
+    """
+    tips = []
+
+    # 超时提示（橙色 pill）
+    if plan and t > plan + 2:
+        tips.append(
+            f"<span class='pill pill-time'>超时</span>"
+            f"用时 <b>{int(t)}m</b>，比计划 <b>+{int(t - plan)}m</b>。设置上限→超时先跳。"
+        )
+
+    # 正确率提示（红 / 蓝 / 绿）
+    if acc < 0.6:
+        tips.append(
+            f"<span class='pill pill-short'>短板</span>"
+            f"正确率 <b>{acc:.0%}</b>，错题拆三类：不会/不熟/审题坑，并只改一个做法。"
+        )
+    elif acc >= 0.8:
+        tips.append(
+            f"<span class='pill pill-strong'>强项</span>"
+            f"正确率 <b>{acc:.0%}</b>，重点：提速 + 降低粗心。"
+        )
+    else:
+        tips.append(
+            f"<span class='pill pill-mid'>可提升</span>"
+            f"正确率 <b>{acc:.0%}</b>，属于训练就能稳定涨的区间。"
+        )
+
+    # ====== 各模块专属做法（保持你原来的逻辑，只是接在新样式后） ======
+    if m == "资料分析":
+        per_block = int(strategy.get("资料_每篇上限分钟", 6))
+        skip = bool(strategy.get("资料_超时先跳", True))
+        skip_txt = "（超时先跳）" if skip else ""
+        tips.append(
+            f"做法：<b>每篇限时{per_block}分钟</b>{skip_txt}；"
+            f"每天15分钟练<b>速算（增长率/基期/比重/平均）</b>。"
+        )
+    elif m == "数量关系":
+        sec = int(strategy.get("数量_每题上限秒", 60))
+        easy_only = bool(strategy.get("数量_只做简单题", True))
+        easy_txt = "（只做简单题）" if easy_only else ""
+        tips.append(
+            f"做法：<b>每题{sec}秒上限</b>{easy_txt}；"
+            f"只保留你最稳的<b>3类题型</b>训练，其余秒放。"
+        )
+    elif m in ["言语-逻辑填空", "言语-片段阅读"]:
+        tips.append(
+            "做法：每天20题专项；错题只写一句："
+            "<b>语境/搭配/转折因果关键词</b>，下次遇坑能秒避。"
+        )
+    elif m in ["政治理论", "常识判断"]:
+        tips.append(
+            "做法：每天10分钟刷题；错题压成<b>1行卡片关键词</b>（法条/时政点）。"
+        )
+    elif m == "判断-逻辑判断":
+        sec = int(strategy.get("逻辑_每题上限秒", 90))
+        tips.append(
+            f"做法：设置<b>{sec}秒上限</b>；难题先跳，优先稳图推/类比/定义。"
+        )
+    elif m.startswith("判断-"):
+        tips.append(
+            "做法：图推/类比/定义优先稳分；复杂题设置上限，超过先跳。"
+        )
+
+    return "<div class='tip-box'>" + "<br>".join(tips) + "</div>"
+
+
+def compute_next_day_plan(row: pd.Series, strategy: Dict):
+    """基于单卷 row + 策略，生成“明天怎么练”的 3 条建议"""
+    from .analytics import module_stats, rank_modules
+
+    ms = module_stats(row)
+    acc, over = ms["正确率"][0], ms["超时"][0]
+    ia = rank_modules(acc, 1)[0]
+    it = rank_modules(over, 1, descending=True)[0]
+    worst_acc = (LEAF_MODULES[ia], float(acc[ia]), float(over[ia]))
+    worst_time = (LEAF_MODULES[it], float(acc[it]), float(over[it]))
+
+    tasks = [
+        "资料分析：15分钟限时速算（增长率/基期/比重/平均数），目标“更快不更错”。",
+        "言语理解：逻辑填空20题（每题标注：语境/搭配/转折因果关键词）。",
+    ]
+
+    if worst_acc[0] == "数量关系" or worst_time[0] == "数量关系":
+        sec = int(strategy.get("数量_每题上限秒", 60))
+        tasks.append(f"数量关系：只练你最稳的1个题型10题 + 每题{sec}秒上限；其余题型放弃训练。")
+    else:
+        tasks.append(f"短板专项：{worst_acc[0]} 10-20题（只做同一类型，做到“看见就会”）。")
+
+    return tasks, worst_acc, worst_time
+
+
+# ================== 周计划：提分预测 + 按天分配 ==================
+PLAN_DAYS = 7
+PLAN_FOCUS_MINUTES = 30    # 每天“重点模块专项”大约用时（分钟）
+PLAN_LEARN_RATE = 0.1      # 专项一天补上 离满分差距（1 - 正确率）的比例；第 k 天再乘 (1 - 比例)^k
+PLAN_RECOVER_RATE = 0.5    # 最近在跌的那一截（斜率 × 套数）一天能找回的比例，临时滑坡比长期短板好补
+PLAN_TIME_RATE = 0.3       # 专项一天能压掉的超时比例；省下的时间按本人平均 分/分钟 折成分
+
+
+def latest_paper_type(df: pd.DataFrame):
+    """最近一套卷的试卷类型（周计划按它的模板算分值）；没有记录或没有这一列时返回 None"""
+    if df.empty or "试卷类型" not in df.columns:
+        return None
+    return str(df["试卷类型"].iloc[-1])
+
+
+def _plan_inputs(data, paper_type: str = None):
+    """成绩表或 record_aggregates → (聚合, 试卷模板)；模板优先用 paper_type，其次最近一套卷的试卷类型"""
+    from .analytics import build_record_aggregates
+
+    if isinstance(data, dict):
+        agg = data
+    else:
+        agg = build_record_aggregates(data)
+        paper_type = paper_type or latest_paper_type(data)
+    tpl = PAPER_TEMPLATES.get(paper_type) or next(iter(PAPER_TEMPLATES.values()))
+    return agg, tpl
+
+
+def project_module_gains(data, paper_type: str = None) -> Dict:
+    """
+    各模块的提分预测（向量都按 LEAF_MODULES 顺序）：
+    - 正确率 / 斜率 / 超时：最近 3 套卷的均值、正确率每套的线性斜率、平均超时（分钟）
+    - 分值：题量 × 每题分（按试卷模板）
+    - 每分钟：第 1 天专项的预计提分 ÷ PLAN_FOCUS_MINUTES
+    另含 gain(k) 函数：每个模块各练了 k 天之后，再练一天的预计提分（向量）。
+    """
+    import numpy as np
+
+    agg, tpl = _plan_inputs(data, paper_type)
+    k = len(LEAF_MODULES)
+    win_acc = np.asarray(agg["window"]["正确率"], dtype=float).reshape(-1, k)
+    win_over = np.asarray(agg["window"]["超时"], dtype=float).reshape(-1, k)
+    n = len(win_acc)
+    acc = win_acc.mean(axis=0) if n else np.zeros(k)
+    over = win_over.mean(axis=0) if n else np.zeros(k)
+    if n > 1:
+        x = np.arange(n) - (n - 1) / 2
+        slope = x @ (win_acc - acc) / (x @ x)
+    else:
+        slope = np.zeros(k)
+
+    points = np.array([tpl["totals"].get(m, 0) for m in LEAF_MODULES], dtype=float) * tpl["weight"]
+    gap = np.clip(1 - acc, 0, 1)
+    drop = np.minimum(np.clip(-slope, 0, None) * max(n - 1, 1), gap)
+    minutes = agg["sum"]["总用时"]
+    per_minute = agg["sum"]["总分"] / minutes if minutes > 0 else 0.0
+    overtime = np.clip(over, 0, None)
+
+    def gain(days):
+        days = np.asarray(days, dtype=float)
+        acc_gain = gap * PLAN_LEARN_RATE * (1 - PLAN_LEARN_RATE) ** days
+        acc_gain += drop * PLAN_RECOVER_RATE * (1 - PLAN_RECOVER_RATE) ** days
+        time_gain = overtime * PLAN_TIME_RATE * (1 - PLAN_TIME_RATE) ** days * per_minute
+        return points * acc_gain + time_gain
+
+    return {
+        "正确率": acc, "斜率": slope, "超时": over, "分值": points,
+        "每分钟": gain(np.zeros(k)) / PLAN_FOCUS_MINUTES, "gain": gain,
+    }
+
+
+def allocate_focus_days(proj: Dict, days: int = PLAN_DAYS) -> List[tuple]:
+    """
+    贪心分配：每天给“再练一天预计提分”最大的模块（并列时按 LEAF_MODULES 顺序）。
+    每个模块的收益随天数递减（凹），逐天取最大就是总预计提分最大的分法。返回 [(模块, 预计提分), ...]。
+    """
+    import numpy as np
+
+    counts = np.zeros(len(LEAF_MODULES))
+    out = []
+    for _ in range(days):
+        g = proj["gain"](counts)
+        i = int(np.argmax(g))
+        out.append((LEAF_MODULES[i], float(g[i])))
+        counts[i] += 1
+    return out
+
+
+def build_week_plan(data, strategy: Dict, paper_type: str = None) -> List[Dict]:
+    """
+    根据最近三套卷，构造一周训练计划（每天固定 3 件事，第 3 件是当天的重点模块专项）。
+    data 可以是成绩表，也可以是 record_aggregates 的结果（直接读窗口，不再切片重算）。
+    重点模块按预计提分分配（见 project_module_gains / allocate_focus_days），
+    paper_type 指定按哪个试卷模板算分值，默认取最近一套卷的试卷类型（聚合结果里没有时用第一个模板）。
+    """
+    if isinstance(data, dict):
+        if not data["n"]:
+            return []
+    elif data.empty:
+        return []
+
+    focus_days = allocate_focus_days(project_module_gains(data, paper_type))
+    if not any(g > 0 for _, g in focus_days):
+        focus_days = [("言语-逻辑填空", 0.0)] * PLAN_DAYS
+
+    sec = int(strategy.get("数量_每题上限秒", 60))
+    block = int(strategy.get("资料_每篇上限分钟", 6))
+    logic_sec = int(strategy.get("逻辑_每题上限秒", 90))
+
+    plan = []
+    for i, (focus, gain) in enumerate(focus_days):
+        day = (datetime.now().date() + timedelta(days=i)).isoformat()
+
+        base = [
+            "资料分析：15分钟速算训练（增长率/基期/比重/平均数）",
+            "言语：逻辑填空20题（错因标注：语境/搭配/转折因果）",
+        ]
+
+        if focus == "数量关系":
+            base.append(f"数量：保留题型10题 + 每题{sec}秒上限（其余秒放）")
+        elif focus == "资料分析":
+            base.append(f"资料：做2篇限时（每篇{block}分钟，上限跳题）")
+        elif focus == "判断-逻辑判断":
+            base.append(f"逻辑判断：10题，单题{logic_sec}秒上限，难题先跳")
+        else:
+            base.append(f"专项：{focus} 10-20题（只做同一类型）")
+
+        plan.append({"日期": day, "重点模块": focus, "任务": base, "预计提分": round(gain, 2)})
+    return plan
+
+
+def get_today_tasks_from_week_plan(week_plan: List[Dict]) -> List[Dict]:
+    """从周计划中抽取“今天任务”"""
+    today = datetime.now().date().isoformat()
+    for d in week_plan:
+        if d["日期"] == today:
+            return [{"title": t, "done": False} for t in d["任务"]]
+    if week_plan:
+        return [{"title": t, "done": False} for t in week_plan[0]["任务"]]
+    return []
+
+
+def update_streak(checkin: Dict):
+    """
+    streak 规则：
+    - 若今天完成所有任务 → streak +1（与昨天连续则+1，否则重置为1）
+    - 若没完成，不变
+    """
+    today = datetime.now().date()
+    today_str = today.isoformat()
+
+    tasks = checkin.get("today_tasks", [])
+    if not tasks:
+        return checkin
+
+    all_done = all(bool(x.get("done", False)) for x in tasks)
+    if not all_done:
+        return checkin
+
+    last = checkin.get("last_date", "")
+    if last:
+        try:
+            last_d = datetime.fromisoformat(last).date()
+        except Exception:
+            last_d = None
+    else:
+        last_d = None
+
+    if last_d is None:
+        checkin["streak"] = 1
+    else:
+        if (today - last_d).days == 1:
+            checkin["streak"] = int(checkin.get("streak", 0)) + 1
+        elif (today - last_d).days == 0:
+            checkin["streak"] = int(checkin.get("streak", 0))
+        else:
+            checkin["streak"] = 1
+
+    checkin["last_date"] = today_str
+    return checkin
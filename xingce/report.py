@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+报告：单卷复盘摘要 / 周计划的 Markdown，以及按用户汇总的周报（Markdown + JSON）。
+
+页面里的“导出本卷复盘摘要”“导出周计划”和命令行批量周报（reports.py）共用这里的写法。
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .analytics import (
+    LEAF_MODULES,
+    module_stats,
+    paper_top_modules,
+    recent_module_mean,
+    review_analytics,
+)
+from .planning import build_week_plan, compute_next_day_plan, latest_paper_type, module_tip
+from .storage import load_data, load_reviews, load_strategy, record_aggregates
+
+
+def paper_summary_md(row: pd.Series, tasks: List[str], worst_by_acc: List[Tuple], worst_by_time: List[Tuple]) -> str:
+    """单卷复盘摘要（复制到笔记用）"""
+    md = []
+    md.append(f"### {row['日期']:%Y-%m-%d} | {row['试卷']}")
+    md.append(f"- 得分：{float(row['总分']):.1f} | 正确率：{float(row['总正确数'])/max(float(row['总题数']),1):.1%} | 用时：{int(row['总用时'])}min")
+    md.append(f"- 明天训练：1）{tasks[0]}  2）{tasks[1]}  3）{tasks[2]}")
+    md.append("")
+    md.append("**模块Top问题（自动）**")
+    md.append(f"- 正确率最低：{', '.join([x[0] for x in worst_by_acc])}")
+    md.append(f"- 超时最多：{', '.join([x[0] for x in worst_by_time])}")
+    return "\n".join(md)
+
+
+def week_plan_md(wp: List[Dict]) -> str:
+    """周计划（复制到备忘录用）"""
+    lines = ["## 本周训练计划（自动生成）"]
+    for d in wp:
+        gain = f"，预计 +{d['预计提分']:.1f} 分" if d.get("预计提分") else ""
+        lines.append(f"\n### {d['日期']}（重点：{d['重点模块']}{gain}）")
+        for t in d["任务"]:
+            lines.append(f"- {t}")
+    return "\n".join(lines)
+
+
+def tip_markdown(html: str) -> str:
+    """module_tip 的 HTML → Markdown：彩色标签变【短板】，<b> 变粗体，<br> 换行"""
+    text = re.sub(r"<span class='pill[^']*'>(.*?)</span>", r"【\1】", html)
+    text = text.replace("<b>", "**").replace("</b>", "**").replace("<br>", "\n")
+    return re.sub(r"<[^>]+>", "", text).strip()
+
+
+def trend_numbers(df: pd.DataFrame, ms: Dict[str, np.ndarray], agg: Dict) -> Dict:
+    """趋势数字：最近几套得分、近5次与再往前5次的均分、各模块近3套 vs 全部均值与近期加权"""
+    scores = df["总分"].astype(float).round(2).tolist()
+    recent, before = scores[-5:], scores[-10:-5]
+    modules = {}
+    acc3 = recent_module_mean(ms, "正确率", 3)
+    over3 = recent_module_mean(ms, "超时", 3)
+    acc_all = ms["正确率"].mean(axis=0)
+    for i, m in enumerate(LEAF_MODULES):
+        modules[m] = {
+            "近3套正确率": round(float(acc3[i]), 4),
+            "全部正确率": round(float(acc_all[i]), 4),
+            "近期加权正确率": round(float(agg["ewma"]["正确率"][i]), 4),
+            "近3套超时": round(float(over3[i]), 2),
+            "近期加权超时": round(float(agg["ewma"]["超时"][i]), 2),
+        }
+    return {
+        "累计套数": agg["n"],
+        "最高分": agg["best"],
+        "最近得分": recent,
+        "近5次均分": round(float(np.mean(recent)), 2),
+        "前5次均分": round(float(np.mean(before)), 2) if before else None,
+        "模块": modules,
+    }
+
+
+def build_user_report(un: str, days: int = 7) -> Tuple[str, Dict]:
+    """
+    一个用户的周报：返回 (Markdown, JSON 可序列化的 dict)。
+    包含：最新一套概览、近 days 天每套卷的复盘摘要（没有就用最新一套）、
+    短板模块建议、趋势数字、复盘错因统计和本周训练计划。
+    """
+    df = load_data(un)
+    strategy = load_strategy(un)
+    now = datetime.now()
+    data = {"用户": un, "生成时间": now.isoformat(timespec="seconds"), "套数": len(df)}
+    md = [f"# {un} · 行测周报（{now:%Y-%m-%d}）", ""]
+    if df.empty:
+        md.append("暂无成绩记录。")
+        return "\n".join(md) + "\n", data
+
+    ms = module_stats(df)
+    agg = record_aggregates(un, df, ms)
+    latest = agg["latest"]
+    delta = latest["总分"] - agg["prev_score"] if agg["prev_score"] is not None else None
+    data["最新"] = {**latest, "较上次": delta}
+    md.append("## 概览")
+    md.append(
+        f"- 最新得分：{latest['总分']:.1f}（{f'较上次 {delta:+.1f}' if delta is not None else '首套记录'}）"
+        f" | 正确率：{latest['总正确数'] / max(latest['总题数'], 1):.0%} | 用时：{int(latest['总用时'])}min"
+    )
+    md.append(f"- 近5次均分：{np.mean(agg['scores']):.1f} | 最高：{agg['best']:.1f} | 累计套数：{agg['n']}")
+
+    # 单卷复盘摘要
+    cutoff = pd.Timestamp((now - timedelta(days=days)).date())
+    positions = np.flatnonzero((df["日期"] >= cutoff).to_numpy()).tolist() or [len(df) - 1]
+    md.append("")
+    md.append(f"## 单卷复盘（近 {days} 天）")
+    papers = []
+    for pos in positions:
+        row = df.iloc[pos]
+        tasks, _, _ = compute_next_day_plan(row, strategy)
+        worst_by_acc, worst_by_time = paper_top_modules(ms, pos)
+        md.append("")
+        md.append(paper_summary_md(row, tasks, worst_by_acc, worst_by_time))
+        papers.append({
+            "试卷ID": str(row["试卷ID"]),
+            "日期": f"{row['日期']:%Y-%m-%d}",
+            "试卷": str(row["试卷"]),
+            "总分": round(float(row["总分"]), 2),
+            "明天训练": tasks,
+            "正确率最低": [x[0] for x in worst_by_acc],
+            "超时最多": [x[0] for x in worst_by_time],
+        })
+    data["单卷"] = papers
+
+    # 最新一套的短板建议
+    worst_by_acc, _ = paper_top_modules(ms, len(df) - 1)
+    md.append("")
+    md.append("## 短板建议（最新一套）")
+    for m, accm, t, plan, total, diff in worst_by_acc:
+        md.append(f"- **{m}**（正确率 {accm:.0%}，用时 {int(t)}min）")
+        md.append("  " + tip_markdown(module_tip(m, accm, t, plan, strategy)).replace("\n", "\n  "))
+
+    # 趋势
+    trend = trend_numbers(df, ms, agg)
+    data["趋势"] = trend
+    md.append("")
+    md.append("## 趋势")
+    md.append(f"- 最近得分：{' → '.join(f'{x:.1f}' for x in trend['最近得分'])}")
+    if trend["前5次均分"] is not None:
+        md.append(f"- 近5次均分 {trend['近5次均分']:.1f}，前5次均分 {trend['前5次均分']:.1f}")
+    md.append("")
+    md.append("| 模块 | 近3套正确率 | 全部正确率 | 近期加权 | 近3套超时(min) |")
+    md.append("| --- | --- | --- | --- | --- |")
+    for m, v in trend["模块"].items():
+        md.append(f"| {m} | {v['近3套正确率']:.0%} | {v['全部正确率']:.0%} | {v['近期加权正确率']:.0%} | {v['近3套超时']:.1f} |")
+
+    # 复盘错因
+    stat_days = int(strategy.get("复盘_统计天数", 30))
+    cause_df, mod_df = review_analytics(load_reviews(un), stat_days)
+    md.append("")
+    md.append(f"## 复盘错因（近 {stat_days} 天）")
+    if cause_df.empty:
+        md.append("暂无复盘记录。")
+        data["复盘错因"], data["错题模块"] = {}, {}
+    else:
+        causes = {r["错因"]: int(r["数量"]) for r in cause_df.to_dict("records")}
+        mods = {r["模块"]: int(r["错题数"]) for r in mod_df.to_dict("records")}
+        data["复盘错因"], data["错题模块"] = causes, mods
+        md.append("- " + " | ".join(f"{k} {v}" for k, v in causes.items()))
+        md.append("- 错题最多：" + "，".join(f"{k}（{v}）" for k, v in list(mods.items())[:5]))
+
+    # 周计划
+    wp = build_week_plan(agg, strategy, latest_paper_type(df))
+    data["本周计划"] = wp
+    md.append("")
+    md.append(week_plan_md(wp))
+    return "\n".join(md) + "\n", data
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+成绩表结构：列、dtype、试卷ID，读盘后的统一规整（ensure_schema），以及导入数据包时的校验。
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import LEAF_MODULES, MODULE_STRUCTURE
+
+
+def build_all_columns() -> List[str]:
+    """构造成绩表需要的全部列"""
+    cols = ["日期", "试卷", "试卷ID", "总分", "总正确数", "总题数", "总用时"]
+    for m in LEAF_MODULES:
+        cols.extend([
+            f"{m}_总题数", f"{m}_正确数", f"{m}_用时",
+            f"{m}_正确率", f"{m}_计划用时"
+        ])
+    return cols
+
+
+def build_record_dtypes() -> Dict[str, str]:
+    """
+    成绩表的紧凑 dtype（与 build_all_columns 对应，另含可选的 试卷类型 / 每题分值）：
+    - 题数 / 对题数：int16
+    - 用时 / 正确率 / 分数：float32
+    - 日期：datetime64；试卷 / 试卷类型：category
+    不在这里的列（试卷ID、自评、补充信息等）保持原样。
+    """
+    dtypes = {
+        "日期": "datetime64[ns]",
+        "试卷": "category",
+        "试卷类型": "category",
+        "每题分值": "float32",
+        "总分": "float32",
+        "总正确数": "int16",
+        "总题数": "int16",
+        "总用时": "float32",
+    }
+    for m in LEAF_MODULES:
+        dtypes.update({
+            f"{m}_总题数": "int16",
+            f"{m}_正确数": "int16",
+            f"{m}_用时": "float32",
+            f"{m}_正确率": "float32",
+            f"{m}_计划用时": "float32",
+        })
+    return dtypes
+
+
+RECORD_DTYPES = build_record_dtypes()
+
+
+def new_paper_id() -> str:
+    """生成试卷ID（带字母前缀，避免被 read_csv 当成数字）"""
+    return f"p{uuid.uuid4().hex[:12]}"
+
+
+def _missing_paper_ids(df: pd.DataFrame) -> pd.Series:
+    """哪些行还没有试卷ID（老数据 / 缺列 / 空值）"""
+    if "试卷ID" not in df.columns:
+        return pd.Series(True, index=df.index)
+    ids = df["试卷ID"]
+    return ids.isna() | ids.astype(str).str.strip().isin(["", "0", "nan"])
+
+
+def ensure_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """保证成绩表 DataFrame 至少包含需要的所有列"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=build_all_columns())
+
+    # 每套卷一个稳定的试卷ID：选择 / 删除都按ID定位，同日同名的卷不会互相覆盖
+    missing = _missing_paper_ids(df)
+    if missing.any():
+        if "试卷ID" not in df.columns:
+            df["试卷ID"] = ""
+        df.loc[missing, "试卷ID"] = [new_paper_id() for _ in range(int(missing.sum()))]
+
+    need = build_all_columns()
+    for c in need:
+        if c not in df.columns:
+            df[c] = 0
+
+    # 按目标 dtype 分组整块转换（逐列转换在 60 来列上开销明显）
+    groups: Dict[str, List[str]] = {}
+    for c, dtype in RECORD_DTYPES.items():
+        if c in df.columns and df[c].dtype != dtype:
+            groups.setdefault(dtype, []).append(c)
+    for dtype, cols in groups.items():
+        if dtype.startswith("datetime"):
+            for c in cols:
+                try:
+                    df[c] = pd.to_datetime(df[c], format="ISO8601").dt.normalize().astype(dtype)
+                except Exception:
+                    pass
+        elif dtype == "category":
+            for c in cols:
+                df[c] = df[c].astype(str).astype("category")
+        else:
+            block = df[cols]
+            if not all(pd.api.types.is_numeric_dtype(t) for t in block.dtypes):
+                block = block.apply(pd.to_numeric, errors="coerce")
+            block = block.fillna(0)
+            if dtype.startswith("int"):
+                block = block.round()
+            df[cols] = block.astype(dtype)
+
+    return df
+
+
+def day_str(s: pd.Series) -> pd.Series:
+    """日期列 → "YYYY-MM-DD" 字符串（兼容 datetime64 与旧的 date / 字符串列）"""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime("%Y-%m-%d").fillna("")
+    return s.astype(str)
+
+
+def records_plain(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    紧凑 dtype → 普通 dtype，用于展示 / 画图 / 写入 JSON：
+    日期转 date，float32 转 float64 并去掉单精度尾数，category 转 str。
+    """
+    out = df.copy()
+    for c in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[c]):
+            out[c] = out[c].dt.date
+        elif out[c].dtype == "float32":
+            out[c] = out[c].astype("float64").round(6)
+        elif isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype(str)
+    return out
+
+
+def read_records_csv(src, **kwargs) -> pd.DataFrame:
+    """读取成绩 CSV（文件路径或文件对象）；文本列按字符串读入，其余 dtype 交给 ensure_schema。
+    kwargs 透传给 pd.read_csv（例如 chunksize，此时返回分块迭代器）"""
+    return pd.read_csv(src, encoding="utf-8", dtype={"试卷": str, "试卷类型": str, "试卷ID": str}, **kwargs)
+
+
+def _paper_label_series(df: pd.DataFrame) -> pd.Series:
+    """整列生成“日期 | 试卷”标签（与页面下拉框里的写法一致）"""
+    return day_str(df["日期"]) + " | " + df["试卷"].astype(str)
+
+
+# ================== 导入校验 ==================
+# 数据包导入时逐块校验：列是否齐全、日期能否解析、数值列是否越界。
+# 每条规则都是整列的布尔运算，返回 (整行是否有效, [(列, 原因, 出问题的行索引), ...])；
+# 行索引沿用 read_csv 分块时连续的 RangeIndex，+2 即 CSV 里的行号（表头占第 1 行）。
+RECORD_REQUIRED = ["日期", "试卷"]
+IMPORT_DATE_MIN = pd.Timestamp("2000-01-01")
+
+
+def build_record_ranges() -> Dict[str, Tuple[float, float]]:
+    """成绩表数值列的合法区间（闭区间）；题数 / 用时给得很宽，只拦明显录错或错列的数据"""
+    ranges = {"总分": (0, 200), "总正确数": (0, 1000), "总题数": (0, 1000), "总用时": (0, 600), "每题分值": (0, 10)}
+    for m in LEAF_MODULES:
+        ranges.update({
+            f"{m}_总题数": (0, 200),
+            f"{m}_正确数": (0, 200),
+            f"{m}_用时": (0, 600),
+            f"{m}_正确率": (0, 1),
+            f"{m}_计划用时": (0, 600),
+        })
+    return ranges
+
+
+RECORD_RANGES = build_record_ranges()
+REVIEW_RANGES = {"错题数": (0, 200), "错因1_知识点不会": (0, 200), "错因2_方法不熟": (0, 200), "错因3_审题选项坑": (0, 200)}
+REVIEW_MODULES = set(LEAF_MODULES) | set(MODULE_STRUCTURE)
+
+
+def _blank(raw: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(raw):
+        return raw.isna()
+    return raw.isna() | (raw.astype(str).str.strip() == "")
+
+
+def _check_dates(raw: pd.Series, problems: List, allow_blank: bool = False) -> pd.Series:
+    """日期列：解析失败、早于 IMPORT_DATE_MIN 或晚于明天的记为问题，返回问题行掩码"""
+    blank = _blank(raw)
+    days = pd.to_datetime(raw, errors="coerce", format="ISO8601")
+    latest = pd.Timestamp(datetime.now().date() + timedelta(days=1))
+    bad = days.isna() | (days < IMPORT_DATE_MIN) | (days > latest)
+    if allow_blank:
+        bad &= ~blank
+    if bad.any():
+        problems.append(("日期", "日期无法解析或超出范围", raw.index[bad.to_numpy()]))
+    return bad
+
+
+def _check_ranges(chunk: pd.DataFrame, ranges: Dict[str, Tuple[float, float]], problems: List) -> Tuple[pd.Series, pd.DataFrame]:
+    """数值列：非空却不是数字、或不在区间内的记为问题；返回 (问题行掩码, 转成数字的块)，空值按 0 处理"""
+    cols = [c for c in ranges if c in chunk.columns]
+    bad = pd.Series(False, index=chunk.index)
+    if not cols:
+        return bad, pd.DataFrame(index=chunk.index)
+    # read_csv 已经解析成数字的列不用再查；只有混进了文本的列才逐列转换
+    num = chunk[cols].copy()
+    not_number = np.zeros(num.shape, dtype=bool)
+    for j, c in enumerate(cols):
+        if not pd.api.types.is_numeric_dtype(num[c]):
+            raw = num[c]
+            num[c] = pd.to_numeric(raw, errors="coerce")
+            not_number[:, j] = num[c].isna().to_numpy() & ~_blank(raw).to_numpy()
+    lo = np.array([ranges[c][0] for c in cols], dtype=float)
+    hi = np.array([ranges[c][1] for c in cols], dtype=float)
+    vals = num.fillna(0).to_numpy(dtype=float)
+    out = (vals < lo) | (vals > hi)
+    for j in np.flatnonzero(not_number.any(axis=0)):
+        problems.append((cols[j], "不是数字", chunk.index[not_number[:, j]]))
+    for j in np.flatnonzero(out.any(axis=0)):
+        problems.append((cols[j], f"超出范围 [{ranges[cols[j]][0]:g}, {ranges[cols[j]][1]:g}]", chunk.index[out[:, j]]))
+    bad |= not_number.any(axis=1) | out.any(axis=1)
+    return bad, num.fillna(0)
+
+
+def validate_records(chunk: pd.DataFrame) -> Tuple[pd.Series, List[Tuple[str, str, pd.Index]]]:
+    """
+    校验一块成绩数据：缺必需列直接抛 ValueError（整包不导入）；
+    其余问题按行拒绝：日期、试卷名为空、数值越界、正确数大于题数。
+    """
+    missing = [c for c in RECORD_REQUIRED if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"records.csv 缺少必需列：{'、'.join(missing)}")
+    problems = []
+    bad = _check_dates(chunk["日期"], problems)
+    no_name = _blank(chunk["试卷"])
+    if no_name.any():
+        problems.append(("试卷", "试卷名为空", chunk.index[no_name.to_numpy()]))
+    bad |= no_name
+    range_bad, num = _check_ranges(chunk, RECORD_RANGES, problems)
+    bad |= range_bad
+    pairs = [("总正确数", "总题数")] + [(f"{m}_正确数", f"{m}_总题数") for m in LEAF_MODULES]
+    for right, total in pairs:
+        if right in num.columns and total in num.columns:
+            over = num[right] > num[total]
+            if over.any():
+                problems.append((right, f"大于 {total}", chunk.index[over.to_numpy()]))
+                bad |= over
+    return ~bad, problems
+
+
+def validate_reviews(chunk: pd.DataFrame) -> Tuple[pd.Series, List[Tuple[str, str, pd.Index]]]:
+    """校验一块复盘数据：日期（可空）、模块（可空，须是已知模块）、错题数 / 错因计数"""
+    problems = []
+    bad = pd.Series(False, index=chunk.index)
+    if "日期" in chunk.columns:
+        bad |= _check_dates(chunk["日期"], problems, allow_blank=True)
+    if "模块" in chunk.columns:
+        unknown = ~_blank(chunk["模块"]) & ~chunk["模块"].astype(str).str.strip().isin(REVIEW_MODULES)
+        if unknown.any():
+            problems.append(("模块", "未知模块", chunk.index[unknown.to_numpy()]))
+        bad |= unknown
+    range_bad, _ = _check_ranges(chunk, REVIEW_RANGES, problems)
+    bad |= range_bad
+    return ~bad, problems
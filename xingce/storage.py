@@ -0,0 +1,1072 @@
+# -*- coding: utf-8 -*-
+"""
+存储：成绩 / 复盘 / 策略 / 打卡的读写，file 与 sqlite 两种后端。
+
+对外的 load_* / save_* 签名不变，调用方无需关心用的是哪种后端。
+读盘结果按文件签名（或 SQLite 版本号）缓存在进程里；
+成绩聚合与复盘检索索引也挂在同一套签名上，随写入同步。
+"""
+
+import copy
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from . import config
+from .accounts import _file_load_users, _sql_save_users, list_usernames
+from .answers import ANSWER_DTYPE, decode_blocks, encode_block, encode_blocks, resolve_keys
+from .analytics import (
+    AGG_TOTAL_COLS,
+    _agg_add,
+    _new_review_index,
+    _review_index_add,
+    _review_index_copy,
+    _review_row_keys,
+    build_record_aggregates,
+    module_stats,
+)
+from .cache import _cache_invalidate, _cached_read, _cached_value, _file_sig
+from .config import (
+    APPEND_ONLY_RECORDS,
+    DATA_LOG_COMPACT_AT,
+    DEFAULT_STRATEGY,
+    REVIEW_SCHEMA,
+    answer_file,
+    checkin_file,
+    data_file,
+    data_log_file,
+    review_file,
+    strategy_file,
+    timer_file,
+)
+from .db import _json_default, _sql_bump, _sql_key, _sql_version, _sqlite_conn
+from .fileio import atomic_write_bytes, atomic_write_csv, atomic_write_json, file_lock, locked_append
+from .schema import (
+    REVIEW_RANGES,
+    _missing_paper_ids,
+    _paper_label_series,
+    ensure_schema,
+    new_paper_id,
+    read_records_csv,
+    records_plain,
+    validate_records,
+    validate_reviews,
+)
+
+
+# ================== 规整：复盘 / 策略 / 打卡 ==================
+def _normalize_reviews(rdf: pd.DataFrame) -> pd.DataFrame:
+    """复盘表：日期转 date，补齐 REVIEW_SCHEMA 列并按固定顺序返回"""
+    if "日期" in rdf.columns:
+        try:
+            rdf["日期"] = pd.to_datetime(rdf["日期"]).dt.date
+        except Exception:
+            pass
+    for c in REVIEW_SCHEMA:
+        if c not in rdf.columns:
+            rdf[c] = ""
+    return rdf[REVIEW_SCHEMA]
+
+
+def _normalize_strategy(s: Dict) -> Dict:
+    """策略：补全默认 key"""
+    for k, v in DEFAULT_STRATEGY.items():
+        if k not in s:
+            s[k] = v
+    return s
+
+
+def _normalize_checkin(d: Dict) -> Dict:
+    """打卡：补全默认 key"""
+    if "streak" not in d:
+        d["streak"] = 0
+    if "last_date" not in d:
+        d["last_date"] = ""
+    if "today_tasks" not in d:
+        d["today_tasks"] = []
+    if "today_tasks_source" not in d:
+        d["today_tasks_source"] = "auto_week_plan"
+    return d
+
+
+def _default_checkin() -> Dict:
+    return {"streak": 0, "last_date": "", "today_tasks_source": "auto_week_plan", "today_tasks": []}
+
+
+# ================== file 后端：成绩（CSV 快照 + 追加日志） ==================
+# 日志每行一个 JSON：{"op": "add", "row": {...}} 或 {"op": "del", "id": "试卷ID"}（墓碑）。
+# 读取时 快照 + 日志 按顺序回放；_file_compact_data 把回放结果写回快照并清空日志。
+# add 按试卷ID去重，压缩中途崩溃导致日志被重放时也不会出现重复记录。
+def _read_data_log(path: str) -> List[Dict]:
+    """读取追加日志；最后一行若因中途崩溃只写了一半，直接忽略"""
+    ops = []
+    if not os.path.exists(path):
+        return ops
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                continue
+    return ops
+
+
+def _apply_data_log(df: pd.DataFrame, ops: List[Dict]) -> pd.DataFrame:
+    """把日志按顺序回放到快照上：add 追加一行，del 删除此前对应的记录"""
+    added = []
+    seen = set(df["试卷ID"].astype(str)) if not df.empty else set()
+    for op in ops:
+        if op.get("op") == "add":
+            row = op.get("row", {})
+            pid = row.get("试卷ID")
+            if pid and pid in seen:
+                continue
+            seen.add(pid)
+            added.append(row)
+        elif op.get("op") == "del":
+            if "id" in op:
+                pid = op["id"]
+                if not df.empty:
+                    df = df[df["试卷ID"].astype(str) != pid]
+                added = [r for r in added if r.get("试卷ID") != pid]
+                seen.discard(pid)
+                continue
+            # 旧版墓碑：按“日期 | 试卷”标签删除
+            label = op.get("label")
+            if not df.empty:
+                df = df[_paper_label_series(df) != label]
+            if added:
+                pending = ensure_schema(pd.DataFrame(added))
+                added = pending[_paper_label_series(pending) != label].to_dict("records")
+    if added:
+        df = pd.concat([df, pd.DataFrame(added)], ignore_index=True)
+    return df.reset_index(drop=True)
+
+
+def _read_data_files(paths: Tuple[str, str]) -> pd.DataFrame:
+    snap_path, log_path = paths
+    if os.path.exists(snap_path):
+        sig = _file_sig(snap_path)
+        raw = read_records_csv(snap_path)
+        had_ids = not _missing_paper_ids(raw).any()
+        df = ensure_schema(raw)
+        if not had_ids and not df.empty:
+            # 老快照第一次读取：把刚分配的试卷ID写回，保证之后每次读取ID不变；
+            # 读完之后快照若已被别的写入方换掉，就不覆盖它
+            with file_lock(snap_path):
+                if _file_sig(snap_path) == sig:
+                    atomic_write_csv(snap_path, df)
+    else:
+        df = ensure_schema(pd.DataFrame())
+    ops = _read_data_log(log_path)
+    if ops:
+        df = ensure_schema(_apply_data_log(df, ops))
+    return df
+
+
+def _file_load_data(un: str) -> pd.DataFrame:
+    df = _cached_read(un, (data_file(un), data_log_file(un)), _read_data_files)
+    if df is not None:
+        return df.copy()
+    return ensure_schema(pd.DataFrame())
+
+
+# 快照和追加日志共用快照文件上的一把锁：写快照 + 删日志、追加一行、压缩 都整段持锁，
+# 不会出现“压缩读完之后别人追加的一行随日志一起被删掉”。
+def _file_save_data(df: pd.DataFrame, un: str):
+    df = ensure_schema(df)
+    with file_lock(data_file(un)):
+        atomic_write_csv(data_file(un), df)
+        if os.path.exists(data_log_file(un)):
+            os.remove(data_log_file(un))
+    _cache_invalidate(un, data_file(un))
+
+
+def _append_data_log(un: str, op: Dict):
+    """向追加日志写一行；累计条数达到阈值时顺手压缩"""
+    line = json.dumps(op, ensure_ascii=False, default=_json_default)
+    with file_lock(data_file(un)):
+        locked_append(data_log_file(un), line + "\n")
+        _cache_invalidate(un, data_log_file(un))
+        if len(_read_data_log(data_log_file(un))) >= DATA_LOG_COMPACT_AT:
+            _file_compact_data(un)
+
+
+def _file_append_record(entry: Dict, un: str):
+    entry.setdefault("试卷ID", new_paper_id())
+    if not APPEND_ONLY_RECORDS:
+        _file_save_data(pd.concat([_file_load_data(un), pd.DataFrame([entry])], ignore_index=True), un)
+        return
+    _append_data_log(un, {"op": "add", "row": entry})
+
+
+def _file_delete_records(un: str, paper_id: str):
+    if not APPEND_ONLY_RECORDS:
+        df = _file_load_data(un)
+        _file_save_data(df[df["试卷ID"].astype(str) != paper_id], un)
+        return
+    _append_data_log(un, {"op": "del", "id": paper_id})
+
+
+def _file_compact_data(un: str):
+    with file_lock(data_file(un)):
+        if not os.path.exists(data_log_file(un)):
+            return
+        _file_save_data(_file_load_data(un), un)
+
+
+# ================== file 后端：复盘 / 策略 / 打卡 ==================
+def _read_reviews_csv(path: str) -> pd.DataFrame:
+    return _normalize_reviews(pd.read_csv(path, encoding="utf-8"))
+
+
+def _file_load_reviews(un: str) -> pd.DataFrame:
+    rdf = _cached_read(un, review_file(un), _read_reviews_csv)
+    if rdf is not None:
+        return rdf.copy()
+    return pd.DataFrame(columns=REVIEW_SCHEMA)
+
+
+def _file_save_reviews(rdf: pd.DataFrame, un: str):
+    for c in REVIEW_SCHEMA:
+        if c not in rdf.columns:
+            rdf[c] = ""
+    rdf = rdf[REVIEW_SCHEMA]
+    atomic_write_csv(review_file(un), rdf)
+    _cache_invalidate(un, review_file(un))
+
+
+def _read_json(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _file_load_doc(un: str, path: str):
+    """读取 JSON 文档（策略 / 打卡），解析失败按不存在处理"""
+    try:
+        d = _cached_read(un, path, _read_json)
+    except Exception:
+        return None
+    return copy.deepcopy(d) if d is not None else None
+
+
+def _file_save_doc(un: str, path: str, d: Dict):
+    atomic_write_json(path, d)
+    _cache_invalidate(un, path)
+
+
+# ================== file 后端：逐题记录（定长二进制块，追加写） ==================
+def _read_answers(path: str) -> Dict[str, np.ndarray]:
+    # 损坏的块跳过（压缩时清掉），不让一块坏数据拖垮整个账号的逐题记录
+    with open(path, "rb") as f:
+        return decode_blocks(f.read())[0]
+
+
+def _file_load_answers(un: str) -> Dict[str, np.ndarray]:
+    sheets = _cached_read(un, answer_file(un), _read_answers)
+    return dict(sheets) if sheets is not None else {}
+
+
+def _file_save_answers(un: str, paper_id: str, arr: np.ndarray = None):
+    """
+    追加一块（arr 为 None 时追加删除标记）。
+    上次写到一半断电留下的残块先截掉，否则新块接在残块后面，之后的块全都错位。
+    """
+    path = answer_file(un)
+    block = encode_block(paper_id, arr)
+    with file_lock(path):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                buf = f.read()
+            end = decode_blocks(buf)[1]
+            if end < len(buf):
+                os.truncate(path, end)
+        locked_append(path, block)
+    _cache_invalidate(un, path)
+
+
+def _file_compact_answers(un: str):
+    """只留每套卷最后写的那块，删掉被覆盖 / 删除的块"""
+    path = answer_file(un)
+    with file_lock(path):
+        if not os.path.exists(path):
+            return
+        buf = encode_blocks(_read_answers(path))
+        if len(buf) < os.path.getsize(path):
+            atomic_write_bytes(path, buf)
+    _cache_invalidate(un, path)
+
+
+# ================== file 后端：计时器会话日志 ==================
+def _file_load_timer(un: str) -> List[Dict]:
+    # 断电时写了一半的最后一行直接忽略，和成绩日志一样
+    return _read_data_log(timer_file(un))
+
+
+def _file_append_timer(un: str, event: Dict):
+    locked_append(timer_file(un), json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def _file_clear_timer(un: str):
+    with file_lock(timer_file(un)):
+        if os.path.exists(timer_file(un)):
+            os.remove(timer_file(un))
+
+
+# ================== sqlite 后端：成绩 / 复盘 / 策略 / 打卡 ==================
+def _record_json(row: Dict) -> Tuple[str, str, str, str, str]:
+    """单行成绩 → (pid, day, paper, label, body)"""
+    day = str(row.get("日期", ""))
+    paper = str(row.get("试卷", ""))
+    body = json.dumps(row, ensure_ascii=False, default=_json_default)
+    return str(row.get("试卷ID", "")), day, paper, f"{day} | {paper}", body
+
+
+def _sql_read_data(un: str, path: str = None) -> pd.DataFrame:
+    bodies = _sqlite_conn(path).execute("SELECT body FROM records WHERE un=? ORDER BY seq", (un,)).fetchall()
+    raw = pd.DataFrame([json.loads(b[0]) for b in bodies])
+    had_ids = raw.empty or not _missing_paper_ids(raw).any()
+    df = ensure_schema(raw)
+    if not had_ids:
+        # 迁移进来的老记录没有试卷ID：分配后写回一次
+        _sql_save_data(df, un, path)
+    return df
+
+
+def _sql_load_data(un: str, path: str = None) -> pd.DataFrame:
+    conn = _sqlite_conn(path)
+    return _cached_value(
+        un, _sql_key("records", path), _sql_version(conn, un, "records"), lambda: _sql_read_data(un, path)
+    ).copy()
+
+
+def _sql_save_data(df: pd.DataFrame, un: str, path: str = None):
+    df = records_plain(ensure_schema(df))
+    df["日期"] = df["日期"].astype(str)
+    rows = [_record_json(r) for r in df.to_dict("records")]
+    conn = _sqlite_conn(path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM records WHERE un=?", (un,))
+        conn.executemany(
+            "INSERT INTO records(un, pid, day, paper, label, body) VALUES(?, ?, ?, ?, ?, ?)",
+            [(un,) + r for r in rows],
+        )
+        _sql_bump(conn, un, "records", path)
+
+
+def _sql_append_record(entry: Dict, un: str):
+    entry.setdefault("试卷ID", new_paper_id())
+    conn = _sqlite_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO records(un, pid, day, paper, label, body) VALUES(?, ?, ?, ?, ?, ?)",
+            (un,) + _record_json(entry),
+        )
+        _sql_bump(conn, un, "records")
+
+
+def _sql_delete_records(un: str, paper_id: str):
+    conn = _sqlite_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM records WHERE un=? AND pid=?", (un, paper_id))
+        _sql_bump(conn, un, "records")
+
+
+def _sql_read_reviews(un: str, path: str = None) -> pd.DataFrame:
+    bodies = _sqlite_conn(path).execute("SELECT body FROM reviews WHERE un=? ORDER BY seq", (un,)).fetchall()
+    if not bodies:
+        return pd.DataFrame(columns=REVIEW_SCHEMA)
+    return _normalize_reviews(pd.DataFrame([json.loads(b[0]) for b in bodies]))
+
+
+def _sql_load_reviews(un: str, path: str = None) -> pd.DataFrame:
+    conn = _sqlite_conn(path)
+    return _cached_value(
+        un, _sql_key("reviews", path), _sql_version(conn, un, "reviews"), lambda: _sql_read_reviews(un, path)
+    ).copy()
+
+
+def _sql_save_reviews(rdf: pd.DataFrame, un: str, path: str = None):
+    out = rdf.copy()
+    for c in REVIEW_SCHEMA:
+        if c not in out.columns:
+            out[c] = ""
+    out = out[REVIEW_SCHEMA]
+    out["日期"] = out["日期"].astype(str)
+    rows = []
+    for r in out.to_dict("records"):
+        body = json.dumps(r, ensure_ascii=False, default=_json_default)
+        rows.append((un, r["日期"], str(r["试卷"]), str(r["模块"]), body))
+    conn = _sqlite_conn(path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM reviews WHERE un=?", (un,))
+        conn.executemany("INSERT INTO reviews(un, day, paper, module, body) VALUES(?, ?, ?, ?, ?)", rows)
+        _sql_bump(conn, un, "reviews", path)
+
+
+def _sql_load_doc(un: str, kind: str, path: str = None):
+    conn = _sqlite_conn(path)
+
+    def build():
+        row = conn.execute("SELECT body FROM docs WHERE un=? AND kind=?", (un, kind)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    d = _cached_value(un, _sql_key(kind, path), _sql_version(conn, un, kind), build)
+    return copy.deepcopy(d) if d is not None else None
+
+
+def _sql_save_doc(un: str, kind: str, d: Dict, path: str = None):
+    conn = _sqlite_conn(path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR REPLACE INTO docs(un, kind, body) VALUES(?, ?, ?)",
+            (un, kind, json.dumps(d, ensure_ascii=False, default=_json_default)),
+        )
+        _sql_bump(conn, un, kind, path)
+
+
+def _sql_load_answers(un: str, path: str = None) -> Dict[str, np.ndarray]:
+    conn = _sqlite_conn(path)
+
+    def build():
+        rows = conn.execute("SELECT pid, body FROM answers WHERE un=?", (un,)).fetchall()
+        return {pid: np.frombuffer(body, ANSWER_DTYPE) for pid, body in rows}
+
+    return dict(_cached_value(un, _sql_key("answers", path), _sql_version(conn, un, "answers"), build))
+
+
+def _sql_save_answers(un: str, paper_id: str, arr: np.ndarray = None, path: str = None):
+    """写入 / 覆盖一套卷的逐题记录（arr 为 None 时删除）"""
+    conn = _sqlite_conn(path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if arr is None:
+            conn.execute("DELETE FROM answers WHERE un=? AND pid=?", (un, paper_id))
+        else:
+            body = np.ascontiguousarray(arr, dtype=ANSWER_DTYPE).tobytes()
+            conn.execute("INSERT OR REPLACE INTO answers(un, pid, body) VALUES(?, ?, ?)", (un, paper_id, body))
+        _sql_bump(conn, un, "answers", path)
+
+
+def _sql_replace_answers(un: str, sheets: Dict[str, np.ndarray], path: str = None):
+    conn = _sqlite_conn(path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM answers WHERE un=?", (un,))
+        conn.executemany(
+            "INSERT INTO answers(un, pid, body) VALUES(?, ?, ?)",
+            [(un, pid, np.ascontiguousarray(a, dtype=ANSWER_DTYPE).tobytes()) for pid, a in sheets.items()],
+        )
+        _sql_bump(conn, un, "answers", path)
+
+
+def _sql_load_timer(un: str) -> List[Dict]:
+    rows = _sqlite_conn().execute("SELECT body FROM timer_events WHERE un=? ORDER BY seq", (un,)).fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def _sql_append_timer(un: str, event: Dict):
+    _sqlite_conn().execute(
+        "INSERT INTO timer_events(un, body) VALUES(?, ?)", (un, json.dumps(event, ensure_ascii=False))
+    )
+
+
+def _sql_clear_timer(un: str):
+    _sqlite_conn().execute("DELETE FROM timer_events WHERE un=?", (un,))
+
+
+def migrate_files_to_sqlite(path: str = None) -> Dict:
+    """
+    一次性迁移：把 users_db.json 及每个用户的 成绩 / 复盘 / 逐题记录 / 策略 / 打卡 文件写入 SQLite。
+    可重复执行（按用户整体覆盖），原文件保留不动，确认无误后再切换 STORAGE_BACKEND。
+    """
+    path = path or config.SQLITE_PATH
+    users = _file_load_users()
+    _sql_save_users(users, path)
+    summary = {"users": len(users), "records": 0, "reviews": 0, "answers": 0, "docs": 0}
+    for un in users:
+        df = _file_load_data(un)
+        _sql_save_data(df, un, path)
+        summary["records"] += len(df)
+        rdf = _file_load_reviews(un)
+        _sql_save_reviews(rdf, un, path)
+        summary["reviews"] += len(rdf)
+        sheets = resolve_keys(_file_load_answers(un), df["试卷ID"])
+        _sql_replace_answers(un, sheets, path)
+        summary["answers"] += len(sheets)
+        for kind, fpath in (("strategy", strategy_file(un)), ("checkin", checkin_file(un))):
+            d = _file_load_doc(un, fpath)
+            if d is not None:
+                _sql_save_doc(un, kind, d, path)
+                summary["docs"] += 1
+    return summary
+
+
+# ================== 对外的 load_* / save_* ==================
+def load_data(un: str) -> pd.DataFrame:
+    """读取当前用户的成绩记录"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_load_data(un)
+    return _file_load_data(un)
+
+
+def save_data(df: pd.DataFrame, un: str):
+    """整表保存当前用户的成绩记录"""
+    _agg_invalidate(un)
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_data(df, un)
+    return _file_save_data(df, un)
+
+
+def append_record(entry: Dict, un: str):
+    """新增一套卷（file 后端：追加模式下只写一行日志），并增量更新成绩聚合"""
+    before = _records_sig(un)
+    if config.STORAGE_BACKEND == "sqlite":
+        _sql_append_record(entry, un)
+    else:
+        _file_append_record(entry, un)
+    _agg_on_append(un, entry, before)
+
+
+def delete_records(un: str, paper_id: str):
+    """按试卷ID删除一套卷及其逐题记录（file 后端：追加模式下写墓碑，压缩时生效）"""
+    _agg_invalidate(un)
+    if paper_id in load_answers(un):
+        delete_answers(un, paper_id)
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_delete_records(un, paper_id)
+    return _file_delete_records(un, paper_id)
+
+
+def compact_data(un: str):
+    """压缩：把 快照 + 日志 的回放结果写成新快照并清空日志，逐题记录只留有效块（sqlite 后端无需压缩）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return
+    before = _records_sig(un)
+    _file_compact_data(un)
+    _agg_resign(un, before)
+    _file_compact_answers(un)
+
+
+def data_log_size(un: str) -> int:
+    """追加日志中尚未压缩的条数"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return 0
+    return len(_read_data_log(data_log_file(un)))
+
+
+def load_answers(un: str) -> Dict[str, np.ndarray]:
+    """
+    读取当前用户的逐题记录：试卷ID -> 答题卡（answers.ANSWER_DTYPE 结构化数组）。
+    数组是读盘缓存里的只读视图，要改请先 copy。块头里存成哈希的长试卷ID 按成绩表换回原ID。
+    """
+    if config.STORAGE_BACKEND == "sqlite":
+        sheets = _sql_load_answers(un)
+    else:
+        sheets = _file_load_answers(un)
+    if any(k.startswith("#") for k in sheets):
+        sheets = resolve_keys(sheets, load_data(un)["试卷ID"])
+    return sheets
+
+
+def save_answers(un: str, paper_id: str, arr: np.ndarray):
+    """保存 / 覆盖一套卷的逐题记录（file 后端追加一块，旧块压缩时清掉）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_answers(un, paper_id, arr)
+    return _file_save_answers(un, paper_id, arr)
+
+
+def delete_answers(un: str, paper_id: str):
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_answers(un, paper_id, None)
+    return _file_save_answers(un, paper_id, None)
+
+
+def _replace_answers(un: str, sheets: Dict[str, np.ndarray]):
+    """整份覆盖逐题记录（导入用）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_replace_answers(un, sheets)
+    with file_lock(answer_file(un)):
+        atomic_write_bytes(answer_file(un), encode_blocks(sheets))
+    _cache_invalidate(un, answer_file(un))
+
+
+def load_timer_events(un: str) -> List[Dict]:
+    """读取当前用户计时器会话日志里的全部事件（按写入顺序，交给 timer.replay_timer 回放）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_load_timer(un)
+    return _file_load_timer(un)
+
+
+def append_timer_event(un: str, event: Dict):
+    """追加一条计时事件（file 后端 fsync 后才返回，点完按钮就算断电也不丢）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_append_timer(un, event)
+    return _file_append_timer(un, event)
+
+
+def clear_timer_events(un: str):
+    """重置计时器：清空会话日志"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_clear_timer(un)
+    return _file_clear_timer(un)
+
+
+def load_reviews(un: str) -> pd.DataFrame:
+    """读取当前用户的复盘记录"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_load_reviews(un)
+    return _file_load_reviews(un)
+
+
+def peek_data(un: str) -> pd.DataFrame:
+    """读取成绩但不放进读盘缓存：批量扫所有账号（学员总览）时用，免得每个人的整张表都留在进程里"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_read_data(un)
+    paths = (data_file(un), data_log_file(un))
+    if not any(os.path.exists(p) for p in paths):
+        return ensure_schema(pd.DataFrame())
+    return _read_data_files(paths)
+
+
+def peek_reviews(un: str) -> pd.DataFrame:
+    """读取复盘但不放进读盘缓存（同 peek_data）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_read_reviews(un)
+    if not os.path.exists(review_file(un)):
+        return pd.DataFrame(columns=REVIEW_SCHEMA)
+    return _read_reviews_csv(review_file(un))
+
+
+def save_reviews(rdf: pd.DataFrame, un: str):
+    """保存当前用户的复盘记录，并同步检索索引（只多了新行时增量补齐）"""
+    if config.STORAGE_BACKEND == "sqlite":
+        _sql_save_reviews(rdf, un)
+    else:
+        _file_save_reviews(rdf, un)
+    review_index_sync(un, load_reviews(un))
+
+
+def load_strategy(un: str) -> Dict:
+    """读取当前用户的策略配置"""
+    if config.STORAGE_BACKEND == "sqlite":
+        s = _sql_load_doc(un, "strategy")
+    else:
+        s = _file_load_doc(un, strategy_file(un))
+    if isinstance(s, dict):
+        return _normalize_strategy(s)
+    return dict(DEFAULT_STRATEGY)
+
+
+def save_strategy(un: str, s: Dict):
+    """保存当前用户策略"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_doc(un, "strategy", s)
+    return _file_save_doc(un, strategy_file(un), s)
+
+
+def load_checkin(un: str) -> Dict:
+    """读取当前用户打卡信息"""
+    if config.STORAGE_BACKEND == "sqlite":
+        d = _sql_load_doc(un, "checkin")
+    else:
+        d = _file_load_doc(un, checkin_file(un))
+    if isinstance(d, dict):
+        return _normalize_checkin(d)
+    return _default_checkin()
+
+
+def save_checkin(un: str, d: Dict):
+    """保存当前用户打卡记录"""
+    if config.STORAGE_BACKEND == "sqlite":
+        return _sql_save_doc(un, "checkin", d)
+    return _file_save_doc(un, checkin_file(un), d)
+
+
+# ================== 新增：导出/导入数据包 ==================
+def _write_bundle_members(zf, un: str, prefix: str = ""):
+    """
+    把一个账号的数据写进已打开的 zip（成员名前加 prefix）：
+    - records.csv   -> 成绩
+    - reviews.csv   -> 复盘
+    - answers.bin   -> 逐题记录（有才写，格式见 answers.py）
+    - strategy.json -> 策略
+    - checkin.json  -> 打卡
+    CSV 直接流式写进压缩成员，不在内存里拼出整段文本。
+    """
+    df = load_data(un)
+    if not df.empty:
+        with zf.open(prefix + "records.csv", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+            df.to_csv(f, index=False)
+    del df
+    rdf = load_reviews(un)
+    if not rdf.empty:
+        with zf.open(prefix + "reviews.csv", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+            rdf.to_csv(f, index=False)
+    del rdf
+    sheets = load_answers(un)
+    if sheets:
+        zf.writestr(prefix + "answers.bin", encode_blocks(sheets))
+    zf.writestr(prefix + "strategy.json", json.dumps(load_strategy(un), ensure_ascii=False, indent=2))
+    zf.writestr(prefix + "checkin.json", json.dumps(load_checkin(un), ensure_ascii=False, indent=2))
+
+
+def _export_path(dest: str, name: str) -> str:
+    if dest:
+        return dest
+    fd, path = tempfile.mkstemp(prefix=f"xingce_{name}_", suffix=".zip")
+    os.close(fd)
+    return path
+
+
+def export_user_bundle(un: str, dest: str = None) -> str:
+    """
+    打包当前账号的全部数据为 zip，写到 dest（默认新建一个临时文件），返回文件路径。
+    数据经由 load_* 读取，与当前使用的存储后端无关；压缩结果直接落盘，内存里只有正在写的一个成员。
+    页面用完后调用 pop_export 读出并删除。
+    """
+    path = _export_path(dest, f"export_{quote(un, safe='')}")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        _write_bundle_members(zf, un)
+    return path
+
+
+def export_all_bundles(dest: str = None, users: List[str] = None) -> str:
+    """
+    管理员：所有账号（或 users 指定的账号）写进同一个 zip，每个账号一个目录 <账号>/records.csv …，
+    逐个账号读取、写入、释放，内存占用与账号总数无关。返回文件路径。
+    """
+    path = _export_path(dest, "export_all")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for un in users if users is not None else list_usernames():
+            _write_bundle_members(zf, un, f"{un}/")
+    return path
+
+
+def pop_export(path: str) -> bytes:
+    """读出导出文件的内容并删除文件（交给下载按钮的延迟回调：点了才生成，交付后不留在服务器上）"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+# 导入：zip 成员流式解压，CSV 按 IMPORT_CHUNK_ROWS 分块解析并逐块校验（schema.validate_*），
+# 全部读完、校验完才开始写：读取 / 校验阶段出错时账号数据一点不动。
+# 写入阶段按 成绩 → 复盘 → 逐题 → 策略 → 打卡 逐项保存，各项之间没有回滚，
+# 某一项写失败时前面的已经生效，报告的“已写入”和提示里会列出来。
+IMPORT_CHUNK_ROWS = 5000
+IMPORT_MAX_MEMBER_BYTES = 200 * 1024 * 1024   # 单个成员解压后的上限，防止压缩炸弹
+IMPORT_MODES = ("merge", "replace")
+
+
+def _read_bundle_csv(zf, name: str, read: Callable, validate: Callable, progress: Callable = None) -> Tuple[pd.DataFrame, Dict]:
+    """分块读取并校验 zip 里的一个 CSV，返回 (通过校验的行, 统计)"""
+    info = zf.getinfo(name)
+    if info.file_size > IMPORT_MAX_MEMBER_BYTES:
+        raise ValueError(f"{name} 解压后 {info.file_size / 1e6:.0f}MB，超过上限 {IMPORT_MAX_MEMBER_BYTES / 1e6:.0f}MB")
+    kept, issues, rows = [], {}, 0
+    with zf.open(name) as f:
+        try:
+            for chunk in read(f, chunksize=IMPORT_CHUNK_ROWS):
+                ok, problems = validate(chunk)
+                for col, reason, idx in problems:
+                    e = issues.setdefault((col, reason), {"文件": name, "列": col, "原因": reason, "行数": 0, "示例行号": []})
+                    e["行数"] += len(idx)
+                    e["示例行号"].extend((idx[:max(0, 5 - len(e["示例行号"]))] + 2).tolist())
+                kept.append(chunk[ok.to_numpy()])
+                rows += len(chunk)
+                if progress:
+                    progress(name, rows)
+        except pd.errors.EmptyDataError:
+            pass
+    df = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame()
+    stats = {"读取": rows, "有效": len(df), "拒绝": rows - len(df), "问题": list(issues.values())}
+    return df, stats
+
+
+def _read_reviews_chunks(f, **kwargs):
+    """复盘 CSV：文本列按字符串读，计数列交给校验后再转成整数"""
+    return pd.read_csv(f, dtype={"试卷": str, "模块": str, "一句话原因": str, "下次做法": str}, **kwargs)
+
+
+def _merge_records(cur: pd.DataFrame, new: pd.DataFrame) -> Tuple[pd.DataFrame, int, Dict[str, str]]:
+    """
+    合并成绩：导入内部和与现有数据都按“日期 | 试卷”去重（现有记录优先），试卷ID撞了就重新分配。
+    返回 (合并后的表, 重复行数, 留下的导入行 原试卷ID -> 新试卷ID)；去重丢掉的行不在映射里。
+    """
+    keys = _paper_label_series(new)
+    fresh = ~keys.duplicated(keep="last")
+    if not cur.empty:
+        fresh &= ~keys.isin(set(_paper_label_series(cur)))
+    new = new[fresh.to_numpy()].copy()
+    old_ids = new["试卷ID"].astype(str).tolist()
+    if not cur.empty and not new.empty:
+        clash = new["试卷ID"].astype(str).isin(set(cur["试卷ID"].astype(str))).to_numpy()
+        if clash.any():
+            new.loc[clash, "试卷ID"] = [new_paper_id() for _ in range(int(clash.sum()))]
+    ids = dict(zip(old_ids, new["试卷ID"].astype(str)))
+    return ensure_schema(pd.concat([cur, new], ignore_index=True)), int((~fresh).sum()), ids
+
+
+def _merge_reviews(cur: pd.DataFrame, new: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """合并复盘：同一条复盘（所有字段都相同）只留一份"""
+    both = pd.concat([cur, new], ignore_index=True)
+    dup = both.astype(str).duplicated(keep="first").to_numpy().copy()
+    dup[:len(cur)] = False
+    return both[~dup].reset_index(drop=True), int(dup.sum())
+
+
+def import_user_bundle(
+    un: str, uploaded_file, mode: str = "replace", progress: Callable = None, trace_memory: bool = False
+) -> Tuple[bool, str, Dict]:
+    """
+    从上传的 zip（文件对象，不会整包读进内存）中读取标准文件名，写回当前账号：
+    - records.csv   -> 成绩（按 build_all_columns 的列和 schema.RECORD_RANGES 校验）
+    - reviews.csv   -> 复盘（按 REVIEW_SCHEMA 规整，schema.validate_reviews 校验）
+    - answers.bin   -> 逐题记录（模块 / 标记越界时整包拒绝）
+    - strategy.json -> 策略
+    - checkin.json  -> 打卡
+    mode：replace 覆盖当前账号的数据；merge 把成绩 / 复盘并入现有数据（成绩按 日期+试卷 去重），
+    逐题记录只补上当前账号还没有的试卷，策略 / 打卡保留当前账号的。校验不通过的行被拒绝，不影响其余行。
+    progress(文件名, 已读行数) 每读完一块回调一次。
+    返回 (是否成功, 提示, 报告)；报告含各文件的读取 / 有效 / 重复 / 拒绝行数、问题明细、行/秒、已写入的项，
+    以及峰值内存（只在 trace_memory=True 时统计，基准测试用；tracemalloc 作用于整个进程，
+    会拖慢同一服务里其他人的会话，页面上不要开）。
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"mode 只能是 {IMPORT_MODES}")
+    report = {"模式": mode}
+    written = []
+    # 峰值内存只统计读取 + 校验阶段（分块解析省的就是这一段）；
+    # 写入阶段走 save_* 原有路径，tracemalloc 会把其中的纯 Python 部分（复盘索引）拖慢一个数量级
+    own_trace = trace_memory and not tracemalloc.is_tracing()
+    if own_trace:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    peak = None
+    t0 = time.perf_counter()
+    t_read = None
+    try:
+        try:
+            with zipfile.ZipFile(uploaded_file, "r") as zf:
+                names = set(zf.namelist())
+                df = rdf = sheets = s = d = None
+                if "records.csv" in names:
+                    df, report["成绩"] = _read_bundle_csv(zf, "records.csv", read_records_csv, validate_records, progress)
+                    df = ensure_schema(df)
+                if "reviews.csv" in names:
+                    rdf, report["复盘"] = _read_bundle_csv(zf, "reviews.csv", _read_reviews_chunks, validate_reviews, progress)
+                    rdf = _normalize_reviews(rdf)
+                    counts = list(REVIEW_RANGES)
+                    rdf[counts] = rdf[counts].apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+                if "answers.bin" in names:
+                    size = zf.getinfo("answers.bin").file_size
+                    if size > IMPORT_MAX_MEMBER_BYTES:
+                        raise ValueError(f"answers.bin 解压后 {size / 1e6:.0f}MB，超过上限 {IMPORT_MAX_MEMBER_BYTES / 1e6:.0f}MB")
+                    sheets = decode_blocks(zf.read("answers.bin"), strict=True)[0]
+                    if df is not None:
+                        sheets = resolve_keys(sheets, df["试卷ID"])
+                    report["逐题"] = {"试卷": len(sheets)}
+                if "strategy.json" in names:
+                    with zf.open("strategy.json") as f:
+                        s = json.load(f)
+                if "checkin.json" in names:
+                    with zf.open("checkin.json") as f:
+                        d = json.load(f)
+        finally:
+            t_read = time.perf_counter() - t0
+            if own_trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+        # 有行却一行都没通过校验（多半是文件本身不对）：整包拒绝，不能拿空表覆盖现有数据
+        for k in ("成绩", "复盘"):
+            if k in report and report[k]["读取"] > 0 and report[k]["有效"] == 0:
+                raise ValueError(f"{k}共 {report[k]['读取']} 行，全部未通过校验，未写入任何数据")
+
+        # 全部读完、校验完才写
+        ids = None
+        if df is not None:
+            if mode == "merge":
+                df, report["成绩"]["重复"], ids = _merge_records(load_data(un), df)
+            save_data(df, un)
+            written.append("成绩")
+        if rdf is not None:
+            if mode == "merge":
+                rdf, report["复盘"]["重复"] = _merge_reviews(load_reviews(un), rdf)
+            save_reviews(rdf, un)
+            written.append("复盘")
+        if mode == "merge":
+            if sheets and ids is not None:
+                # 跟着导入的成绩走：试卷ID 重新分配过的换成新ID，去重丢掉的卷不要
+                sheets = {ids[pid]: arr for pid, arr in sheets.items() if pid in ids}
+            if sheets:
+                cur = load_answers(un)
+                have = set(load_data(un)["试卷ID"].astype(str))
+                for pid, arr in resolve_keys(sheets, have).items():
+                    if pid in have and pid not in cur:
+                        save_answers(un, pid, arr)
+                written.append("逐题记录")
+        elif sheets is not None or df is not None:
+            # 成绩整表覆盖后，旧的逐题记录对不上试卷了，一并换成包里的（包里没有就清空）
+            _replace_answers(un, sheets or {})
+            written.append("逐题记录")
+        if mode == "replace":
+            if s is not None:
+                save_strategy(un, _normalize_strategy(s))
+                written.append("策略")
+            if d is not None:
+                save_checkin(un, d)
+                written.append("打卡")
+        ok = True
+        msg = "数据导入成功！" + ("已并入当前账号的数据。" if mode == "merge" else "已覆盖当前账号的数据。")
+    except Exception as e:
+        ok, msg = False, f"导入失败：{e}"
+        if written:
+            msg += f"（写入中途出错：{'、'.join(written)} 已经写入，其余保持原样）"
+    seconds = time.perf_counter() - t0
+    rows = sum(report[k]["读取"] for k in ("成绩", "复盘") if k in report)
+    report.update({
+        "读取校验秒": round(t_read, 3),
+        "写入秒": round(seconds - t_read, 3),
+        "行每秒": round(rows / t_read, 1) if t_read else None,
+        "峰值内存MB": round(peak / 1e6, 1) if peak is not None else None,
+        "已写入": written,
+    })
+    return ok, msg, report
+
+
+# ================== 派生数据：成绩聚合 / 复盘检索索引 ==================
+# 两者都按用户放在进程级缓存里，附带数据签名（文件 mtime/size 或 SQLite 版本号）；
+# 签名对不上就按传入的表重建，写入路径（append_record / save_reviews 等）负责就地同步。
+def _records_sig(un: str):
+    if config.STORAGE_BACKEND == "sqlite":
+        return ("sqlite", _sql_version(_sqlite_conn(), un, "records"))
+    return (_file_sig(data_file(un)), _file_sig(data_log_file(un)))
+
+
+@lru_cache(maxsize=None)
+def _record_agg_store() -> Dict:
+    """进程级成绩聚合（按用户），与数据签名绑定"""
+    return {"lock": threading.Lock(), "users": {}}
+
+
+def record_aggregates(un: str, df: pd.DataFrame, ms: Dict[str, np.ndarray] = None) -> Dict:
+    """
+    读取当前用户的成绩聚合（只读，勿修改）。
+    签名与套数都对得上时直接返回写入时维护的结果，否则按 df 重建一次。
+    """
+    sig = _records_sig(un)
+    store = _record_agg_store()
+    with store["lock"]:
+        agg = store["users"].get(un)
+        if agg is not None and agg["sig"] == sig and agg["n"] == len(df):
+            return agg
+    agg = build_record_aggregates(df, ms)
+    agg["sig"] = sig
+    with store["lock"]:
+        store["users"][un] = agg
+    return agg
+
+
+def _agg_on_append(un: str, entry: Dict, before_sig):
+    """append_record 之后调用：写入前的聚合仍有效时就地追加，否则丢弃等下次重建"""
+    store = _record_agg_store()
+    with store["lock"]:
+        agg = store["users"].get(un)
+        if agg is None:
+            return
+        if agg["sig"] != before_sig:
+            store["users"].pop(un, None)
+            return
+        totals = {c: round(float(entry.get(c, 0) or 0), 4) for c in AGG_TOTAL_COLS}
+        ms = module_stats(pd.Series(entry))
+        _agg_add(agg, totals, ms["正确率"][0], ms["超时"][0])
+        agg["sig"] = _records_sig(un)
+
+
+def _agg_resign(un: str, before_sig):
+    """内容没变、只是文件变了（压缩）：聚合沿用，更新签名"""
+    store = _record_agg_store()
+    with store["lock"]:
+        agg = store["users"].get(un)
+        if agg is not None and agg["sig"] == before_sig:
+            agg["sig"] = _records_sig(un)
+
+
+def _agg_invalidate(un: str):
+    store = _record_agg_store()
+    with store["lock"]:
+        store["users"].pop(un, None)
+
+
+def _reviews_sig(un: str):
+    if config.STORAGE_BACKEND == "sqlite":
+        return ("sqlite", _sql_version(_sqlite_conn(), un, "reviews"))
+    return _file_sig(review_file(un))
+
+
+@lru_cache(maxsize=None)
+def _review_index_store() -> Dict:
+    """进程级复盘索引（按用户）"""
+    return {"lock": threading.Lock(), "users": {}}
+
+
+def review_index_sync(un: str, rdf: pd.DataFrame) -> Dict:
+    """
+    返回与 rdf（load_reviews 的结果）对齐的索引（只读）；数据没变直接复用，只多了新行则增量补齐。
+    补齐在拷贝上做、做完再换掉缓存里的引用：另一个标签页正在查的旧索引保持原样，行号不会超出它那份 rdf。
+    """
+    sig = _reviews_sig(un)
+    store = _review_index_store()
+    with store["lock"]:
+        idx = store["users"].get(un)
+        if idx is not None and idx["sig"] == sig and len(idx["keys"]) == len(rdf):
+            return idx
+        keys = _review_row_keys(rdf)
+        if idx is None or len(idx["keys"]) > len(keys) or idx["keys"] != keys[:len(idx["keys"])]:
+            idx = _new_review_index()
+        else:
+            idx = _review_index_copy(idx)
+        n = len(idx["keys"])
+        _review_index_add(idx, rdf.iloc[n:], keys[n:])
+        idx["sig"] = sig
+        store["users"][un] = idx
+        return idx
+
+
+def _answers_sig(un: str):
+    if config.STORAGE_BACKEND == "sqlite":
+        return ("sqlite", _sql_version(_sqlite_conn(), un, "answers"))
+    return _file_sig(answer_file(un))
+
+
+def data_version(un: str, kind: str = "records"):
+    """
+    成绩（kind="records"）、复盘（"reviews"）或逐题记录（"answers"）当前的数据版本：
+    file 后端是文件签名，sqlite 后端是版本号。任何写入都会让它变化，页面上的派生缓存（例如图表）拿它当键的一部分。
+    """
+    if kind == "answers":
+        return _answers_sig(un)
+    return _reviews_sig(un) if kind == "reviews" else _records_sig(un)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+做题计时器的会话日志：开始 / 暂停 / 模块完成 / 下一题 每次操作向当前账号追加一条事件，
+刷新页面、断线重连或服务重启之后按日志回放，计时器从原处接着走。
+
+- 每条事件带 计时器读数 t（秒，暂停不走）、墙上时间 w（time.time）和单调时钟 m（time.monotonic）；
+  状态全由 t 推出，回放就是把事件顺序过一遍（一套卷一两百条），每次进页面都可以做；
+- 只有“正在走的那一段”要看时钟：w - m 和开始那条一致（同一次开机）就用单调时钟算，改系统时间不影响；
+  对不上（机器重启过，单调时钟从头算）就退回墙上时间；
+- 重置 = 清空日志，日志里永远只有当前这一场。
+
+不依赖 pandas / streamlit。
+"""
+
+import time
+from typing import Dict, List, Optional
+
+TIMER_EVENTS = ("start", "pause", "lap", "q")
+
+# 逐题计次缓冲里“本模块完成”的模块码（不是一道题，只把前后两个模块断开）
+LAP_MODULE_END = 255
+
+CLOCK_SKEW_SEC = 2.0   # 两条事件的 w - m 相差不超过这么多，就认为单调时钟没换过
+
+
+def timer_event(ev: str, t: float, **extra) -> Dict:
+    """
+    一条事件。ev：start（可带 order = 做题顺序）/ pause / lap（模块完成，带 mod = 模块名）/
+    q（下一题，带 code = 模块在 LEAF_MODULES 里的下标）；t 是此刻的计时器读数（秒）。
+    """
+    if ev not in TIMER_EVENTS:
+        raise ValueError(f"未知的计时事件：{ev!r}")
+    return {"ev": ev, "t": round(float(t), 3), "w": time.time(), "m": time.monotonic(), **extra}
+
+
+def _running_for(start: Dict, now_w: float, now_m: float) -> float:
+    """从 start 事件到现在走了多少秒"""
+    if abs((now_w - now_m) - (start["w"] - start["m"])) <= CLOCK_SKEW_SEC:
+        return max(0.0, now_m - start["m"])
+    return max(0.0, now_w - start["w"])
+
+
+def replay_timer(events: List[Dict], now_w: float = None, now_m: float = None) -> Optional[Dict]:
+    """
+    回放日志，返回计时器状态（没有事件时返回 None）：
+    order（开始时的做题顺序）/ running / elapsed（停住的读数）/ running_for（正在走的这一段已走秒数）/
+    lap_index / lap_data（模块 -> 秒）/ last_lap_total / q_stamps / q_codes（逐题计次缓冲）。
+    """
+    if not events:
+        return None
+    now_w = time.time() if now_w is None else now_w
+    now_m = time.monotonic() if now_m is None else now_m
+    state = {
+        "order": [], "running": False, "elapsed": 0.0, "running_for": 0.0,
+        "lap_index": 0, "lap_data": {}, "last_lap_total": 0.0, "q_stamps": [], "q_codes": [],
+    }
+    start = None
+    for e in events:
+        ev, t = e.get("ev"), float(e.get("t", 0.0))
+        if ev == "start":
+            if e.get("order"):
+                state["order"] = list(e["order"])
+            state["running"], state["elapsed"], start = True, t, e
+        elif ev == "pause":
+            state["running"], state["elapsed"], start = False, t, None
+        elif ev == "lap":
+            state["lap_data"][e.get("mod")] = max(0.0, t - state["last_lap_total"])
+            state["last_lap_total"] = t
+            state["lap_index"] += 1
+            state["q_stamps"].append(t)
+            state["q_codes"].append(LAP_MODULE_END)
+        elif ev == "q":
+            state["q_stamps"].append(t)
+            state["q_codes"].append(int(e.get("code", LAP_MODULE_END)))
+    if state["running"]:
+        state["running_for"] = _running_for(start, now_w, now_m)
+    return state